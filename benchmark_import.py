@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+This script benchmark the start-up cost of the command line tools: the
+import time of the heavy modules, the help of the swatreader command and of
+a script, and a chain of steps run as separate processes (as in the .bat
+files) against one swatreader batch process.
+
+usage:
+    python benchmark_import.py --steps 10
+"""
+
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from swat_synthetic import make_txtinout
+
+
+# the modules whose import time is measured, after the bare interpreter
+MODULES = ['numpy', 'pandas', 'matplotlib', 'matplotlib.pyplot', 'swatreader', 'swat_reader', 'swat_render', 'usgs_water_data_reader']
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def wall_time(command, repeat, cwd=HERE):
+    '''
+    best wall time of repeat runs of a command
+    '''
+    best = float('inf')
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run(command, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+#%%
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the start-up time of the command line tools')
+    parser.add_argument('--steps',  default=10, type=int, help='number of save-rch steps in the chain (default: %(default)s).')
+    parser.add_argument('--nrch',   default=5,  type=int, help='number of reaches of the synthetic output.rch (default: %(default)s).')
+    parser.add_argument('--nbyr',   default=1,  type=int, help='number of years simulated (default: %(default)s).')
+    parser.add_argument('-r', '--repeat', default=3, type=int, help='number of timed runs (default: %(default)s).')
+
+    args = parser.parse_args()
+
+    python = sys.executable
+    bare = wall_time([python, '-c', 'pass'], args.repeat)
+    print('{:<28} {:8.3f} s'.format('python (no imports)', bare))
+    for m in MODULES:
+        t = wall_time([python, '-c', 'import ' + m], args.repeat)
+        print('{:<28} {:8.3f} s (+{:.3f} s)'.format('import ' + m, t, t - bare))
+
+    print()
+    for name, command in (('swatreader.py -h', ['swatreader.py', '-h']), ('save_rch.py -h', ['save_rch.py', '-h']),
+                          ('swatreader.py save-rch -h', ['swatreader.py', 'save-rch', '-h'])):
+        print('{:<28} {:8.3f} s'.format(name, wall_time([python] + command, args.repeat)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        TxtInOut = make_txtinout(os.path.join(tmp, 'TxtInOut'), nrch=args.nrch, nbyr=args.nbyr)
+        steps = [['save-rch', TxtInOut, '-b', str(i % args.nrch + 1), '-o', os.path.join(tmp, 'rch{}.csv'.format(i))] for i in range(args.steps)]
+        with open(os.path.join(tmp, 'steps.txt'), 'w') as f:
+            f.write('\n'.join(' '.join('"{}"'.format(a) for a in s) for s in steps) + '\n')
+
+        t0 = time.perf_counter()
+        for s in steps:
+            subprocess.run([python, 'save_rch.py'] + s[1:], cwd=HERE, check=True, stdout=subprocess.DEVNULL)
+        t_chain = time.perf_counter() - t0
+        t_batch = wall_time([python, 'swatreader.py', 'batch', os.path.join(tmp, 'steps.txt')], 1)
+
+    print()
+    print('{} save-rch steps, {} reaches x {} years'.format(args.steps, args.nrch, args.nbyr))
+    print('one process per step : {:8.3f} s ({:.3f} s per step)'.format(t_chain, t_chain / args.steps))
+    print('swatreader batch     : {:8.3f} s ({:.3f} s per step, {:.0f}x faster)'.format(t_batch, t_batch / args.steps, t_chain / t_batch))
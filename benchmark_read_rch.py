@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+This script benchmark swat_reader.read_rch against the former pd.read_fwf parser
+on a synthetic output.rch.
+
+usage:
+    python benchmark_read_rch.py --nrch 150 --nbyr 30
+"""
+
+
+import os
+import time
+import argparse
+import datetime
+import tempfile
+import numpy as np
+import pandas as pd
+
+from swat_reader import swat_reader
+from swat_synthetic import make_txtinout
+
+
+def read_rch_fwf(swatreader):
+    '''
+    the former read_rch: pd.read_fwf and a row-wise date index
+    '''
+    fpath = os.path.join(swatreader.TxtInOut, 'output.rch')
+    with open(fpath) as f:
+        columns, widths = swatreader.get_rch_header_width()
+        dat = pd.read_fwf(f, skiprows=9, header=None, widths=widths)
+        dat.columns = columns
+        if swatreader.cio['ICALEN'] == '1':
+            dat.index = dat.apply(lambda x: datetime.datetime(x.YR, x.MO, x.DA), axis=1)
+        else:
+            step = {'0':'M', '1':'D', '2':'A'}
+            nsub = dat.RCH.max()
+            dat = dat[dat.MON <= 366]
+            if swatreader.cio['IPRINT'] == '0':
+                dat = dat.iloc[:-nsub]
+            date_index = pd.date_range(swatreader.output_start_date, swatreader.output_end_date, freq=step[swatreader.cio['IPRINT']])
+            dat.index = np.repeat(date_index, nsub)
+            dat.index.name = 'time'
+    return dat.iloc[:, [1] + list(range(columns.index('AREAkm2')+1, len(columns)))]
+
+
+def timeit(func, repeat):
+    '''
+    best wall time of repeat calls and the last result
+    '''
+    best = np.inf
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        res = func()
+        best = min(best, time.perf_counter() - t0)
+    return best, res
+
+#%%
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark reading a synthetic SWAT output.rch')
+    parser.add_argument('--nrch',   default=50, type=int, help='number of reaches (default: %(default)s).')
+    parser.add_argument('--nbyr',   default=10, type=int, help='number of years simulated (default: %(default)s).')
+    parser.add_argument('--iprint', default=1,  type=int, choices=[0, 1], help='print code 0: monthly; 1: daily (default: %(default)s).')
+    parser.add_argument('--icalen', default=0,  type=int, choices=[0, 1], help='print julian (0) or calendar (1) dates (default: %(default)s).')
+    parser.add_argument('-r', '--repeat', default=3, type=int, help='number of timed runs (default: %(default)s).')
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as TxtInOut:
+        make_txtinout(TxtInOut, nrch=args.nrch, nbyr=args.nbyr, iprint=args.iprint, icalen=args.icalen)
+        swatreader = swat_reader(TxtInOut)
+        size = os.path.getsize(os.path.join(TxtInOut, 'output.rch')) / 2**20
+
+        t_fwf, df_fwf = timeit(lambda: read_rch_fwf(swatreader), 1)
+        t_new, df_new = timeit(swatreader.read_rch, args.repeat)
+        pd.testing.assert_frame_equal(df_fwf, df_new, check_dtype=False, check_names=False)
+
+    print('output.rch: {:.1f} MB, {} rows x {} columns'.format(size, *df_new.shape))
+    print('pd.read_fwf : {:8.3f} s'.format(t_fwf))
+    print('read_rch    : {:8.3f} s ({:.0f}x faster)'.format(t_new, t_fwf / t_new))
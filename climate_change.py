@@ -1,83 +1,83 @@
 # -*- coding: utf-8 -*-
 """
-This script read a SWAT output.rch file and save to csv file.
+This script change the precipitation and temperature files of a SWAT model
+for climate change scenarios.
+
+Every pcpN.pcp and tmpN.tmp listed in file.cio is changed, see swat_weather:
+precipitation is multiplied by a factor and temperature is shifted by a
+delta, uniformly, by season or by month, and per station. Changing the files
+in TxtInOut keeps the originals as .bak files, and every change starts from
+them. A table of scenarios creates one workspace of TxtInOut per scenario
+(see swat_workspace), where only the weather files are new and the other
+files are linked to TxtInOut, so every scenario folder is ready to run.
 
 Created on Fri Feb 14 00:21:31 2020
 
 @author: Michael Ou
 
 usage:
-    python save_rch.py 
-"""
+    python climate_change.py TxtInOut -t 1.5 -p 1.1
+    python climate_change.py TxtInOut --pcp-monthly 1.1 1.0 0.9 1.0 --tmp-monthly 1 1 1 2 2 2 3 3 3 2 2 1
+    python climate_change.py TxtInOut -t 2 --stations stations.csv
+    python climate_change.py TxtInOut --scenarios scenarios.csv -o scenarios
 
+    stations.csv has a station column (the names in the headers of the
+    weather files) and pcp and/or tmp columns of changes added to the others.
+    scenarios.csv has a scenario column and pcp and tmp changes in columns
+    pcp, pcp_DJF ... pcp_SON or pcp_1 ... pcp_12 (and the same for tmp).
+"""
 
 
-from swat_reader import swat_reader
+import os
+import time
 import argparse
 import pandas as pd
-import os
-import shutil
-import numpy as np
+
+from swat_weather import weather, monthly_table, scenario_changes
+from swat_workspace import workspace_set
+
+
 #%% set up the command
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='Save desired resultd from SWAT output.rch to a CSV file')
+    parser = argparse.ArgumentParser(description='Change the SWAT precipitation and temperature files for climate change scenarios')
     parser.add_argument('TxtInOut', help='TxtInOut directory path, required.')
     parser.add_argument('-t', '--temperature',    default=0.0, type=float, help='temperature difference.')
     parser.add_argument('-p', '--precipitation',  default=1.0, type=float, help='relative precipitation change')
-   
-    
+    parser.add_argument('--tmp-monthly', type=float, nargs='+', help='temperature differences of 4 seasons (DJF, MAM, JJA, SON) or 12 months')
+    parser.add_argument('--pcp-monthly', type=float, nargs='+', help='precipitation factors of 4 seasons (DJF, MAM, JJA, SON) or 12 months')
+    parser.add_argument('--stations', type=str, help='CSV file of station, pcp and tmp changes per station')
+    parser.add_argument('--scenarios', type=str, help='CSV file of scenarios, one workspace of TxtInOut each')
+    parser.add_argument('-o', '--output', type=str, help='the folder of the changed files (default: TxtInOut)')
+
     # parser.print_help()
     # args = parser.parse_args(r'D:\WorkSync\hydrology_swat_lab\LittleCreek1\Scenarios\Default\TxtInOut'.split())
-    
+
     args = parser.parse_args()
-    
-    
-    # print(args)
-    
+
     if not os.path.exists(args.TxtInOut):
         raise OSError(args.TxtInOut + ' not found')
-    
-    # read the output.rch file:
-    swatreader = swat_reader(args.TxtInOut)    
-    
-    # change temperature data
-    if not os.path.exists(os.path.join(args.TxtInOut, 'pcp1.pcp.bak')):
-        shutil.copy2(os.path.join(args.TxtInOut, 'pcp1.pcp'), os.path.join(args.TxtInOut, 'pcp1.pcp.bak'))
-    if not os.path.exists(os.path.join(args.TxtInOut, 'Tmp1.Tmp.bak')):
-        shutil.copy2(os.path.join(args.TxtInOut, 'Tmp1.Tmp'), os.path.join(args.TxtInOut, 'Tmp1.Tmp.bak'))
-    
-    if args.temperature != 0.0:
-        with open(os.path.join(args.TxtInOut, 'Tmp1.Tmp.bak')) as fr:  
-            with open(os.path.join(args.TxtInOut, 'Tmp1.Tmp'), 'w') as fw:
-                # write headers
-                l = fr.readline()
-                nsite = l.count(',')
-                fw.write(l)
-                for i in range(3):
-                    l = fr.readline()
-                    fw.write(l)
-                data = pd.read_fwf(fr, widths=[7] + nsite * 2 * [5], header=None)
-                # make changes                
-                data.iloc[:, 1:] = data.iloc[:, 1:] + args.temperature
-                #fw.write(data.to_string(index=False, header=False, float_format='%5.1f', col_space=0))
-                np.savetxt(fw, data.values, fmt='%7.0f' + '%5.1f' * nsite * 2)
-                    
-                
-    if args.precipitation != 1.0:
-        with open(os.path.join(args.TxtInOut, 'pcp1.pcp.bak')) as fr:  
-            with open(os.path.join(args.TxtInOut, 'pcp1.pcp'), 'w') as fw:
-                # write headers
-                l = fr.readline()
-                nsite = l.count(',')
-                fw.write(l)
-                for i in range(3):
-                    l = fr.readline()
-                    fw.write(l)
-                data = pd.read_fwf(fr, widths=[7] + nsite * [5], header=None)
-                # make changes                
-                data.iloc[:, 1:] = data.iloc[:, 1:] * args.precipitation
-                #fw.write(data.to_string(index=False, header=False, float_format='%5.1f', col_space=0))
-                np.savetxt(fw, data.values, fmt='%7.0f' + '%5.1f' * nsite)
-      
-    
+
+    t0 = time.perf_counter()
+    w = weather(args.TxtInOut)
+    print('{} ({:.2f} s)'.format(w, time.perf_counter() - t0))
+
+    pcp_station, tmp_station = None, None
+    if args.stations is not None:
+        stations = pd.read_csv(args.stations, dtype={'station': str}).set_index('station')
+        pcp_station = stations['pcp'] if 'pcp' in stations.columns else None
+        tmp_station = stations['tmp'] if 'tmp' in stations.columns else None
+
+    if args.scenarios is None:
+        pcp = args.precipitation * monthly_table(args.pcp_monthly, 1., 1)[:, 0]
+        tmp = args.temperature + monthly_table(args.tmp_monthly, 0., 1)[:, 0]
+        w.write(args.output, pcp, tmp, pcp_station, tmp_station)
+    else:
+        assert args.output is not None, 'The scenarios need an output folder (-o).'
+        scenarios = pd.read_csv(args.scenarios, dtype={'scenario': str})
+        t0 = time.perf_counter()
+        spaces = workspace_set(args.TxtInOut, args.output).create(scenarios['scenario'])
+        for ws, (_, row) in zip(spaces, scenarios.iterrows()):
+            w.write(ws.path, scenario_changes(row, 'pcp'), scenario_changes(row, 'tmp'), pcp_station, tmp_station)
+        print('{} scenarios written to {} ({:.2f} s)'.format(len(scenarios), args.output, time.perf_counter() - t0))
+
     print('Climate data have been successfully changed')
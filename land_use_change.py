@@ -13,6 +13,7 @@ usage:
 
 
 from swat_reader import swat_reader
+from swat_workspace import workspace, MANIFEST
 import argparse
 import pandas as pd
 import os
@@ -24,6 +25,7 @@ if __name__ == '__main__':
     group.add_argument('-r', '--read',  action='store_true', default=False, help='read parameters from the SWAT model files')
     group.add_argument('-w', '--write', action='store_true', default=False, help='write parameters to the SWAT model files')
     parser.add_argument('-f', '--file', default='swat_landuse.csv', type=str, help='csv file to read or save ')
+    parser.add_argument('-o', '--output', type=str, help='write to a workspace linked to TxtInOut instead of TxtInOut itself (-w only)')
    
     
     # parser.print_help()
@@ -45,9 +47,13 @@ if __name__ == '__main__':
             raise OSError(args.file + ' not found')
             
         subhru = pd.read_csv(args.file)
-        swatreader.write_input_sub(subhru)
+        if args.output is not None:
+            # the edited files replace their links, TxtInOut is left untouched
+            ws = workspace(args.output) if os.path.exists(os.path.join(args.output, MANIFEST)) else swatreader.create_workspace(args.output)
+            swatreader = ws.reader()
+        changed = swatreader.write_input_sub(subhru)
         
-        print('Parameter data have been successfully written to model input files at {}'.format(args.TxtInOut))
+        print('Parameter data have been successfully written to {} model input files at {}'.format(len(changed), swatreader.TxtInOut))
     
     else:
         # read parameter from model files
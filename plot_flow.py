@@ -15,13 +15,14 @@ usage:
 
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
 
 from swat_reader import swat_reader
-from usgs_water_data_reader import read_usgs_flow
+from swat_cube import SwatOutputCube
+from swat_render import render, draw_lines, downsample_lines
+from swat_metrics import gauge_metrics
+from usgs_water_data_reader import read_usgs_flows, DEFAULT_CACHE_DIR
 import argparse
 
-plt.style.use('ggplot')
     
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Plot streamflow from SWAT output.rch (against USGS measurements')
@@ -41,7 +42,14 @@ if __name__ == '__main__':
     parser.add_argument('-fs', '--figsize', default=(8, 4), nargs=2, help='Figure size')
     parser.add_argument('-n', type=int,   default=100, metavar='minimum_number_record', help='The minimum observation record number of a gauge. \
                         If the number of record during the output period is smaller than this number, the usgs site will not included in the plot. (default: %(default)s).')
+    parser.add_argument('--usgscache', default=DEFAULT_CACHE_DIR, help='Folder of the cached USGS RDB files (default: %(default)s).')
+    parser.add_argument('--nousgscache', action='store_true', help='Download the USGS data without using the RDB cache.')
+    parser.add_argument('--offline', action='store_true', help='Only use the USGS RDB files in the cache folder.')
 
+    parser.add_argument('--nocache', action='store_true', help='Parse output.rch again instead of loading it from the cache next to TxtInOut.')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Number of processes drawing the plots (default: the number of CPUs).')
+    parser.add_argument('--downsample', action='store_true', help='Draw only the first, min, max and last points of every pixel column of long series (peaks are kept).')
+    parser.add_argument('--metricfreq', default=None, help='Resampling frequency of the goodness-of-fit metrics, e.g. M for monthly (default: the output time step).')
     
     
     # parser.print_help()
@@ -56,10 +64,10 @@ if __name__ == '__main__':
             
     # read the output.rch file:
     swatreader = swat_reader(args.TxtInOut)
-    df_out = swatreader.read_rch()
-    
-    # filter the subbasins
-    df_filter = swat_reader.filter(df_out, args.subbasin, ["FLOW_OUTcms"])
+    if args.nocache:
+        cube = swatreader.read_rch_cube(['FLOW_OUTcms'], args.subbasin)
+    else:
+        cube = SwatOutputCube.from_frame(swatreader.read_rch(['FLOW_OUTcms'], args.subbasin, cache=True))
     
     # convert units if necessary
     time_factor = dict(s=1., d=86400.)
@@ -69,12 +77,10 @@ if __name__ == '__main__':
     length_label = dict(m='meter$^3$', f='feet$^3$', af='acre-feet')
 
 
-    df_filter *= length_factor[args.lengthunit] * time_factor[args.timeunit]
-    df_filter.columns = ['Simulated']
-    # print('df_fileter:\n', df_filter)
+    cube.values *= length_factor[args.lengthunit] * time_factor[args.timeunit]
     # download the USGS data
-    start_date = df_filter.index.levels[1].min()
-    end_date   = df_filter.index.levels[1].max()
+    start_date = cube.times[0]
+    end_date   = cube.times[-1]
     print('The starting date of the output file is:', start_date)
     print('The ending date of the output file is  :', end_date)
     
@@ -82,27 +88,29 @@ if __name__ == '__main__':
     if not os.path.exists(output_dir):
         os.mkdir(output_dir)
     
+    # download the USGS data of all the gauges at once
+    flows, gauge_names = read_usgs_flows(args.usgs, '{:%Y-%m-%d}'.format(start_date), '{:%Y-%m-%d}'.format(end_date), 'D',
+                                         None if args.nousgscache else args.usgscache, args.offline)
+    jobs = []
     for s, u in zip(args.subbasin, args.usgs):
         
         # read flow
         
         # read flow
-        flow, gauge_names  = read_usgs_flow([u], '{:%Y-%m-%d}'.format(start_date), '{:%Y-%m-%d}'.format(end_date), 'D')
-        flow = flow.iloc[:, 1]
+        flow = flows[u].iloc[:, 1]
         flow.index = pd.DatetimeIndex(flow.index)
-        if swatreader.cio['IPRINT'] == '0': # monthly output
+        if swatreader.config.iprint == 0: # monthly output
             flow = pd.to_numeric(flow).resample('M').mean()
-        elif swatreader.cio['IPRINT'] == '1':
+        elif swatreader.config.iprint == 1:
             pass
         else:
-            raise NotImplementedError('IPRINT is {} for annual output.\nPlotting annual output is not supported.'.format(args.iprint))
+            raise NotImplementedError('IPRINT is {} for annual output.\nPlotting annual output is not supported.'.format(swatreader.config.iprint))
         
 
         
-        fig, ax = plt.subplots(figsize=args.figsize)
-        df_filter.loc[s].plot(ax=ax, label='Simulated', legend=True, linewidth=args.slw, linestyle=args.sls)
-        csv = df_filter.loc[s]
-        csv.columns = ['Simulated']
+        simulated = cube.series(s, 'FLOW_OUTcms')
+        lines = [dict(x=simulated.index.values, y=simulated.values, label='Simulated', linewidth=args.slw, linestyle=args.sls)]
+        csv = simulated.to_frame('Simulated')
         
         if flow.shape[0] > args.n:
             
@@ -110,17 +118,27 @@ if __name__ == '__main__':
                 
             observed = pd.to_numeric(observed, errors='coerce').dropna() * length_factor_usgs[args.lengthunit]
             observed.index = pd.DatetimeIndex(observed.index)            
-            observed.plot( ax=ax, label='Observed',  legend=True, linewidth=args.olw, linestyle=args.ols)
+            lines.append(dict(x=observed.index.values, y=observed.values, label='Observed', linewidth=args.olw, linestyle=args.ols))
             observed.name = 'Observed'
             csv = pd.concat([csv, observed], axis=1)
         
-        if args.log:
-            ax.set_yscale('log')
-        ax.set_title(gauge_names[u])
-        ax.set_xlabel('Time')
-        ax.set_ylabel('Streamflow ({}/{})'.format(length_label[args.lengthunit], time_label[args.timeunit]))
-        fig.savefig(os.path.join(args.output, '{}{}.png'.format(args.prefix, s)), dpi=300)
+        if args.downsample:
+            # about one bucket per pixel column of the figure at 300 dpi
+            lines = downsample_lines(lines, int(float(args.figsize[0]) * 300))
+        jobs.append((draw_lines, os.path.join(args.output, '{}{}.png'.format(args.prefix, s)),
+                     dict(lines=lines, title=gauge_names[u], xlabel='Time', log=args.log, legend=True,
+                          ylabel='Streamflow ({}/{})'.format(length_label[args.lengthunit], time_label[args.timeunit]))))
         csv.to_csv(os.path.join(args.output, '{}{}.csv'.format(args.prefix, s)))
+    
+    # goodness-of-fit metrics of all the gauges at once
+    simulated = pd.DataFrame({s: cube.series(s, 'FLOW_OUTcms') for s in args.subbasin}).rename_axis(columns=cube.unit)
+    metrics = gauge_metrics(simulated, flows, args.usgs, length_factor_usgs[args.lengthunit] * time_factor[args.timeunit],
+                            'M' if swatreader.config.iprint == 0 else None, args.metricfreq, min_count=args.n)
+    metrics.to_csv(os.path.join(args.output, '{}metrics.csv'.format(args.prefix)))
+    print(metrics.to_string(float_format='{:.3f}'.format))
+    
+    # draw the plots in parallel
+    render(jobs, figsize=tuple(float(f) for f in args.figsize), dpi=300, tight=False, style='ggplot', processes=args.jobs)
 
     print('Plots are generated successfully at {}'.format(os.path.abspath(args.output)))
 
@@ -15,10 +15,10 @@ usage:
 
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
 
 from swat_reader import swat_reader
-from usgs_water_data_reader import usgs_data_reader
+from swat_cube import SwatOutputCube
+from swat_render import render, draw_lines, downsample_lines
 import argparse
 
 if __name__ == '__main__':
@@ -40,6 +40,9 @@ if __name__ == '__main__':
     parser.add_argument('-u', '--unit',  default='m', choices=['m','f','af'], help='The unit for flow volume m:meters; f:feet; af:acre-feet')
     parser.add_argument('-t', '--timeunit',  default='s', choices=['s','d','m', 'y'], help='The unit for flow volume s:second; d:day; m:month; y:year')
     parser.add_argument('-p', '--prefix',  default='', help='Prefix for plot file names')
+    parser.add_argument('--nocache', action='store_true', help='Parse output.rch again instead of loading it from the cache next to TxtInOut.')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Number of processes drawing the plots (default: the number of CPUs).')
+    parser.add_argument('--downsample', action='store_true', help='Draw only the first, min, max and last points of every pixel column of long series (peaks are kept).')
     
     
     # parser.print_help()
@@ -58,10 +61,16 @@ if __name__ == '__main__':
          
     # read the output.rch file:
     swatreader = swat_reader(args.TxtInOut)
-    df_out = swatreader.read_rch()
-    
-    # filter and aggregate if specified
-    df_filter = swat_reader.filter(df_out, args.subbasin, args.variable, args.freq, args.stat)
+    if args.freq is not None:
+        # aggregate with filter, which falls back to pandas for the statistics
+        # the cube does not have (e.g. median) and for missing values
+        df_rch = swatreader.read_rch(args.variable, args.subbasin, cache=not args.nocache)
+        df_rch = swat_reader.filter(df_rch, args.subbasin, args.variable, args.freq, args.stat)
+        cube = SwatOutputCube.from_frame(df_rch.reset_index(level=0).sort_index(kind='stable'))
+    elif args.nocache:
+        cube = swatreader.read_rch_cube(args.variable, args.subbasin)
+    else:
+        cube = SwatOutputCube.from_frame(swatreader.read_rch(args.variable, args.subbasin, cache=True))
     
     # convert units if necessary
     time_factor = dict(s=1., d=86400., m=86400*30.4375, y=86400*365.25)
@@ -70,49 +79,34 @@ if __name__ == '__main__':
     length_label = dict(m='meter$^3$', f='feet$^3$', af='acre-feet')
     
         
-    if not os.path.exists(output_dir):
-        os.mkdir(output_dir)
+    if not os.path.exists(args.output):
+        os.mkdir(args.output)
         
+    # one job per plot with only the series drawn on it
+    jobs = []
     for v in args.variable:
         # check if need to do unit conversion
         if v in ['FLOW_INcms', 'FLOW_OUTcms']:
             # cubic feet
-            df_filter[v] *= length_factor[args.unit] * time_factor[args.timeunit]
-            
-            # if they plot together
-            if args.p1:
-                fig, ax = plt.subplots(figsize=(8, 5))
-                for h in args.subbasin:
-                    df_filter[v][h].plot(ax=ax, legend=True, label=f'Subbasin {h}')
-                ax.set_ylabel('Streamflow ({}/{})'.format(length_label[args.unit], time_label[args.timeunit]))
-                fig.savefig(os.path.join(args.output, '{}{}.png'.format(args.prefix, v)), dpi=300, bbox_inches='tight')
-                
-            else:
-                for h in args.subbasin:
-                    fig, ax = plt.subplots(figsize=(8, 5))
-                    df_filter[v][h].plot(ax=ax)
-                    ax.set_title('Simulated discharge for Subbasin {}'.format(h))
-                    ax.set_ylabel('Streamflow ({}/{})'.format(length_label[args.unit], time_label[args.timeunit]))
-                    fig.savefig(os.path.join(args.output, '{}{}-{}.png'.format(args.prefix, v, h)), dpi=300, bbox_inches='tight')
-        
+            cube.values[:, :, cube.var_index[v]] *= length_factor[args.unit] * time_factor[args.timeunit]
+            ylabel = 'Streamflow ({}/{})'.format(length_label[args.unit], time_label[args.timeunit])
+            title = 'Simulated discharge for Subbasin {}'
         else:
-            
-            # if they plot together
-            if args.p1:
-                fig, ax = plt.subplots(figsize=(8, 5))
-                for h in args.subbasin:
-                    df_filter[v][h].plot(ax=ax, legend=True, label=f'Subbasin ' + str(h))
-                ax.set_ylabel(v)
-                fig.savefig(os.path.join(args.output, '{}{}.png'.format(args.prefix, v)), dpi=300, bbox_inches='tight')
-                
-            else:
-                for h in args.subbasin:
-                    fig, ax = plt.subplots(figsize=(8, 5))
-                    df_filter[v][h].plot(ax=ax)
-                    ax.set_title(v + ' for Subbasin ' + str(h))
-                    ax.set_ylabel(v)
-                    fig.savefig(os.path.join(args.output, '{}{}-{}.png'.format(args.prefix, v, h)), dpi=300, bbox_inches='tight')
+            ylabel = v
+            title = v + ' for Subbasin {}'
         
-            
+        lines = {h: dict(x=cube.times.values, y=cube.series(h, v).values, label='Subbasin {}'.format(h)) for h in args.subbasin}
+        if args.downsample:
+            # about one bucket per pixel column of the 8 inch figure at 300 dpi
+            lines = dict(zip(lines, downsample_lines(lines.values(), 8 * 300)))
+        # if they plot together
+        if args.p1:
+            jobs.append((draw_lines, os.path.join(args.output, '{}{}.png'.format(args.prefix, v)),
+                         dict(lines=list(lines.values()), ylabel=ylabel, legend=True)))
+        else:
+            for h in args.subbasin:
+                jobs.append((draw_lines, os.path.join(args.output, '{}{}-{}.png'.format(args.prefix, v, h)),
+                             dict(lines=[lines[h]], title=title.format(h), ylabel=ylabel)))
+    render(jobs, figsize=(8, 5), dpi=300, processes=args.jobs)
 
     print('Plots are generated successfully at {}'.format(os.path.abspath(args.output)))
\ No newline at end of file
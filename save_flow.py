@@ -15,13 +15,12 @@ usage:
 
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
 
 from swat_reader import swat_reader
-from usgs_water_data_reader import read_usgs_flow
+from usgs_water_data_reader import read_usgs_flows, DEFAULT_CACHE_DIR
+from swat_metrics import simulated_matrix, gauge_metrics
 import argparse
 
-plt.style.use('ggplot')
     
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Save streamflow from SWAT output.rch (against USGS measurements) to CSV files')
@@ -35,7 +34,12 @@ if __name__ == '__main__':
     parser.add_argument('-p', '--prefix',  default='', help='Prefix for CSV file names')
     parser.add_argument('-n', type=int,   default=100, metavar='minimum_number_record', help='The minimum observation record number of a gauge. \
                         If the number of record during the output period is smaller than this number, the usgs site will not included in the plot. (default: %(default)s).')
+    parser.add_argument('--usgscache', default=DEFAULT_CACHE_DIR, help='Folder of the cached USGS RDB files (default: %(default)s).')
+    parser.add_argument('--nousgscache', action='store_true', help='Download the USGS data without using the RDB cache.')
+    parser.add_argument('--offline', action='store_true', help='Only use the USGS RDB files in the cache folder.')
 
+    parser.add_argument('--nocache', action='store_true', help='Parse output.rch again instead of loading it from the cache next to TxtInOut.')
+    parser.add_argument('--metricfreq', default=None, help='Resampling frequency of the goodness-of-fit metrics, e.g. M for monthly (default: the output time step).')
     
     
     # parser.print_help()
@@ -50,7 +54,7 @@ if __name__ == '__main__':
             
     # read the output.rch file:
     swatreader = swat_reader(args.TxtInOut)
-    df_out = swatreader.read_rch()
+    df_out = swatreader.read_rch(['FLOW_OUTcms'], args.subbasin, cache=not args.nocache)
     
     # filter the subbasins
     df_filter = swat_reader.filter(df_out, args.subbasin, ["FLOW_OUTcms"])
@@ -63,7 +67,7 @@ if __name__ == '__main__':
     length_label = dict(m='meter$^3$', f='feet$^3$', af='acre-feet')
 
 
-    df_filter *= length_factor[args.unit] * time_factor[args.timeunit]
+    df_filter *= length_factor[args.lengthunit] * time_factor[args.timeunit]
     df_filter.columns = ['Simulated']
     # print('df_fileter:\n', df_filter)
     # download the USGS data
@@ -76,25 +80,23 @@ if __name__ == '__main__':
     if not os.path.exists(output_dir):
         os.mkdir(output_dir)
     
+    # download the USGS data of all the gauges at once
+    flows, gauge_names = read_usgs_flows(args.usgs, '{:%Y-%m-%d}'.format(start_date), '{:%Y-%m-%d}'.format(end_date), 'D',
+                                         None if args.nousgscache else args.usgscache, args.offline)
     for s, u in zip(args.subbasin, args.usgs):
         
         # read flow
         
         # read flow
-        flow, gauge_names  = read_usgs_flow([u], '{:%Y-%m-%d}'.format(start_date), '{:%Y-%m-%d}'.format(end_date), 'D')
-        flow = flow.iloc[:, 1]
+        flow = flows[u].iloc[:, 1]
         flow.index = pd.DatetimeIndex(flow.index)
-        if swatreader.cio['IPRINT'] == '0': # monthly output
+        if swatreader.config.iprint == 0: # monthly output
             flow = pd.to_numeric(flow).resample('M').mean()
-        elif swatreader.cio['IPRINT'] == '1':
+        elif swatreader.config.iprint == 1:
             pass
         else:
-            raise NotImplementedError('IPRINT is {} for annual output.\nPlotting annual output is not supported.'.format(args.iprint))
+            raise NotImplementedError('IPRINT is {} for annual output.\nPlotting annual output is not supported.'.format(swatreader.config.iprint))
         
-
-        
-     
-        df_filter.loc[s].plot(ax=ax, label='Simulated', legend=True, linewidth=args.slw, linestyle=args.sls)
         csv = df_filter.loc[s]
         csv.columns = ['Simulated']
         
@@ -102,19 +104,18 @@ if __name__ == '__main__':
             
             observed = flow
                 
-            observed = pd.to_numeric(observed, errors='coerce').dropna() * length_factor_usgs[args.unit]
+            observed = pd.to_numeric(observed, errors='coerce').dropna() * length_factor_usgs[args.lengthunit]
             observed.index = pd.DatetimeIndex(observed.index)            
-            observed.plot( ax=ax, label='Observed',  legend=True, linewidth=args.olw, linestyle=args.ols)
             observed.name = 'Observed'
             csv = pd.concat([csv, observed], axis=1)
         
-        if args.log:
-            ax.set_yscale('log')
-        ax.set_title(gauge_names[u])
-        ax.set_xlabel('Time')
-        ax.set_ylabel('Streamflow ({}/{})'.format(length_label[args.unit], time_label[args.timeunit]))
-        fig.savefig(os.path.join(args.output, '{}{}.png'.format(args.prefix, s)), dpi=300)
         csv.to_csv(os.path.join(args.output, '{}{}.csv'.format(args.prefix, s)))
 
-    print('Plots are generated successfully at {}'.format(os.path.abspath(args.output)))
+    # goodness-of-fit metrics of all the gauges at once
+    metrics = gauge_metrics(simulated_matrix(df_filter, 'Simulated')[args.subbasin], flows, args.usgs,
+                            length_factor_usgs[args.lengthunit] * time_factor[args.timeunit],
+                            'M' if swatreader.config.iprint == 0 else None, args.metricfreq, min_count=args.n)
+    metrics.to_csv(os.path.join(args.output, '{}metrics.csv'.format(args.prefix)))
+    print(metrics.to_string(float_format='{:.3f}'.format))
 
+    print('CSV files are saved successfully at {}'.format(os.path.abspath(args.output)))
@@ -14,6 +14,7 @@ usage:
 
 from swat_reader import swat_reader
 import argparse
+import pandas as pd
 import os
 
 
@@ -34,6 +35,11 @@ if __name__ == '__main__':
                         Reference: https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html#resampling
                         ''')
     parser.add_argument('-f', '--freq', help='aggreation/resample frequency.')
+    parser.add_argument('--nocache', action='store_true', help='Parse output.rch again instead of loading it from the cache next to TxtInOut.')
+    parser.add_argument('-c', '--chunk', type=int, metavar='timesteps', help='''
+                        Stream output.rch in blocks of this many time steps to limit the memory use; with -f the blocks are
+                        aggregated as they are read, without it the kept rows are the output and are held until saved.
+                        output.rch is always parsed (no cache), so --nocache cannot be combined with it.''')
     
     # parser.print_help()
     # args = parser.parse_args('D:\\WorkSync\\CPNRD-UnSWAT\\ArcSWAT_2021\\Scenarios\\Default-Irrigation\\TxtInOut -b 1 2 -v FLOW_OUTcms FLOW_INcms -f M -s mean sum'.split())
@@ -43,6 +49,8 @@ if __name__ == '__main__':
     
     # make sure the correct resampling arguments are used
     assert (args.stat is None) == (args.freq is None), 'The freq and stat arguments need to both be specified to calculate statistics.'
+    if args.chunk is not None and args.nocache:
+        parser.error('--chunk always parses output.rch without the cache; drop --nocache.')
     if args.stat is not None:
         if len(args.stat) == 1:
             args.stat = args.stat * len(args.variable)
@@ -51,13 +59,30 @@ if __name__ == '__main__':
          
     # read the output.rch file:
     swatreader = swat_reader(args.TxtInOut)
-    df_out = swatreader.read_rch()
     
-    # filter and aggregate if specified
-    df_save = swat_reader.filter(df_out, args.subbasin, args.variable, args.freq, args.stat)
-   
-    # save the csv
-    df_out.to_csv('.'.join(args.output.split('.')[:-1] + ['all','csv']))
+    if args.chunk is None:
+        df_out = swatreader.read_rch(cache=not args.nocache)
+        
+        # filter and aggregate if specified
+        df_save = swat_reader.filter(df_out, args.subbasin, args.variable, args.freq, args.stat)
+       
+        # save the csv
+        df_out.to_csv('.'.join(args.output.split('.')[:-1] + ['all','csv']))
+    else:
+        # write the blocks to the csv as they are read and only keep the desired subbasins and variables
+        df_keep = []
+        with open('.'.join(args.output.split('.')[:-1] + ['all','csv']), 'w', newline='') as f:
+            def blocks():
+                for i, df_out in enumerate(swatreader.iter_rch(args.chunk)):
+                    df_out.to_csv(f, header=i == 0)
+                    yield df_out
+            
+            # filter and aggregate each block as it is read
+            for df_block in swat_reader.filter_blocks(blocks(), args.subbasin, args.variable, args.freq, args.stat):
+                df_keep.append(df_block)
+        
+        df_save = pd.concat(df_keep).sort_index()
+    
     df_save.to_csv(args.output)
     
     
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+This script aggregate dense SWAT outputs over time bins with NumPy.
+
+SWAT prints every unit at every time step, so a filtered output is a dense
+(time, unit, variable) grid. The resampling bins are computed once for the
+shared time axis and every statistic is a vectorized reduction over the time
+axis of the whole grid (e.g. np.add.reduceat), instead of a pandas
+groupby().resample() per unit.
+
+usage:
+    starts, counts, labels = time_bins(times, 'M')
+    monthly = bin_reduce(grid, starts, counts, 'mean')
+"""
+
+
+import numpy as np
+import pandas as pd
+
+
+# statistics computed by bin_reduce
+STATS = ('sum', 'mean', 'std', 'sem', 'max', 'min', 'first', 'last')
+
+
+def time_bins(times, freq):
+    '''
+    resampling bins of a sorted time axis
+
+    Parameters
+    ----------
+    times : DatetimeIndex
+        the sorted, unique time steps.
+    freq : str
+        the pandas resampling frequency, e.g. 'M'.
+
+    Returns
+    -------
+    starts : ndarray
+        position of the first time step of each bin.
+    counts : ndarray
+        number of time steps in each bin (0 for empty bins).
+    labels : DatetimeIndex
+        the bin labels, as given by pandas resample.
+
+    '''
+    counts = pd.Series(np.ones(len(times)), index=times).resample(freq).count()
+    n = counts.values.astype(np.int64)
+    starts = np.concatenate([[0], np.cumsum(n)[:-1]]).astype(np.int64)
+    return starts, n, counts.index
+
+
+def bin_reduce(grid, starts, counts, stat):
+    '''
+    reduce a grid over its first (time) axis for every bin
+
+    Parameters
+    ----------
+    grid : ndarray
+        array of shape (time, ...) without NaN.
+    starts, counts : ndarray
+        the bins, see time_bins.
+    stat : str
+        one of STATS; the results follow pandas: empty bins give 0 for sum and NaN
+        otherwise, std and sem use one degree of freedom.
+
+    Returns
+    -------
+    ndarray of shape (bins, ...)
+
+    '''
+    assert stat in STATS, 'Unknown statistic {}, use one of {}'.format(stat, STATS)
+    empty = counts == 0
+    # reduceat needs valid indices; empty bins are masked afterwards
+    idx = np.minimum(starts, len(grid) - 1)
+    shape = (-1,) + (1,) * (grid.ndim - 1)
+    n = counts.reshape(shape).astype(np.float64)
+
+    if stat == 'first':
+        res = grid[idx].astype(np.float64)
+    elif stat == 'last':
+        res = grid[np.maximum(starts + counts - 1, 0)].astype(np.float64)
+    elif stat == 'max':
+        res = np.maximum.reduceat(grid, idx, axis=0).astype(np.float64)
+    elif stat == 'min':
+        res = np.minimum.reduceat(grid, idx, axis=0).astype(np.float64)
+    else:
+        total = np.add.reduceat(grid, idx, axis=0, dtype=np.float64)
+        total[empty] = 0.
+        if stat == 'sum':
+            return total
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / n
+            if stat == 'mean':
+                res = mean
+            else:
+                # two-pass variance: deviations from the bin means
+                dev = grid - np.repeat(np.where(empty.reshape(shape), 0., mean), counts, axis=0)
+                var = np.add.reduceat(dev * dev, idx, axis=0) / (n - 1)
+                var[counts < 2] = np.nan
+                res = np.sqrt(var) if stat == 'std' else np.sqrt(var / n)
+
+    res[empty] = np.nan
+    return res
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+This script keep a persistent cache of parsed SWAT output files.
+
+A parsed output (e.g. output.rch) is stored as one .npy file per column in a
+"<TxtInOut>.cache" folder next to the TxtInOut folder. The cache is keyed by
+the path, size and modification time of the output file and by the file.cio
+settings that shape the parsed table, so it is rebuilt automatically whenever
+SWAT rewrites the output. Columns are memory-mapped when loaded.
+
+Every save writes a new version folder inside the cache folder and then
+switches the "current" pointer file to it with one atomic rename, so a
+reader in another process (e.g. the ScenarioSet or swat_run pools) sees
+either the old or the new cache, never a missing or half-written one.
+
+usage:
+    cache = output_cache(TxtInOut, 'output.rch', swatreader.cio)
+    if cache.valid():
+        df = cache.load(['FLOW_OUTcms'], [1, 5])
+"""
+
+
+import os
+import json
+import time
+import shutil
+import numpy as np
+import pandas as pd
+
+
+# file.cio settings that change how an output file is parsed
+CACHE_CIO_KEYS = ('ICALEN', 'IPRINT', 'NYSKIP', 'IYR', 'NBYR', 'IDAF', 'IDAL')
+
+# the file in a cache folder naming its current version folder
+CURRENT = 'current'
+
+
+def cache_dir(TxtInOut):
+    '''
+    the cache folder of a TxtInOut folder
+    '''
+    return os.path.normpath(os.path.abspath(TxtInOut)) + '.cache'
+
+
+def fingerprint(fpath, cio):
+    '''
+    the key identifying an output file and the settings it was parsed with
+    '''
+    st = os.stat(fpath)
+    key = dict(path=os.path.abspath(fpath), size=st.st_size, mtime=st.st_mtime_ns)
+    key.update({k: str(cio.get(k)) for k in CACHE_CIO_KEYS})
+    return key
+
+
+def current_version(path):
+    '''
+    the current version folder of a cache folder written by publish_version; None if there is none
+    '''
+    try:
+        with open(os.path.join(path, CURRENT)) as f:
+            version = os.path.join(path, f.read().strip())
+    except OSError:
+        return None
+    return version if os.path.isdir(version) else None
+
+
+def publish_version(path, tmp):
+    '''
+    move a fully written folder into the cache folder path as its new version
+
+    The pointer file is replaced by an atomic rename, so readers never see
+    the cache missing; the older versions are deleted afterwards, and a
+    reader still loading one of them finds its files gone and reads the
+    new version or the source file instead.
+
+    Returns
+    -------
+    str, the new version folder.
+
+    '''
+    os.makedirs(path, exist_ok=True)
+    name = 'v{}.{}'.format(time.time_ns(), os.getpid())
+    version = os.path.join(path, name)
+    os.rename(tmp, version)
+    pointer = os.path.join(path, CURRENT + '.tmp{}'.format(os.getpid()))
+    with open(pointer, 'w') as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(path, CURRENT))
+
+    # the versions replaced since, and the files of the former layout without versions
+    keep = {CURRENT, name, os.path.basename(current_version(path) or name)}
+    for f in os.listdir(path):
+        if f not in keep and not f.startswith(CURRENT + '.tmp'):
+            if os.path.isdir(os.path.join(path, f)):
+                shutil.rmtree(os.path.join(path, f), ignore_errors=True)
+            else:
+                try:
+                    os.remove(os.path.join(path, f))
+                except OSError:
+                    pass
+    return version
+
+
+class output_cache():
+    '''
+    column store of one parsed SWAT output file
+    '''
+
+    def __init__(self, TxtInOut, fname, cio):
+        '''
+        Parameters
+        ----------
+        TxtInOut : str
+            TxtInOut directory path.
+        fname : str
+            the output file name, e.g. output.rch.
+        cio : dict
+            the file.cio settings (swat_reader.cio).
+
+        '''
+        self.fpath = os.path.join(TxtInOut, fname)
+        self.path = os.path.join(cache_dir(TxtInOut), fname)
+        self.cio = cio
+        self._meta = None
+        # the version folder read by meta, load and column
+        self.version = None
+
+    def __repr__(self):
+        return 'Cache of {} at {}'.format(self.fpath, self.path)
+
+    @property
+    def meta(self):
+        if self._meta is None:
+            self.version = current_version(self.path)
+            with open(os.path.join(self.version, 'meta.json')) as f:
+                self._meta = json.load(f)
+        return self._meta
+
+    def valid(self):
+        '''
+        whether the cache exists and matches the current output file
+        '''
+        if current_version(self.path) is None or not os.path.exists(self.fpath):
+            return False
+        self._meta = None
+        try:
+            return self.meta['key'] == fingerprint(self.fpath, self.cio)
+        except OSError:
+            # replaced by another process meanwhile
+            return False
+
+    def column(self, i):
+        return np.load(os.path.join(self.version, 'col{:03d}.npy'.format(i)), mmap_mode='r')
+
+    def load(self, columns=None, reaches=None):
+        '''
+        load the cached table
+
+        Parameters
+        ----------
+        columns : list, optional
+            the variables to load. The default is all variables.
+        reaches : list, optional
+            the units (first column) to load. The default is all units.
+
+        Returns
+        -------
+        DataFrame of the unit column and the variables indexed by time.
+
+        '''
+        names = self.meta['columns']
+        columns = names[1:] if columns is None else list(columns)
+        unknown = [c for c in columns if c not in names[1:]]
+        assert len(unknown) == 0, 'Unknown {} variables: {}'.format(os.path.basename(self.fpath), unknown)
+
+        unit = self.column(0)
+        rows = slice(None) if reaches is None else np.flatnonzero(np.isin(unit, reaches))
+        index = pd.DatetimeIndex(np.load(os.path.join(self.version, 'time.npy'))[rows], name=self.meta['index_name'])
+
+        dat = pd.DataFrame({c: np.asarray(self.column(names.index(c))[rows]) for c in columns}, index=index, columns=columns)
+        dat.insert(0, names[0], np.asarray(unit[rows]))
+        return dat
+
+    def save(self, dat, key=None):
+        '''
+        store a parsed table (unit column first, time index) as a new version
+        of the cache, see publish_version.
+
+        key should be the fingerprint taken before the output file was parsed,
+        so a file rewritten in the meantime is not cached under its new key.
+        '''
+        key = fingerprint(self.fpath, self.cio) if key is None else key
+        tmp = self.path + '.tmp{}'.format(os.getpid())
+        if os.path.exists(tmp):
+            shutil.rmtree(tmp)
+        os.makedirs(tmp)
+
+        np.save(os.path.join(tmp, 'time.npy'), dat.index.values)
+        for i, c in enumerate(dat.columns):
+            np.save(os.path.join(tmp, 'col{:03d}.npy'.format(i)), dat[c].values)
+        meta = dict(key=key, columns=list(dat.columns), index_name=dat.index.name)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+
+        self.version = publish_version(self.path, tmp)
+        self._meta = meta
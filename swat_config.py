@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+This script read the model configuration of a SWAT TxtInOut from file.cio.
+
+The settings are found by their key (value | KEY : description) instead of
+their line number, so file.cio of other SWAT versions with added or missing
+lines are read as well, and the values are typed once: integers, floats and
+file names. The file lists (the weather files and the output variables) are
+read from the lines under their section titles.
+
+The configurations are cached per TxtInOut and reused while file.cio keeps
+its modification time, size and inode, so tools creating a swat_reader for
+thousands of scenarios parse every file.cio once.
+
+usage:
+    config = read_config(TxtInOut)
+    config.iprint, config.nyskip, config.pcp_files
+    config['REXP']
+"""
+
+
+import os
+import pandas as pd
+
+
+# the lists under the section titles of file.cio: {title: attribute}
+CIO_LISTS = {'Precipitation Files': 'pcp_files', 'Temperature Files': 'tmp_files',
+             'Reach output variables': 'rch_vars', 'Subbasin output variables': 'sub_vars',
+             'HRU output variables': 'hru_vars', 'HRU data to be printed': 'hru_print'}
+
+# the output time step of IPRINT as a pandas frequency
+IPRINT_FREQ = {0: 'M', 1: 'D', 2: 'A'}
+
+# the maximum number of cached configurations
+CACHE_SIZE = 4096
+
+_cache = dict()
+
+
+def cio_value(text):
+    '''
+    a file.cio value typed as int, float or str (file names)
+    '''
+    text = text.strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+class ModelConfig():
+    '''
+    the typed settings of file.cio
+    '''
+
+    def __init__(self, TxtInOut, text):
+        '''
+        Parameters
+        ----------
+        TxtInOut : str
+            the TxtInOut directory.
+        text : str
+            the content of file.cio.
+
+        '''
+        self.TxtInOut = TxtInOut
+        # the value texts as written, e.g. for swat_reader.cio
+        self.raw = dict()
+        self.lists = dict()
+        section = None
+        for l in text.splitlines():
+            if '|' in l:
+                val, key = l.split('|', 1)
+                self.raw[key.split(':')[0].strip()] = val.strip()
+                section = None
+            elif l.strip().endswith(':'):
+                section = l.strip()[:-1].strip()
+                self.lists[section] = []
+            elif section is not None:
+                self.lists[section].extend(l.split())
+        self.values = {k: cio_value(v) for k, v in self.raw.items()}
+
+        for title, name in CIO_LISTS.items():
+            items = self.lists.get(title)
+            if name.endswith('_files'):
+                setattr(self, name, items)
+            else:
+                # SWAT prints all variables if none is selected
+                setattr(self, name, None if items is None else [int(v) for v in items if int(v) != 0])
+
+        self.nbyr, self.iyr = self.values['NBYR'], self.values['IYR']
+        self.idaf, self.idal = self.values['IDAF'], self.values['IDAL']
+        self.iprint, self.nyskip = self.values['IPRINT'], self.values['NYSKIP']
+        self.icalen = self.values.get('ICALEN', 0)
+
+        # the first printed day is January 1 of the first year after the skipped ones
+        self.output_start_date = pd.Timestamp(year=self.iyr + self.nyskip, month=1, day=1) + \
+                                 pd.Timedelta(0 if self.nyskip > 0 else self.idaf - 1, 'D')
+        self.output_end_date = pd.Timestamp(year=self.iyr + self.nbyr - 1, month=1, day=1) + pd.Timedelta(self.idal - 1, 'D')
+
+    def __repr__(self):
+        return 'file.cio of {}: {} years from {}, IPRINT={}, NYSKIP={}, ICALEN={}'.format(
+            self.TxtInOut, self.nbyr, self.iyr, self.iprint, self.nyskip, self.icalen)
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    @property
+    def calendar(self):
+        '''
+        whether the outputs are printed with calendar dates (ICALEN=1)
+        '''
+        return self.icalen == 1
+
+    @property
+    def freq(self):
+        '''
+        the output time step (IPRINT) as a pandas frequency: M, D or A
+        '''
+        return IPRINT_FREQ[self.iprint]
+
+
+def read_config(TxtInOut):
+    '''
+    the ModelConfig of a TxtInOut, parsed once while file.cio is unchanged
+
+    Parameters
+    ----------
+    TxtInOut : str
+        the TxtInOut directory.
+
+    Returns
+    -------
+    ModelConfig, shared by the callers; do not modify it.
+
+    '''
+    fpath = os.path.join(TxtInOut, 'file.cio')
+    st = os.stat(fpath)
+    # a file replaced by a rename has a new inode even with the same time and size
+    stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+    path = os.path.abspath(TxtInOut)
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with open(fpath) as f:
+        config = ModelConfig(TxtInOut, f.read())
+    if len(_cache) >= CACHE_SIZE:
+        del _cache[next(iter(_cache))]
+    _cache[path] = (stamp, config)
+    return config
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+This script hold SWAT outputs as a dense (time, unit, variable) array.
+
+SWAT prints every unit (reach, subbasin or HRU) at every time step, so an
+output is stored as one contiguous array with the time steps, unit numbers
+and variable names as light index metadata, instead of a long DataFrame
+with a repeated DatetimeIndex. Units and variables are looked up in dicts and
+date ranges by binary search; single units, variables and date ranges are
+NumPy views of the array. Pandas objects are only built on demand.
+
+usage:
+    cube = swatreader.read_rch_cube(['FLOW_OUTcms'], [3, 12])
+    flow = cube.series(3, 'FLOW_OUTcms')
+    monthly = cube.resample('M', ['mean']).to_frame()
+"""
+
+
+import numpy as np
+import pandas as pd
+
+from swat_aggregate import STATS, time_bins, bin_reduce
+
+
+def grid_layout(ids, times):
+    '''
+    check that records ordered by time form a dense (time, unit) grid
+
+    Parameters
+    ----------
+    ids : ndarray
+        the unit number of each record.
+    times : ndarray
+        the time of each record.
+
+    Returns
+    -------
+    (nt, nu, order, units, times) where order sorts the units of a time step,
+    or None if the records are not a dense grid.
+
+    '''
+    n = len(ids)
+    if n == 0:
+        return None
+    times = np.asarray(times)
+    change = times != times[0]
+    nu = np.argmax(change) if change.any() else n
+    if n % nu != 0:
+        return None
+    nt = n // nu
+
+    ids = np.asarray(ids).reshape(nt, nu)
+    times = times.reshape(nt, nu)
+    if (ids != ids[0]).any() or (times != times[:, :1]).any() or len(np.unique(ids[0])) != nu:
+        return None
+    times = pd.DatetimeIndex(times[:, 0])
+    if not times.is_monotonic_increasing or not times.is_unique:
+        return None
+
+    order = np.argsort(ids[0], kind='stable')
+    return nt, nu, order, ids[0][order], times
+
+
+def dense_grid(df_filter, unit, vars):
+    '''
+    reshape a filtered output (unit column, time index) into a (time, unit, variable) array
+
+    Returns
+    -------
+    grid, units, times, or None if the records are not a dense grid without
+    missing values.
+
+    '''
+    layout = grid_layout(df_filter[unit].values, df_filter.index.values)
+    if layout is None:
+        return None
+    nt, nu, order, units, times = layout
+    grid = df_filter[vars].to_numpy().reshape(nt, nu, len(vars))[:, order]
+    if np.issubdtype(grid.dtype, np.floating) and np.isnan(grid).any():
+        return None
+    return grid, units, times
+
+
+class SwatOutputCube():
+    '''
+    a SWAT output as a (time, unit, variable) array
+    '''
+
+    def __init__(self, values, times, units, variables, unit='RCH'):
+        '''
+        Parameters
+        ----------
+        values : ndarray
+            array of shape (time, unit, variable).
+        times : DatetimeIndex
+            the sorted time steps.
+        units : array-like
+            the unit numbers.
+        variables : list
+            the variable names.
+        unit : str, optional
+            the name of the unit column. The default is 'RCH'.
+
+        '''
+        self.values = values
+        self.times = pd.DatetimeIndex(times, name='time')
+        self.units = np.asarray(units)
+        self.variables = list(variables)
+        self.unit = unit
+        assert values.shape == (len(self.times), len(self.units), len(self.variables)), \
+            'The values of shape {} do not match {} times, {} units and {} variables.'.format(values.shape, len(self.times), len(self.units), len(self.variables))
+        self.unit_index = {u: i for i, u in enumerate(self.units.tolist())}
+        self.var_index = {v: i for i, v in enumerate(self.variables)}
+
+    def __repr__(self):
+        return 'SWAT output of {} {}s x {} variables from {:%Y-%m-%d} to {:%Y-%m-%d} ({:.1f} MB)'.format(
+            len(self.units), self.unit, len(self.variables), self.times[0], self.times[-1], self.values.nbytes / 2**20)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @classmethod
+    def from_frame(cls, df_out, vars=None, dtype=None):
+        '''
+        build a cube from a DataFrame returned by swat_reader.read_rch/read_sub/read_hru
+
+        Parameters
+        ----------
+        df_out : DataFrame
+            the unit column followed by the variables, indexed by time.
+        vars : list, optional
+            the variables to keep. The default is all.
+        dtype : numpy dtype, optional
+            e.g. np.float32 to halve the memory use. The default keeps the data type.
+
+        '''
+        unit = df_out.columns[0]
+        vars = list(df_out.columns[1:]) if vars is None else list(vars)
+        layout = grid_layout(df_out[unit].values, df_out.index.values)
+        assert layout is not None, 'The output is not a dense grid of time steps and {}s.'.format(unit)
+        nt, nu, order, units, times = layout
+        values = df_out[vars].to_numpy(dtype=dtype).reshape(nt, nu, len(vars))[:, order]
+        return cls(np.ascontiguousarray(values), times, units, vars, unit)
+
+    def position(self, units=None, variables=None):
+        '''
+        positions of units and variables; scalars give scalar positions
+        '''
+        iu = slice(None) if units is None else \
+             self.unit_index[units] if np.isscalar(units) else [self.unit_index[u] for u in units]
+        iv = slice(None) if variables is None else \
+             self.var_index[variables] if isinstance(variables, str) else [self.var_index[v] for v in variables]
+        return iu, iv
+
+    def time_slice(self, start=None, end=None):
+        '''
+        the positions of the time steps from start to end (both included)
+        '''
+        i0 = 0 if start is None else self.times.searchsorted(pd.Timestamp(start), 'left')
+        i1 = len(self.times) if end is None else self.times.searchsorted(pd.Timestamp(end), 'right')
+        return slice(i0, i1)
+
+    def sel(self, units=None, variables=None, start=None, end=None):
+        '''
+        select units, variables and a date range
+
+        Returns
+        -------
+        SwatOutputCube; a view of this cube unless lists of units or variables are given.
+
+        '''
+        iu, iv = self.position(units, variables)
+        iu = slice(iu, iu + 1) if np.isscalar(iu) else iu
+        iv = slice(iv, iv + 1) if np.isscalar(iv) else iv
+        it = self.time_slice(start, end)
+        values = self.values[it][:, iu][:, :, iv]
+        return SwatOutputCube(values, self.times[it], self.units[iu], np.array(self.variables)[iv].tolist(), self.unit)
+
+    def series(self, unit, variable, start=None, end=None):
+        '''
+        the time series of one variable of one unit as a pandas Series (a view)
+        '''
+        it = self.time_slice(start, end)
+        return pd.Series(self.values[it, self.unit_index[unit], self.var_index[variable]], index=self.times[it], name=variable, copy=False)
+
+    def frame(self, unit, start=None, end=None):
+        '''
+        all variables of one unit as a DataFrame indexed by time
+        '''
+        it = self.time_slice(start, end)
+        return pd.DataFrame(self.values[it, self.unit_index[unit]], index=self.times[it], columns=self.variables)
+
+    def resample(self, freq, stat):
+        '''
+        aggregate over time bins, see swat_reader.filter
+
+        Parameters
+        ----------
+        freq : str
+            the resampling frequency, e.g. M for monthly.
+        stat : list
+            the aggregation method of each variable (one method applies to all).
+
+        '''
+        stat = list(stat) * len(self.variables) if len(stat) == 1 else list(stat)
+        assert len(stat) >= len(self.variables), 'The stat method numbers need to match the variable number.'
+        assert set(stat) <= set(STATS), 'Unknown statistics {}, use one of {}'.format(set(stat) - set(STATS), STATS)
+        starts, counts, labels = time_bins(self.times, freq)
+        values = np.stack([bin_reduce(self.values[:, :, i], starts, counts, s) for i, s in enumerate(stat[:len(self.variables)])], axis=2)
+        return SwatOutputCube(values, labels, self.units, self.variables, self.unit)
+
+    def to_frame(self):
+        '''
+        the long DataFrame indexed by unit and time, as returned by swat_reader.filter
+        '''
+        values = self.values.transpose(1, 0, 2).reshape(len(self.units) * len(self.times), len(self.variables))
+        index = pd.MultiIndex.from_product([self.units, self.times], names=[self.unit, 'time'])
+        return pd.DataFrame(values, index=index, columns=self.variables)
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """
-This script read a SWAT output.rch file and plot against USGS observed flow.
+This script draw dot plots of a SWAT-CUP iteration from the summaries of goal.txt.
 
 Created on Fri Feb 14 00:21:31 2020
 
@@ -13,20 +13,23 @@ usage:
 
 
 
-import pandas as pd
 import argparse
 import os
-import matplotlib.pyplot as plt
 
+from swat_cup_goal import read_goal
+from swat_render import render, draw_envelope, draw_points
 
-print(plt.style.available)
-plt.style.use('fivethirtyeight')
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Create dot plots of SWAT-CUP calibration')
     parser.add_argument('goalfile', help='The file path to goal.txt, required.')
     parser.add_argument('-o', '--output',  default='.', metavar='output_dir', help='Output directory for plots (default: %(default)s).')
     parser.add_argument('-p', '--prefix',  default='', help='Prefix for plot file names')
+    parser.add_argument('-b', '--bins', type=int, default=40, help='Number of bins of each parameter range (default: %(default)s).')
+    parser.add_argument('-t', '--threshold', type=float, default=0.5, help='Objective value of the behavioral simulations (default: %(default)s).')
+    parser.add_argument('--minimize', action='store_true', help='Smaller objective values are better (e.g. PBIAS, SSQR).')
+    parser.add_argument('--points', action='store_true', help='Plot every simulation as a dot instead of the binned summaries.')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Number of processes drawing the plots (default: the number of CPUs).')
 
         
     
@@ -39,14 +42,21 @@ if __name__ == '__main__':
     if not os.path.exists(output_dir):
         os.mkdir(output_dir)
         
-    # read the output.rch file:
-    goal = pd.read_csv(args.goalfile, sep=' ', index_col=0, skipinitialspace=True, skiprows=3)
+    # read goal.txt and summarize every parameter at once
+    goal = read_goal(args.goalfile, maximize=not args.minimize)
+    ranges = goal.behavioral_ranges(args.threshold)
+    spearman = goal.rank_correlations()
+    edges, envelope = goal.envelopes(args.bins)
+    ranges.join(spearman).to_csv(os.path.join(output_dir, '{}summary.csv'.format(args.prefix)))
     
-    for i in range(goal.shape[1] - 1):
-        parname = goal.iloc[:, i].name
-        fig, ax = plt.subplots(figsize=(7, 4))
-        ax.scatter(goal.iloc[:, i], goal['goal_value'], s=10)
-        ax.set_xlabel(parname)
-        ax.set_ylabel('Objective function')
-        fig.savefig(os.path.join(output_dir, '{}{}.png'.format(args.prefix, parname.replace(':', '_'))), dpi=300, bbox_inches='tight')
-        
\ No newline at end of file
+    # one job per parameter with only the arrays of that parameter
+    jobs = []
+    for i, parname in enumerate(goal.params):
+        fpath = os.path.join(output_dir, '{}{}.png'.format(args.prefix, parname.replace(':', '_')))
+        if args.points:
+            jobs.append((draw_points, fpath, dict(x=goal.values[:, i], y=goal.goal, xlabel=parname, ylabel='Objective function')))
+        else:
+            jobs.append((draw_envelope, fpath, dict(parname=parname, edges=edges[i], envelope={k: v[i] for k, v in envelope.items()},
+                                                   behavioral=(ranges['min'].iloc[i], ranges['max'].iloc[i]),
+                                                   best=ranges['best'].iloc[i], spearman=spearman.iloc[i], maximize=not args.minimize)))
+    render(jobs, figsize=(7, 4), dpi=300, style='fivethirtyeight', processes=args.jobs)
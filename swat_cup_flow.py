@@ -16,16 +16,47 @@ usage:
 import pandas as pd
 import argparse
 from swat_reader import swat_reader
-from usgs_water_data_reader import read_usgs_flow
+from usgs_water_data_reader import read_usgs_flows, DEFAULT_CACHE_DIR
 import numpy as np
 import os
 from collections import OrderedDict
 #%%
-def write_observed_rch(filename, flows):
+def format_observed(flows):
     '''
-    write the RCH calibration file for SWAT-CUP
+    format the observations once for all the SWAT-CUP observation files
+
+    The values are converted to text in one vectorized NumPy call (the same
+    shortest repr as to_csv) and the date labels (FLOW_OUT_yymmdd) are computed
+    from the date fields as integers; the rows of a reach are then joined into
+    one block that every file reuses.
+
+    Parameters
+    ----------
+    flows : dict
+        {reach: Series of the observed values indexed by date}
+
+    Returns
+    -------
+    dict of {reach: (number of rows, "number<tab>label<tab>value" rows, "number<tab>value" rows)}
+
+    '''
+    blocks = OrderedDict()
+    for k, v in flows.items():
+        dates = pd.DatetimeIndex(v.index)
+        number = range(1, len(v) + 1)
+        yymmdd = (dates.year % 100 * 10000 + dates.month * 100 + dates.day).values.tolist()
+        value = np.asarray(v.values, dtype=np.float64).astype(str).tolist()
+        rows = ''.join(map('{}\tFLOW_OUT_{:06d}\t{}\n'.format, number, yymmdd, value))
+        glue = ''.join(map('{}\t{}\n'.format, number, value))
+        blocks[k] = (len(v), rows, glue)
+    return blocks
+
+
+def write_observed_rch(filename, blocks):
     '''
-    header = '{:<6}: number of observed variables\n\n'.format(len(flows))
+    write the RCH calibration file for SWAT-CUP from format_observed blocks
+    '''
+    header = '{:<6}: number of observed variables\n\n'.format(len(blocks))
     station_head = 'FLOW_OUT_{:<4}: this is the name of the variable and the subbasin number to be included in the objective function\n' +\
     '{:<6}: number of data points for this variable as it follows below. First column is a sequential number from beginning\n'+\
     '      : of the simulation, second column is variable name and date (format arbitrary), third column is variable value.\n\n'
@@ -33,20 +64,20 @@ def write_observed_rch(filename, flows):
     with open(filename, 'w') as f:
         f.write(header)
         
-        for k, v in flows.items():
-            f.write(station_head.format(k, len(v)))
-            v.to_csv(f, sep='\t', index=True, header=False, mode='a', line_terminator='\n')
+        for k, (n, rows, glue) in blocks.items():
+            f.write(station_head.format(k, n))
+            f.write(rows)
             f.write('\n\n')
 
 #write_observed_rch(os.path.join(args.output, 'Observed_rch.txt'), ob)
 
 #%%
 
-def write_observed_txt(filename, flows):
+def write_observed_txt(filename, blocks, weights):
     '''
-    write the RCH calibration file for SWAT-CUP
+    write the Observed.txt calibration file for SWAT-CUP from format_observed blocks
     '''
-    header = '{:<6}: number of observed variables\n'.format(len(flows)) +\
+    header = '{:<6}: number of observed variables\n'.format(len(blocks)) +\
         '5     : Objective function type, 1=mult,2=sum,3=r2,4=chi2,5=NS,6=br2,7=ssqr,8=PBIAS,9=KGE,10=RSR,11=MNS\n' +\
         '0.5   : min value of objective function threshold for the behavioral solutions\n' +\
         '1     : if objective function is 11=MNS (modified NS),indicate the power, p.\n\n\n\n' 
@@ -64,9 +95,9 @@ def write_observed_txt(filename, flows):
     with open(filename, 'w') as f:
         f.write(header)
         
-        for k, v in flows.items():
-            f.write(station_head.format(k, v.weight, -1, -1, 1, 1, 10, len(v)))
-            v.to_csv(f, sep='\t', index=True, header=False, line_terminator='\n')
+        for k, (n, rows, glue) in blocks.items():
+            f.write(station_head.format(k, weights[k], -1, -1, 1, 1, 10, n))
+            f.write(rows)
             f.write('\n\n')
             
 
@@ -105,7 +136,7 @@ def write_extract_rch(filename, rchs, swatreader, nsub, start_date, end_date, ip
     with open(filename, 'w') as f:
         f.write('{:<15}: swat output file name\n'.format('output.rch'))
         f.write('{:<15}: number of variables to get\n'.format(1))
-        f.write('{:<15}: variable column number(s) in the swat output file (as many as the above number)\n'.format(9 if swatreader.cio['ICALEN'] == '1' else 7))
+        f.write('{:<15}: variable column number(s) in the swat output file (as many as the above number)\n'.format(9 if swatreader.config.calendar else 7))
         f.write('\n')
         f.write('{:<15}: total number of reaches (subbasins) in the project\n'.format(nsub))
         f.write('\n')
@@ -118,16 +149,36 @@ def write_extract_rch(filename, rchs, swatreader, nsub, start_date, end_date, ip
         f.write('')
         f.write('{:<15}: time step (1=daily, 2=monthly, 3=yearly)\n'.format(1 if int(iprint) == 1 else 2))
 
-def write_glue_obs(filename, flows):
+def write_glue_obs(filename, blocks):
     '''
-    write the GLUE_Obs.dat
+    write the GLUE_Obs.dat from format_observed blocks
     '''
     
     with open(filename, 'w') as f:
         f.write('number\tdata\n')
         
-        for k, v in flows.items():
-            v.iloc[:, -1].to_csv(f, sep='\t', index=True, header=False, line_terminator='\n')
+        for k, (n, rows, glue) in blocks.items():
+            f.write(glue)
+
+
+def write_observations(output_dir, flows, weights):
+    '''
+    format the observations once and write Observed_rch.txt, Observed.txt and GLUE_Obs.dat
+
+    Parameters
+    ----------
+    output_dir : str
+        the SWAT-CUP project folder.
+    flows : dict
+        {reach: Series of the observed values indexed by date}
+    weights : dict
+        {reach: weight of the reach in the objective function}
+
+    '''
+    blocks = format_observed(flows)
+    write_observed_rch(os.path.join(output_dir, 'Observed_rch.txt'), blocks)
+    write_observed_txt(os.path.join(output_dir, 'Observed.txt'), blocks, weights)
+    write_glue_obs(os.path.join(output_dir, 'GLUE_Obs.dat'), blocks)
             
 
 def write_var_file_name(filename, rchs):
@@ -153,6 +204,9 @@ if __name__ == '__main__':
     parser.add_argument('--nyskip', type=int,   default=2, help='number of years to skip output printing/summarization')
     parser.add_argument('-n', type=int,   default=100, metavar='minimum_number_record', help='The minimum observation record number of a gauge. \
                         If the number of record during the output period is smaller than this number, the usgs site will not included in the plot. (default: %(default)s).')
+    parser.add_argument('--usgscache', default=DEFAULT_CACHE_DIR, help='Folder of the cached USGS RDB files (default: %(default)s).')
+    parser.add_argument('--nousgscache', action='store_true', help='Download the USGS data without using the RDB cache.')
+    parser.add_argument('--offline', action='store_true', help='Only use the USGS RDB files in the cache folder.')
 
 
         
@@ -171,13 +225,13 @@ if __name__ == '__main__':
 
     CF2CM = 0.0283168
     
-    start_date = pd.Timestamp('{}-01-01'.format(int(swatreader.cio["IYR"])+int(args.nyskip))) + \
-                         pd.Timedelta(0 if args.nyskip>0 else int(swatreader.cio["IDAF"]) - 1, 'D')
-    end_date   = pd.Timestamp('{}-01-01'.format(int(swatreader.cio["IYR"])+int(swatreader.cio["NBYR"])-1)) + \
-                             pd.Timedelta(int(swatreader.cio["IDAL"]) -1, 'D')
+    start_date = pd.Timestamp('{}-01-01'.format(swatreader.config.iyr + args.nyskip)) + \
+                         pd.Timedelta(0 if args.nyskip>0 else swatreader.config.idaf - 1, 'D')
+    end_date   = pd.Timestamp('{}-01-01'.format(swatreader.config.iyr + swatreader.config.nbyr - 1)) + \
+                             pd.Timedelta(swatreader.config.idal - 1, 'D')
                              
     if not end_date.is_year_end:
-        end_date = pd.Timestamp('{}-12-31'.format(int(swatreader.cio["IYR"])+int(swatreader.cio["NBYR"])-2))
+        end_date = pd.Timestamp('{}-12-31'.format(swatreader.config.iyr + swatreader.config.nbyr - 2))
     
     # get subbasin number 
     nsub = np.count_nonzero(np.char.count(os.listdir(args.TxtInOut), '.sub')) - 1
@@ -187,11 +241,14 @@ if __name__ == '__main__':
         weight = weight * len(args.subbasin)
     
     ob = OrderedDict()
+    weights = dict()
+    # download the USGS data of all the gauges at once
+    flows, gauge_names = read_usgs_flows(args.usgs, '{:%Y-%m-%d}'.format(start_date), '{:%Y-%m-%d}'.format(end_date), 'D',
+                                         None if args.nousgscache else args.usgscache, args.offline)
     for s, u, w in zip(args.subbasin, args.usgs, weight):
 
         # read flow
-        flow, gauge_names  = read_usgs_flow([u], '{:%Y-%m-%d}'.format(start_date), '{:%Y-%m-%d}'.format(end_date), 'D')
-        flow = flow.iloc[:, 1]
+        flow = flows[u].iloc[:, 1]
         flow.index = pd.DatetimeIndex(flow.index)
         if args.iprint == 0: # monthly output
             flow = pd.to_numeric(flow).resample('M').mean()
@@ -205,20 +262,15 @@ if __name__ == '__main__':
         flow = pd.to_numeric(flow, errors='coerce') * CF2CM
         flow.dropna(inplace=True)
         
-        observed = flow.reset_index()
-        observed.index += 1
-        observed.iloc[:,0] = (observed.iloc[:, 0]).apply(lambda x: 'FLOW_OUT_{:%y%m%d}'.format(x))
-        observed.weight = w
-        ob[s] = observed
+        ob[s] = flow
+        weights[s] = w
     
     if not os.path.exists(args.output):
         os.mkdir(args.output)
         
-    write_observed_rch(os.path.join(args.output, 'Observed_rch.txt'), ob)
-    write_observed_txt(os.path.join(args.output, 'Observed.txt'), ob)
+    write_observations(args.output, ob, weights)
     write_var_file_rch(os.path.join(args.output, 'Var_file_rch.txt'), args.subbasin)
     write_extract_rch( os.path.join(args.output, 'SUFI2_Extract_Rch.txt'), args.subbasin, swatreader, nsub, start_date, end_date, args.iprint)
-    #write_glue_obs(os.path.join(args.output, 'GLUE_Obs.dat'), ob)
     write_var_file_name(os.path.join(args.output, 'Var_file_name.txt'), args.subbasin)
     
     
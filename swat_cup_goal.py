@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+This script read the goal.txt of a SWAT-CUP SUFI2 iteration and summarize it.
+
+goal.txt holds one row per simulation: the simulation number, the sampled
+value of every parameter and the objective function value. The numbers are
+tokenized in one call into a float32 array, and the summaries used by the dot
+plots (behavioral parameter ranges, rank correlations with the objective and
+binned objective envelopes) are computed for all parameters at once.
+
+usage:
+    goal = read_goal(r'Iterations\\Iter1\\Sufi2.Out\\goal.txt')
+    goal.behavioral_ranges(0.5)
+    goal.rank_correlations()
+    edges, envelope = goal.envelopes(bins=40)
+"""
+
+
+import re
+import numpy as np
+import pandas as pd
+
+
+class sufi2_goal():
+    '''
+    the simulations of a SWAT-CUP SUFI2 iteration
+    '''
+
+    def __init__(self, sim, params, values, goal, info=None, maximize=True):
+        '''
+        Parameters
+        ----------
+        sim : ndarray
+            the simulation numbers.
+        params : list
+            the parameter names, e.g. 1:R__CN2.mgt.
+        values : ndarray
+            float32 array of shape (simulation, parameter).
+        goal : ndarray
+            the objective function value of every simulation.
+        info : dict, optional
+            the header entries of goal.txt, e.g. Goal_type and Best_sim_no.
+        maximize : bool, optional
+            whether larger objective values are better (e.g. NS, KGE, R2). The default is True.
+
+        '''
+        self.sim = sim
+        self.params = list(params)
+        self.values = values
+        self.goal = goal
+        self.info = dict() if info is None else info
+        self.maximize = maximize
+        assert values.shape == (len(sim), len(self.params)), \
+            'The values of shape {} do not match {} simulations and {} parameters.'.format(values.shape, len(sim), len(self.params))
+
+    def __repr__(self):
+        return 'SUFI2 goal of {} simulations x {} parameters ({})'.format(len(self.sim), len(self.params), self.info.get('Goal_type', 'unknown objective'))
+
+    def to_frame(self):
+        '''
+        the parameters and goal_value indexed by simulation number, as read by pd.read_csv
+        '''
+        df = pd.DataFrame(self.values, index=pd.Index(self.sim, name='Sim_No.'), columns=self.params)
+        df['goal_value'] = self.goal
+        return df
+
+    @property
+    def best(self):
+        '''
+        the position of the best simulation
+        '''
+        return int(np.argmax(self.goal) if self.maximize else np.argmin(self.goal))
+
+    def behavioral(self, threshold):
+        '''
+        mask of the simulations with an objective at least as good as threshold
+        '''
+        return self.goal >= threshold if self.maximize else self.goal <= threshold
+
+    def behavioral_ranges(self, threshold=0.5):
+        '''
+        the range of every parameter over the behavioral simulations
+
+        Parameters
+        ----------
+        threshold : float, optional
+            the objective value of a behavioral simulation, as in Observed.txt. The default is 0.5.
+
+        Returns
+        -------
+        DataFrame indexed by parameter with min, max, best (the value of the best
+        simulation) and count (the number of behavioral simulations).
+
+        '''
+        keep = self.behavioral(threshold)
+        sel = self.values[keep]
+        empty = np.full(len(self.params), np.nan, np.float32)
+        return pd.DataFrame(dict(min=sel.min(axis=0) if len(sel) > 0 else empty,
+                                 max=sel.max(axis=0) if len(sel) > 0 else empty,
+                                 best=self.values[self.best],
+                                 count=np.count_nonzero(keep)), index=pd.Index(self.params, name='parameter'))
+
+    def rank_correlations(self):
+        '''
+        Spearman rank correlation of every parameter with the objective function
+        '''
+        ranks = pd.DataFrame(self.values, columns=self.params).rank().values
+        g = pd.Series(self.goal).rank().values
+        ranks -= ranks.mean(axis=0)
+        g -= g.mean()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r = ranks.T @ g / np.sqrt((ranks * ranks).sum(axis=0) * (g @ g))
+        return pd.Series(r, index=pd.Index(self.params, name='parameter'), name='spearman')
+
+    def envelopes(self, bins=40):
+        '''
+        the objective function over equal-width bins of every parameter
+
+        Parameters
+        ----------
+        bins : int, optional
+            the number of bins of each parameter range. The default is 40.
+
+        Returns
+        -------
+        edges : ndarray
+            the bin edges, shape (parameter, bins + 1).
+        envelope : dict
+            arrays of shape (parameter, bins): count, min, max and mean of the
+            objective in each bin (NaN in empty bins).
+
+        '''
+        npar = len(self.params)
+        lo, hi = self.values.min(axis=0).astype(np.float64), self.values.max(axis=0).astype(np.float64)
+        width = np.where(hi > lo, hi - lo, 1.)
+        edges = lo[:, None] + width[:, None] * np.linspace(0., 1., bins + 1)
+
+        # flat (parameter, bin) index of every value
+        b = np.clip(((self.values - lo) / width * bins).astype(np.int64), 0, bins - 1)
+        idx = (b + np.arange(npar) * bins).ravel()
+        g = np.broadcast_to(self.goal.astype(np.float64)[:, None], self.values.shape).ravel()
+
+        count = np.bincount(idx, minlength=npar * bins)
+        total = np.bincount(idx, weights=g, minlength=npar * bins)
+        gmin = np.full(npar * bins, np.inf)
+        gmax = np.full(npar * bins, -np.inf)
+        np.minimum.at(gmin, idx, g)
+        np.maximum.at(gmax, idx, g)
+
+        empty = count == 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+        for a in (gmin, gmax, mean):
+            a[empty] = np.nan
+        shape = (npar, bins)
+        return edges, dict(count=count.reshape(shape), min=gmin.reshape(shape), max=gmax.reshape(shape), mean=mean.reshape(shape))
+
+
+def read_goal(fpath, maximize=True):
+    '''
+    read goal.txt of a SWAT-CUP SUFI2 iteration
+
+    Parameters
+    ----------
+    fpath : str
+        the path to goal.txt.
+    maximize : bool, optional
+        whether larger objective values are better. The default is True.
+
+    Returns
+    -------
+    sufi2_goal
+
+    '''
+    with open(fpath, 'rb') as f:
+        content = f.read().replace(b'\r', b'')
+
+    # the column header is the line with goal_value; the lines above hold key= value entries
+    pos = content.find(b'goal_value')
+    assert pos >= 0, 'No goal_value column found in {}'.format(fpath)
+    start = content.rfind(b'\n', 0, pos) + 1
+    end = content.find(b'\n', pos)
+    end = len(content) if end < 0 else end
+    info = dict(re.findall(r'(\w+)\s*=\s*(\S+)', content[:start].decode('utf-8', 'replace')))
+    columns = content[start:end].decode().split()
+    body = content[end + 1:].strip()
+
+    ncol = len(columns)
+    nrow = body.count(b'\n') + 1 if len(body) > 0 else 0
+    data = np.fromstring(body, dtype=np.float32, sep=' ') if nrow > 0 else np.zeros(0, np.float32)
+    if len(data) != nrow * ncol:
+        raise ValueError('{} has {} numbers, expected {} rows of {} columns.'.format(fpath, len(data), nrow, ncol))
+    data = data.reshape(nrow, ncol)
+    return sufi2_goal(data[:, 0].astype(np.int64), columns[1:-1], np.ascontiguousarray(data[:, 1:-1]), data[:, -1].copy(), info, maximize)
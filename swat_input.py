@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+This script read the subbasin and HRU input files of a SWAT TxtInOut in bulk.
+
+fig.fig is read once to find the subbasin (.sub) files, and every .sub file
+lists the input files of its HRUs. The files are read in a thread pool, as
+the time goes to opening many small files (often on a network share) rather
+than to parsing. The HRU parameters sit at fixed lines near the top of the
+.hru and .mgt files, so only the first bytes of each file are read and the
+values are cut from the lines given in HRU_FIELDS.
+
+Edited parameters are written back by write_subhru, which compares the
+new values with the files and rewrites only the files with a changed value.
+The edited files are first written next to the originals as temporary files
+in a thread pool, and only when all of them are written are they renamed
+over the originals, so a failed or interrupted write leaves no file half
+edited; the originals are kept until all are renamed and put back if the
+renaming fails.
+
+usage:
+    subhru = read_subhru(TxtInOut)
+    hrus = hru_table(TxtInOut)  # the input file names of every HRU
+    changed = write_subhru(TxtInOut, subhru)
+"""
+
+
+import os
+import re
+import shutil
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+
+# the HRU parameters of read_subhru: {name: (file extension, line number)}
+HRU_FIELDS = dict(frac=('hru', 1), ov_n=('hru', 4), canmx=('hru', 8), cn2=('mgt', 10), usle_p=('mgt', 11))
+
+# the default number of threads opening files; the reads wait on the file system, not the CPU
+READ_THREADS = 16
+
+# the input file names listed on the HRU lines of a .sub file, e.g. 000010001.hru
+HRU_FILE = re.compile(r'(\d{9}\.([a-z]{2,3}))')
+
+
+def read_head(fpath, nlines, size=4096):
+    '''
+    the first nlines lines of a file, reading only the first bytes
+
+    Parameters
+    ----------
+    fpath : str
+        the file path.
+    nlines : int
+        the number of lines needed.
+    size : int, optional
+        the number of bytes read at a time. The default is 4096.
+
+    Returns
+    -------
+    list of str (without line endings).
+
+    '''
+    with open(fpath, 'rb') as f:
+        buf = f.read(size)
+        while buf.count(b'\n') < nlines:
+            more = f.read(size)
+            if len(more) == 0:
+                break
+            buf += more
+    return buf.decode('latin-1').splitlines()[:nlines]
+
+
+def subbasin_files(TxtInOut):
+    '''
+    the .sub file of every subbasin, in the order of fig.fig
+    '''
+    with open(os.path.join(TxtInOut, 'fig.fig')) as fig:
+        figlines = fig.readlines()
+    return [figlines[i + 1].strip() for i, l in enumerate(figlines[:-1]) if l.startswith('subbasin')]
+
+
+def read_sub(TxtInOut, subfile):
+    '''
+    the area and the HRU input files of a subbasin
+
+    Returns
+    -------
+    area : float
+        the subbasin area (SUB_KM).
+    hrus : list
+        {extension: file name} of every HRU, e.g. {'hru': '000010001.hru', 'mgt': '000010001.mgt', ...}
+
+    '''
+    with open(os.path.join(TxtInOut, subfile)) as fsub:
+        sublines = fsub.readlines()
+    area = float(sublines[1][:20])
+    ih = next(i for i, l in enumerate(sublines) if l.startswith('HRU: General'))
+    hrus = [dict((ext, name) for name, ext in HRU_FILE.findall(l)) for l in sublines[ih + 1:]]
+    return area, [h for h in hrus if 'hru' in h]
+
+
+def hru_table(TxtInOut, threads=READ_THREADS):
+    '''
+    the subbasin, HRU number, subbasin area and input file names of every HRU
+
+    Parameters
+    ----------
+    TxtInOut : str
+        the TxtInOut directory.
+    threads : int, optional
+        the number of threads reading the .sub files. The default is READ_THREADS.
+
+    Returns
+    -------
+    DataFrame with subbasin, hru, subarea and the input file names (hru_file,
+    mgt_file, sol_file, chm_file, gw_file and sep_file).
+
+    '''
+    subfiles = subbasin_files(TxtInOut)
+    with ThreadPoolExecutor(threads) as ex:
+        subs = list(ex.map(lambda f: read_sub(TxtInOut, f), subfiles))
+    rows = [dict(subbasin=isub, hru=ihru, subarea=area, **{ext + '_file': name for ext, name in files.items()})
+            for isub, (area, hrus) in enumerate(subs, 1) for ihru, files in enumerate(hrus, 1)]
+    return pd.DataFrame(rows)
+
+
+def hru_description(title):
+    '''
+    the land use, soil and slope class on the title line of an .hru file
+    '''
+    i, j, k = title.index('Luse:'), title.index('Soil:'), title.index('Slope:')
+    return title[i + 5:i + 10].strip(), title[j + 5:j + 12].strip(), title[k + 6:title.index('/') - 2].strip()
+
+
+def read_hru_fields(TxtInOut, files, fields=HRU_FIELDS):
+    '''
+    the title description and the parameters of one HRU from the heads of its files
+
+    Parameters
+    ----------
+    TxtInOut : str
+        the TxtInOut directory.
+    files : dict
+        {extension: file name} of the HRU, see read_sub.
+    fields : dict, optional
+        {name: (extension, line number)} of the parameters. The default is HRU_FIELDS.
+
+    Returns
+    -------
+    list of landuse, soil, slope and the parameter values in the order of fields.
+
+    '''
+    nlines = dict()
+    for ext, line in fields.values():
+        nlines[ext] = max(nlines.get(ext, 1), line + 1)
+    heads = {ext: read_head(os.path.join(TxtInOut, files[ext]), n) for ext, n in nlines.items()}
+    title = heads['hru'][0] if 'hru' in heads else read_head(os.path.join(TxtInOut, files['hru']), 1)[0]
+    return list(hru_description(title)) + [float(heads[ext][line].split('|')[0]) for ext, line in fields.values()]
+
+
+def read_subhru(TxtInOut, threads=READ_THREADS, fields=HRU_FIELDS):
+    '''
+    the land use, soil, slope and parameters of every HRU
+
+    Parameters
+    ----------
+    TxtInOut : str
+        the TxtInOut directory.
+    threads : int, optional
+        the number of threads reading the files. The default is READ_THREADS.
+    fields : dict, optional
+        {name: (extension, line number)} of the parameters. The default is HRU_FIELDS.
+
+    Returns
+    -------
+    DataFrame with subbasin, hru, subarea, landuse, soil, slope and the parameters,
+    as saved by land_use_change.py -r.
+
+    '''
+    table = hru_table(TxtInOut, threads)
+    exts = [c[:-5] for c in table.columns if c.endswith('_file')]
+    files = [dict(zip(exts, names)) for names in table[[e + '_file' for e in exts]].values.tolist()]
+    # a few chunks of HRUs per thread instead of one task per HRU
+    nchunk = max(1, min(len(files), threads * 4))
+    with ThreadPoolExecutor(threads) as ex:
+        chunks = ex.map(lambda c: [read_hru_fields(TxtInOut, f, fields) for f in c], [files[i::nchunk] for i in range(nchunk)])
+        values = [None] * len(files)
+        for i, chunk in enumerate(chunks):
+            values[i::nchunk] = chunk
+    subhru = pd.DataFrame(values, columns=['landuse', 'soil', 'slope'] + list(fields))
+    subhru.insert(0, 'subarea', table.subarea.values)
+    subhru.insert(0, 'hru', table.hru.values)
+    subhru.insert(0, 'subbasin', table.subbasin.values)
+    return subhru
+
+
+def format_value(value, text):
+    '''
+    a new parameter value formatted like the current value text: a whole
+    number over an integer stays an integer, any other value is written as a
+    float so that no edit is rounded away
+    '''
+    text = text.strip()
+    if text.lstrip('+-').isdigit() and float(value).is_integer():
+        return str(int(float(value)))
+    return str(float(value))
+
+
+def edit_lines(lines, edits):
+    '''
+    replace the values of parameter lines (value | NAME : description), keeping
+    the name, description and line ending
+
+    Parameters
+    ----------
+    lines : list
+        the lines of a file with their line endings.
+    edits : dict
+        {line number: new value}
+
+    '''
+    for i, value in edits.items():
+        l = lines[i]
+        bar = l.index('|')
+        lines[i] = '{:>16}    '.format(format_value(value, l[:bar])) + l[bar:]
+    return lines
+
+
+def stage_file(fpath, edits):
+    '''
+    write the edited copy of a file to a temporary file next to it; returns the temporary path
+    '''
+    with open(fpath, 'rb') as f:
+        lines = f.read().decode('latin-1').splitlines(keepends=True)
+    tmp = fpath + '.tmp{}'.format(os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(''.join(edit_lines(lines, edits)).encode('latin-1'))
+    return tmp
+
+
+def write_files(TxtInOut, edits, threads=READ_THREADS, stage=stage_file):
+    '''
+    edit parameter lines of many files at once
+
+    All the edited files are written to temporary files first; the originals
+    are replaced (each by an atomic rename) only after every file was
+    written, and the temporary files are removed if any write fails. Each
+    original is kept as a backup (a hard link, or a copy) until all are
+    replaced, so an error or interrupt while replacing puts the replaced
+    files back. Only a crash of the process can leave the folder partly
+    edited, with the backups (*.tmp<pid>.bak) next to the files.
+
+    Parameters
+    ----------
+    TxtInOut : str
+        the TxtInOut directory.
+    edits : dict
+        {file name: {line number: new value}}
+    threads : int, optional
+        the number of threads writing the files. The default is READ_THREADS.
+    stage : callable, optional
+        stage(file path, edits of the file) writes the edited temporary file
+        and returns its path. The default is stage_file.
+
+    Returns
+    -------
+    list of the edited file names.
+
+    '''
+    names = [f for f, e in edits.items() if len(e) > 0]
+    paths = [os.path.join(TxtInOut, f) for f in names]
+    with ThreadPoolExecutor(threads) as ex:
+        futures = [ex.submit(stage, p, edits[f]) for p, f in zip(paths, names)]
+    errors = [fu.exception() for fu in futures if fu.exception() is not None]
+    if len(errors) > 0:
+        for p in paths:
+            tmp = p + '.tmp{}'.format(os.getpid())
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise errors[0]
+    tmps = [fu.result() for fu in futures]
+    backups = []
+    try:
+        for tmp, p in zip(tmps, paths):
+            bak = tmp + '.bak'
+            try:
+                os.link(p, bak)
+            except OSError:
+                shutil.copy2(p, bak)
+            os.replace(tmp, p)
+            backups.append((bak, p))
+    except BaseException:
+        # roll back: the replaced originals are put back, and the staged files
+        # and the backup of a file not replaced yet are removed
+        for bak, p in backups:
+            os.replace(bak, p)
+        for tmp in tmps:
+            for f in (tmp, tmp + '.bak'):
+                if os.path.exists(f):
+                    os.remove(f)
+        raise
+    for bak, p in backups:
+        os.remove(bak)
+    return names
+
+
+def write_subhru(TxtInOut, subhru, threads=READ_THREADS, fields=HRU_FIELDS):
+    '''
+    write the HRU parameters of a subhru table (see read_subhru) to the input
+    files, rewriting only the files whose values changed
+
+    Parameters
+    ----------
+    TxtInOut : str
+        the TxtInOut directory.
+    subhru : DataFrame
+        subbasin, hru and the parameter columns, e.g. as saved by land_use_change.py -r.
+    threads : int, optional
+        the number of threads reading and writing the files. The default is READ_THREADS.
+    fields : dict, optional
+        {name: (extension, line number)} of the parameters; the ones that are
+        columns of subhru are written. The default is HRU_FIELDS.
+
+    Returns
+    -------
+    list of the edited file names.
+
+    '''
+    fields = {k: v for k, v in fields.items() if k in subhru.columns}
+    table = hru_table(TxtInOut, threads)
+    new = table[['subbasin', 'hru']].merge(subhru[['subbasin', 'hru'] + list(fields)], on=['subbasin', 'hru'], how='left')
+    assert len(new) == len(table), 'Duplicated subbasin and hru numbers in the table.'
+
+    # the current values, compared with the new ones to find the files to edit
+    current = read_subhru(TxtInOut, threads, fields)
+    edits = dict()
+    for name, (ext, line) in fields.items():
+        v = new[name].values.astype(np.float64)
+        changed = ~np.isnan(v) & (v != current[name].values)
+        for fname, value in zip(table.loc[changed, ext + '_file'], v[changed]):
+            edits.setdefault(fname, dict())[line] = value
+    return write_files(TxtInOut, edits, threads)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+This script compute goodness-of-fit metrics of simulated against observed flow.
+
+The simulated flow of every reach (the output of swat_reader.filter) and the
+USGS observed flow of the matching gauges (read_usgs_flows) are joined on
+the time index into two (time, reach) matrices. All the metrics of all the
+reaches are then NumPy reductions over the time axis, where a time step
+counts only if both the simulated and the observed values are present.
+Simulations of many scenarios can be stacked into a (scenario, time, reach)
+array and evaluated against the same observations in one call.
+
+    NSE   = 1 - sum((s - o)^2) / sum((o - mean(o))^2)
+    KGE   = 1 - sqrt((r - 1)^2 + (std(s) / std(o) - 1)^2 + (mean(s) / mean(o) - 1)^2)
+    PBIAS = 100 * sum(o - s) / sum(o)  (positive: the model underestimates)
+    RSR   = sqrt(sum((s - o)^2)) / sqrt(sum((o - mean(o))^2))
+    R2    = r^2, the squared Pearson correlation
+
+usage:
+    sim = simulated_matrix(df_filter, 'FLOW_OUTcms')
+    obs = observed_matrix(flows, ['07325800', '07325840'], factor=0.0283168)
+    metrics = flow_metrics(sim, obs, freq='M')
+    metrics = gauge_metrics(sim, flows, ['07325800', '07325840'], factor=0.0283168)
+"""
+
+
+import numpy as np
+import pandas as pd
+
+from swat_aggregate import time_bins
+
+
+# the columns returned by gof and flow_metrics
+METRICS = ('NSE', 'KGE', 'PBIAS', 'RSR', 'R2', 'n')
+
+
+def gof_block(sim, obs, min_count=1):
+    '''
+    the metrics of one block of simulations, see gof
+    '''
+    # without gaps in the simulation, the mask and the observed statistics are shared by all scenarios
+    mask = ~np.isnan(obs) if not np.isnan(sim).any() else ~(np.isnan(sim) | np.isnan(obs))
+    s = np.where(mask, sim, 0.)
+    o = np.where(mask, obs, 0.)
+    # a mask shared by the scenarios counts the same time steps for each of them
+    n = np.array(np.broadcast_to(mask.sum(axis=-2), sim.shape[:-2] + sim.shape[-1:]))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ms = s.sum(axis=-2) / n
+        mo = o.sum(axis=-2) / n
+        # deviations from the means of the paired time steps
+        ds = np.where(mask, s - ms[..., None, :], 0.)
+        do = np.where(mask, o - mo[..., None, :], 0.)
+        sss = np.einsum('...tr,...tr->...r', ds, ds)
+        soo = np.einsum('...tr,...tr->...r', do, do)
+        sso = np.einsum('...tr,...tr->...r', ds, do)
+        # sum((s - o)^2) from the deviations, as the deviations sum to zero
+        sse = sss + soo - 2. * sso + n * (ms - mo) ** 2
+
+        r = sso / np.sqrt(sss * soo)
+        alpha = np.sqrt(sss / soo)
+        beta = ms / mo
+        res = dict(NSE=1. - sse / soo,
+                   KGE=1. - np.sqrt((r - 1.) ** 2 + (alpha - 1.) ** 2 + (beta - 1.) ** 2),
+                   PBIAS=100. * (mo - ms) / mo,
+                   RSR=np.sqrt(sse / soo),
+                   R2=r * r)
+    for v in res.values():
+        v[n < max(min_count, 1)] = np.nan
+    res['n'] = n
+    return res
+
+
+def gof(sim, obs, min_count=1, block_size=2**22):
+    '''
+    goodness-of-fit metrics over the time axis
+
+    Parameters
+    ----------
+    sim : ndarray
+        the simulated values of shape (time, reach) or (scenario, time, reach).
+    obs : ndarray
+        the observed values of shape (time, reach), or the shape of sim; NaN where not measured.
+    min_count : int, optional
+        the minimum number of time steps with both values; metrics of reaches
+        with fewer are NaN. The default is 1.
+    block_size : int, optional
+        the number of values evaluated at once; scenarios are processed in
+        blocks of this size to bound the memory of the temporaries. The default is 2**22.
+
+    Returns
+    -------
+    dict of {metric: ndarray of shape (reach,) or (scenario, reach)}, see METRICS.
+
+    '''
+    sim, obs = np.asarray(sim), np.asarray(obs)
+    assert sim.ndim in (2, 3) and obs.shape in (sim.shape, sim.shape[-2:]), \
+        'The observed shape {} does not match the simulated shape {}.'.format(obs.shape, sim.shape)
+    if sim.ndim == 2:
+        return gof_block(sim, obs, min_count)
+
+    step = max(1, block_size // max(1, sim.shape[1] * sim.shape[2]))
+    blocks = [gof_block(sim[i:i + step], obs if obs.ndim == 2 else obs[i:i + step], min_count)
+              for i in range(0, len(sim), step)]
+    return {k: np.concatenate([b[k] for b in blocks]) for k in METRICS}
+
+
+def resample_pairs(sim, obs, times, freq, stat='mean'):
+    '''
+    aggregate simulated and observed values over time bins using only the
+    time steps where both are present
+
+    Parameters
+    ----------
+    sim : ndarray
+        shape (time, reach) or (scenario, time, reach).
+    obs : ndarray
+        shape (time, reach).
+    times : DatetimeIndex
+        the sorted time steps.
+    freq : str
+        the pandas resampling frequency, e.g. 'M'.
+    stat : str, optional
+        sum or mean. The default is 'mean'.
+
+    Returns
+    -------
+    sim, obs, labels : the binned values (NaN in bins without paired time steps;
+    obs has the shape of sim) and the bin labels.
+
+    '''
+    assert stat in ('sum', 'mean'), 'Only sum and mean can be used to compare flow, not {}.'.format(stat)
+    starts, counts, labels = time_bins(times, freq)
+    keep = counts > 0
+    idx = starts[keep]
+    mask = ~(np.isnan(sim) | np.isnan(obs))
+    n = np.add.reduceat(mask, idx, axis=-2).astype(np.float64)
+    s = np.add.reduceat(np.where(mask, sim, 0.), idx, axis=-2)
+    o = np.add.reduceat(np.where(mask, obs, 0.), idx, axis=-2)
+    if stat == 'mean':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            s, o = s / n, o / n
+    # the paired time steps depend on the simulation, so o has the shape of s
+    s[n == 0] = np.nan
+    o[n == 0] = np.nan
+    return s, o, labels[keep]
+
+
+def simulated_matrix(df_filter, var):
+    '''
+    one variable of the swat_reader.filter output as a (time, unit) DataFrame
+    '''
+    return df_filter[var].unstack(0)
+
+
+def observed_matrix(flows, sites, factor=1.):
+    '''
+    the USGS flow of several gauges as a (time, gauge) DataFrame
+
+    Parameters
+    ----------
+    flows : dict
+        {site number: DataFrame} as returned by read_usgs_flows.
+    sites : list
+        the gauges, one column each.
+    factor : float, optional
+        the unit conversion of the observed flow, e.g. 0.0283168 for cfs to cms. The default is 1.
+
+    '''
+    cols = [pd.to_numeric(flows[g].iloc[:, 1], errors='coerce').set_axis(pd.DatetimeIndex(flows[g].index)) * factor for g in sites]
+    return pd.concat(cols, axis=1, keys=sites) if len(cols) > 0 else pd.DataFrame()
+
+
+def flow_metrics(sim, obs, freq=None, stat='mean', min_count=1):
+    '''
+    goodness-of-fit metrics of every reach against its gauge
+
+    Parameters
+    ----------
+    sim : DataFrame
+        the simulated flow indexed by time, one column per reach, see simulated_matrix.
+    obs : DataFrame
+        the observed flow indexed by time, one column per gauge in the order of
+        the reaches, see observed_matrix.
+    freq : str, optional
+        the resampling frequency, e.g. 'M' to compare monthly flow. The default is None (as simulated).
+    stat : str, optional
+        sum or mean for resampling. The default is 'mean'.
+    min_count : int, optional
+        the minimum number of paired time steps. The default is 1.
+
+    Returns
+    -------
+    DataFrame indexed by reach with the gauge and METRICS columns.
+
+    '''
+    assert sim.shape[1] == obs.shape[1], 'The {} reaches do not match the {} gauges.'.format(sim.shape[1], obs.shape[1])
+    # join on the simulated time steps
+    o = obs.reindex(pd.DatetimeIndex(sim.index)).to_numpy(np.float64)
+    s = sim.to_numpy(np.float64)
+    if freq is not None:
+        s, o, _ = resample_pairs(s, o, pd.DatetimeIndex(sim.index), freq, stat)
+    res = gof(s, o, min_count)
+    df = pd.DataFrame(res, index=pd.Index(sim.columns, name=sim.columns.name), columns=list(METRICS))
+    df.insert(0, 'gauge', list(obs.columns))
+    return df
+
+
+def gauge_metrics(sim, flows, sites, factor=1., step=None, freq=None, stat='mean', min_count=1):
+    '''
+    goodness-of-fit metrics of simulated flow against the flows of read_usgs_flows
+
+    Parameters
+    ----------
+    sim : DataFrame
+        the simulated flow indexed by time, one column per reach.
+    flows : dict
+        {site number: DataFrame} as returned by read_usgs_flows.
+    sites : list
+        the gauge of every reach.
+    factor : float, optional
+        the unit conversion of the observed flow. The default is 1.
+    step : str, optional
+        the time step of a monthly or annual simulation, e.g. 'M', to which the daily
+        observations are averaged. The default is None (daily).
+    freq, stat, min_count :
+        see flow_metrics.
+
+    '''
+    obs = observed_matrix(flows, sites, factor)
+    if step is not None:
+        obs = obs.resample(step).mean()
+    return flow_metrics(sim, obs, freq, stat, min_count)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+This script parse fixed-width SWAT output files (output.rch, output.sub, output.hru)
+with NumPy.
+
+The file is memory-mapped as bytes; each field is cut out of the records with
+the widths of the header descriptors (e.g. swat_reader.get_rch_header_width)
+and decoded in one vectorized step, so no Python code runs per row.
+
+usage:
+    from swat_output_parser import fixed_width_output
+    out = fixed_width_output('output.rch', columns, widths)
+    flow = out.read('FLOW_OUTcms')
+"""
+
+
+import os
+import numpy as np
+import pandas as pd
+
+
+NEWLINE = ord('\n')
+SPACE = ord(' ')
+
+
+def skip_lines(buf, nlines, start=0):
+    '''
+    byte offset after skipping nlines lines of buf from start
+    '''
+    offset = start
+    for i in range(nlines):
+        nl = np.flatnonzero(buf[offset:offset + 65536] == NEWLINE)
+        if len(nl) == 0:
+            return len(buf)
+        offset += nl[0] + 1
+    return offset
+
+
+def to_number(raw, dtype=np.float64):
+    '''
+    decode a (n, width) uint8 array of right-aligned ASCII fields into numbers.
+
+    Blank or unreadable fields (e.g. Fortran overflow "*****") become NaN, in which
+    case integer fields are returned as float like pandas does.
+    '''
+    raw = np.ascontiguousarray(raw)
+    s = raw.view('S{}'.format(raw.shape[1])).ravel() if raw.shape[1] > 0 else np.zeros(raw.shape[0], 'S1')
+    try:
+        return s.astype(dtype)
+    except ValueError:
+        uniq, inverse = np.unique(s, return_inverse=True)
+        vals = np.empty(len(uniq))
+        for i, u in enumerate(uniq):
+            try:
+                vals[i] = float(u)
+            except ValueError:
+                vals[i] = np.nan
+        vals = vals[inverse]
+        if np.issubdtype(dtype, np.integer) and not np.isnan(vals).any():
+            return vals.astype(dtype)
+        return vals
+
+
+def calendar_dates(year, month, day):
+    '''
+    build datetime64 values from year, month and day arrays in one step
+    '''
+    ym = (np.asarray(year, dtype=np.int64) - 1970) * 12 + np.asarray(month, dtype=np.int64) - 1
+    return ym.astype('M8[M]').astype('M8[D]') + (np.asarray(day, dtype=np.int64) - 1).astype('m8[D]')
+
+
+class fixed_width_output():
+    '''
+    memory-mapped, column-addressable view of a fixed-width SWAT output file
+    '''
+
+    def __init__(self, fpath, columns, widths, skiprows=9, buf=None):
+        '''
+        Parameters
+        ----------
+        fpath : str
+            path of the output file.
+        columns : list
+            the field names.
+        widths : list
+            the field widths in characters.
+        skiprows : int, optional
+            number of header lines before the records. The default is 9.
+        buf : ndarray, optional
+            uint8 bytes to parse instead of memory-mapping fpath, e.g. the part
+            appended to a file that is still being written. The default is None.
+
+        '''
+        self.fpath = fpath
+        self.columns = list(columns)
+        edges = np.cumsum([0] + list(widths))
+        self.spans = {c: (edges[i], edges[i + 1]) for i, c in enumerate(self.columns)}
+
+        if buf is not None:
+            self.buf = buf
+        else:
+            self.buf = np.memmap(fpath, dtype=np.uint8, mode='r') if os.path.getsize(fpath) > 0 else np.zeros(0, np.uint8)
+        self.data_offset = skip_lines(self.buf, skiprows)
+        self.find_records(self.data_offset)
+
+    def __repr__(self):
+        return '{} records in {}'.format(len(self), self.fpath)
+
+    def __len__(self):
+        return self.nrec
+
+    def find_records(self, offset):
+        '''
+        locate the records after offset.
+
+        SWAT writes every record with the same format, so the records normally have
+        one length; they are then addressed as a 2-D view of the file (self.reclen)
+        without keeping any per-record offsets. Otherwise the line breaks are
+        searched for and the start and end (excluding the line break) of every
+        record are kept in self.starts and self.ends.
+        '''
+        self.reclen, self.starts, self.ends = None, None, None
+        body = self.buf[offset:]
+        nl = np.flatnonzero(body[:65536] == NEWLINE)
+        if len(nl) == 0:
+            self.starts, self.ends = np.zeros(0, np.int64), np.zeros(0, np.int64)
+            self.nrec = 0
+            return
+
+        reclen = nl[0] + 1
+        nrec = len(body) // reclen
+        tail = body[nrec * reclen:]
+        fixed = reclen > 1 and not (tail > SPACE).any()
+        for i in range(0, nrec, 1 << 20):
+            if not fixed:
+                break
+            fixed = np.all(body[reclen * (i + 1) - 1: reclen * min(nrec, i + (1 << 20)): reclen] == NEWLINE)
+        if fixed:
+            self.reclen, self.nrec = reclen, nrec
+            return
+
+        ends = np.flatnonzero(body == NEWLINE).astype(np.int64)
+        starts = np.concatenate([[0], ends[:-1] + 1]).astype(np.int64)
+        tail = len(body) - ends[-1] - 1
+
+        # keep a last record without line break only if it is a complete line
+        if tail >= self.spans[self.columns[-1]][1]:
+            starts = np.append(starts, len(body) - tail)
+            ends = np.append(ends, len(body))
+
+        # strip carriage returns and drop blank lines
+        ends = ends - (body[np.maximum(ends - 1, 0)] == ord('\r'))
+        keep = ends - starts > 0
+        self.starts, self.ends = starts[keep] + offset, ends[keep] + offset
+        self.nrec = len(self.starts)
+
+    def record_end(self, i):
+        '''
+        byte offset just after record i and its line break
+        '''
+        if self.reclen is not None:
+            return self.data_offset + (i + 1) * self.reclen
+        end = self.ends[i]
+        nl = np.flatnonzero(self.buf[end:end + 2] == NEWLINE)
+        return end + nl[0] + 1 if len(nl) > 0 else end
+
+    def records(self):
+        '''
+        the records as a (nrows, record length) uint8 view, if they have one length
+        '''
+        return self.buf[self.data_offset:self.data_offset + self.nrec * self.reclen].reshape(self.nrec, self.reclen)
+
+    def field(self, name, rows=None):
+        '''
+        the raw bytes of a field as a (nrows, width) uint8 array
+
+        Parameters
+        ----------
+        name : str
+            the field name.
+        rows : array-like, optional
+            positions (array or slice) of the records to be read. The default is all.
+
+        '''
+        lo, hi = self.spans[name]
+        if self.reclen is not None:
+            rec = self.records()
+            if hi < self.reclen:
+                return rec[:, lo:hi] if rows is None else rec[rows, lo:hi]
+            starts = self.data_offset + self.reclen * np.arange(self.nrec)[rows if rows is not None else slice(None)]
+            ends = starts + self.reclen - 1 - (rec[rows if rows is not None else slice(None), -2] == ord('\r'))
+        else:
+            starts = self.starts if rows is None else self.starts[rows]
+            ends   = self.ends   if rows is None else self.ends[rows]
+        idx = starts[:, None] + np.arange(lo, hi)
+        if len(starts) == 0 or (ends - starts).min() >= hi:
+            return self.buf[idx]
+        # short records: the missing characters are blanks
+        inside = idx < ends[:, None]
+        return np.where(inside, self.buf[np.where(inside, idx, 0)], SPACE).astype(np.uint8)
+
+    def read(self, name, dtype=np.float64, rows=None):
+        '''
+        decode a field into a numeric array
+
+        Parameters
+        ----------
+        name : str
+            the field name.
+        dtype : numpy dtype, optional
+            the data type of the field. The default is np.float64.
+        rows : array-like, optional
+            positions of the records to be read. The default is all.
+
+        '''
+        return to_number(self.field(name, rows), dtype)
+
+    def to_frame(self, columns=None, rows=None, index=None):
+        '''
+        decode several float fields into a DataFrame
+        '''
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({c: self.read(c, rows=rows) for c in columns}, index=index, columns=columns)
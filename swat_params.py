@@ -0,0 +1,483 @@
+# -*- coding: utf-8 -*-
+"""
+This script index every named parameter of the SWAT input files for fast
+lookup and editing.
+
+A TxtInOut is scanned once. For every parameter value the index records the
+file, the parameter name, the layer (soil layers of .sol files, 0 otherwise),
+the line number, the byte span of the value field and the value:
+
+    .hru/.mgt/.gw/.rte/...   "       0.0191349    | HRU_FR : Fraction of ..."
+                              the field runs from the line start to the end of the value
+    .sol                     " Ksat. (est.)      [mm/hr]:       23.50       10.20"
+                              one field of every layer, named as in SWAT-CUP (SOL_K)
+
+The index is saved in the "<TxtInOut>.cache" folder with the size and
+modification time of every scanned file, and only new or changed files are
+scanned again when it is loaded. Values are read from the index without
+opening the input files. An edit writes the new value right-aligned into the
+byte span of the old one, so the file keeps its layout (the .sol columns are
+read with fixed widths by SWAT) and the spans of all other parameters stay
+valid: an update costs the changed values and the files holding them, not a
+rescan. The edited files are written with swat_input.write_files, all at
+once or none.
+
+usage:
+    index = param_index(TxtInOut)
+    index.get('CN2')  # the value in every .mgt file
+    index.set('CN2', -0.1, method='r')  # SWAT-CUP r__CN2.mgt
+    index.set('SOL_AWC', 0.02, files=['000010001.sol'], method='a', layers=[1, 2])
+    index.update(edits)  # DataFrame of file, name, layer and value
+    index.save()
+
+    python swat_params.py TxtInOut CN2 ALPHA_BF
+    python swat_params.py TxtInOut --set CN2=-0.1 --method r
+"""
+
+
+import os
+import re
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from swat_cache import cache_dir, current_version, publish_version
+from swat_input import write_files, READ_THREADS
+
+
+# the input files that are indexed, by extension
+PARAM_EXTS = ('hru', 'mgt', 'sol', 'gw', 'rte', 'sub', 'swq', 'pnd', 'wwq', 'bsn')
+
+# value | NAME : description
+PARAM_LINE = re.compile(rb'^[ \t]*([^\s|]+)[ \t]*\|[ \t]*([A-Za-z_][\w.()]*)[ \t]*:', re.M)
+
+# label : values, of the .sol files
+SOL_LINE = re.compile(rb'^([^:|\r\n]+):([^\r\n]*)', re.M)
+
+# the .sol line labels and their SWAT-CUP names; the labels below Texture are per layer
+SOL_NAMES = (('Maximum rooting depth', 'SOL_ZMX'), ('Porosity fraction', 'ANION_EXCL'), ('Crack volume', 'SOL_CRK'),
+             ('Depth', 'SOL_Z'), ('Bulk Density', 'SOL_BD'), ('Ave. AW', 'SOL_AWC'), ('Ksat.', 'SOL_K'),
+             ('Organic Carbon', 'SOL_CBN'), ('Clay', 'CLAY'), ('Silt', 'SILT'), ('Sand', 'SAND'),
+             ('Rock Fragments', 'ROCK'), ('Soil Albedo', 'SOL_ALB'), ('Erosion K', 'USLE_K'),
+             ('Salinity', 'SOL_EC'), ('Soil pH', 'SOL_PH'), ('Soil CACO3', 'SOL_CAL'))
+SOL_SINGLE = ('SOL_ZMX', 'ANION_EXCL', 'SOL_CRK')
+
+# the columns of the index table
+INDEX_COLUMNS = ('file', 'name', 'layer', 'line', 'start', 'end', 'integer', 'value')
+
+# the version of the saved index; an index of another version is rebuilt
+INDEX_VERSION = 1
+
+
+def number(token):
+    '''
+    the float value of a token, or None if it is not a number
+    '''
+    try:
+        return float(token)
+    except ValueError:
+        return None
+
+
+def is_integer(token):
+    '''
+    whether a value token is written as an integer, which is kept when it is edited
+    '''
+    return token.lstrip(b'+-').isdigit()
+
+
+def sol_name(label, _names=dict()):
+    '''
+    the SWAT-CUP name of a .sol line label, or None
+    '''
+    # the same few labels repeat in every .sol file
+    if label not in _names:
+        text = label.decode('latin-1').strip()
+        _names[label] = next((name for prefix, name in SOL_NAMES if text.startswith(prefix)), None)
+    return _names[label]
+
+
+def scan_file(fpath):
+    '''
+    the parameter values of one input file
+
+    Returns
+    -------
+    list of (name, layer, line, start, end, integer, value); start and end
+    are the byte span of the value field (the value is right-aligned in it).
+
+    '''
+    with open(fpath, 'rb') as f:
+        content = f.read()
+    rows = []
+    line, pos = 0, 0
+    if fpath.endswith('.sol'):
+        for m in SOL_LINE.finditer(content):
+            name = sol_name(m.group(1))
+            if name is None:
+                continue
+            line += content.count(b'\n', pos, m.start())
+            pos = m.start()
+            # the field of every value starts one space after the previous value (or the colon)
+            prev, offset = m.end(1) + 1, m.start(2)
+            for layer, t in enumerate(re.finditer(rb'\S+', m.group(2)), 1):
+                end = offset + t.end()
+                value = number(t.group())
+                if value is not None:
+                    rows.append((name, 0 if name in SOL_SINGLE else layer, line, prev + 1, end, is_integer(t.group()), value))
+                prev = end
+    else:
+        for m in PARAM_LINE.finditer(content):
+            token, name = m.groups()
+            value = number(token)
+            if value is not None:
+                line += content.count(b'\n', pos, m.start())
+                pos = m.start()
+                rows.append((name.decode('latin-1').upper(), 0, line, pos, m.end(1), is_integer(token), value))
+    return rows
+
+
+def fit_value(value, integer, width):
+    '''
+    the text of a new value that fits a field of width bytes; an integer
+    field keeps its form only for a whole number, so no edit is rounded away
+    '''
+    integer = integer and float(value).is_integer()
+    text = str(int(value)) if integer else str(float(value))
+    digits = 15
+    while len(text) > width and not integer and digits > 1:
+        text = '{:.{}g}'.format(value, digits)
+        digits -= 1
+    assert len(text) <= width, 'The value {} does not fit the {} characters of the field.'.format(value, width)
+    return text.rjust(width).encode('latin-1')
+
+
+def stage_spans(fpath, spans):
+    '''
+    write a copy of a file with new bytes in some spans to a temporary file
+    next to it; returns the temporary path
+
+    spans is a list of (start, end, bytes of length end - start).
+    '''
+    with open(fpath, 'rb') as f:
+        content = bytearray(f.read())
+    for start, end, text in spans:
+        assert len(text) == end - start
+        content[start:end] = text
+    tmp = fpath + '.tmp{}'.format(os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    return tmp
+
+
+class param_index():
+    '''
+    the file, line, byte span and value of every parameter of a TxtInOut
+    '''
+
+    def __init__(self, TxtInOut, exts=PARAM_EXTS, threads=READ_THREADS, save=True):
+        '''
+        Parameters
+        ----------
+        TxtInOut : str
+            TxtInOut directory path.
+        exts : tuple, optional
+            the extensions of the indexed files. The default is PARAM_EXTS.
+        threads : int, optional
+            the number of threads scanning and writing files. The default is READ_THREADS.
+        save : bool, optional
+            whether to save the index when files were scanned. The default is True.
+
+        '''
+        self.TxtInOut = TxtInOut
+        self.exts = tuple(exts)
+        self.threads = threads
+        self.path = os.path.join(cache_dir(TxtInOut), 'params')
+        self.stats = dict()
+        self.table = pd.DataFrame({c: [] for c in INDEX_COLUMNS})
+        self._rows = None
+        self.load()
+        if len(self.refresh()) > 0 and save:
+            self.save()
+
+    def __repr__(self):
+        return 'Parameter index of {} values of {} parameters in {} files of {}'.format(
+            len(self.table), self.table.name.nunique(), len(self.stats), self.TxtInOut)
+
+    def file_stats(self):
+        '''
+        {file name: (size, mtime_ns)} of the files with an indexed extension
+        '''
+        stats = dict()
+        with os.scandir(self.TxtInOut) as it:
+            for e in it:
+                if e.name.rsplit('.', 1)[-1] in self.exts and e.is_file():
+                    st = e.stat()
+                    stats[e.name] = (st.st_size, st.st_mtime_ns)
+        return stats
+
+    def load(self):
+        '''
+        load the saved index, if any
+        '''
+        version = current_version(self.path)
+        if version is None:
+            return
+        try:
+            with open(os.path.join(version, 'meta.json')) as f:
+                meta = json.load(f)
+            if meta['version'] != INDEX_VERSION or tuple(meta['exts']) != self.exts:
+                return
+            cols = {c: np.load(os.path.join(version, c + '.npy')) for c in INDEX_COLUMNS}
+        except OSError:
+            # replaced and deleted by another process while loading: scan the files again
+            return
+        cols['file'] = pd.Categorical.from_codes(cols['file'], meta['files'])
+        cols['name'] = pd.Categorical.from_codes(cols['name'], meta['names'])
+        self.table = pd.DataFrame(cols, columns=list(INDEX_COLUMNS))
+        self.stats = {f: tuple(s) for f, s in meta['stats'].items()}
+        self._rows = None
+
+    def save(self):
+        '''
+        save the index as a new version of its cache folder, see swat_cache.publish_version
+        '''
+        tmp = self.path + '.tmp{}'.format(os.getpid())
+        if os.path.exists(tmp):
+            shutil.rmtree(tmp)
+        os.makedirs(tmp)
+        table = self.table
+        for c in INDEX_COLUMNS:
+            v = table[c].cat.codes.values if c in ('file', 'name') else table[c].values
+            np.save(os.path.join(tmp, c + '.npy'), v)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            # dumps uses the C encoder, unlike dump
+            f.write(json.dumps(dict(version=INDEX_VERSION, exts=self.exts, stats=self.stats,
+                                    files=list(table.file.cat.categories), names=list(table.name.cat.categories))))
+        publish_version(self.path, tmp)
+
+    def refresh(self, files=None):
+        '''
+        scan the new and changed files and drop the removed ones
+
+        Parameters
+        ----------
+        files : list, optional
+            only check these files. The default is None (all files of TxtInOut).
+
+        Returns
+        -------
+        list of the scanned or removed file names.
+
+        '''
+        if files is None:
+            stats = self.file_stats()
+            removed = [f for f in self.stats if f not in stats]
+        else:
+            stats = dict()
+            for f in files:
+                if os.path.exists(os.path.join(self.TxtInOut, f)):
+                    st = os.stat(os.path.join(self.TxtInOut, f))
+                    stats[f] = (st.st_size, st.st_mtime_ns)
+            removed = [f for f in files if f not in stats and f in self.stats]
+        changed = [f for f, s in stats.items() if self.stats.get(f) != s]
+        if len(changed) + len(removed) == 0:
+            return []
+
+        nchunk = max(1, min(len(changed), self.threads * 4))
+        chunks = [changed[i::nchunk] for i in range(nchunk)]
+        with ThreadPoolExecutor(self.threads) as ex:
+            scanned = list(ex.map(lambda c: [(f, r) for f in c for r in scan_file(os.path.join(self.TxtInOut, f))], chunks))
+        rows = [(f,) + r for chunk in scanned for f, r in chunk]
+        cols = list(zip(*rows)) if len(rows) > 0 else [()] * len(INDEX_COLUMNS)
+        new = pd.DataFrame({c: np.array(v, dtype=object if c in ('file', 'name') else None) for c, v in zip(INDEX_COLUMNS, cols)})
+
+        keep = self.table[~self.table.file.isin(changed + removed)].astype(dict(file=str, name=str))
+        parts = [p for p in (keep, new) if len(p) > 0]
+        table = pd.concat(parts) if len(parts) > 0 else new
+        table = table.sort_values(['file', 'start'], ignore_index=True).astype(dict(layer=np.int32, line=np.int32, start=np.int64, end=np.int64, integer=bool, value=np.float64))
+        table['file'] = table.file.astype('category')
+        table['name'] = table.name.astype('category')
+        self.table = table
+        for f in removed:
+            del self.stats[f]
+        self.stats.update({f: stats[f] for f in changed})
+        self._rows = None
+        return changed + removed
+
+    @property
+    def rows(self):
+        '''
+        {name: the positions of its rows in the table}
+        '''
+        if self._rows is None:
+            self._rows = self.table.groupby('name', observed=True).indices
+        return self._rows
+
+    def names(self):
+        '''
+        the indexed parameter names
+        '''
+        return sorted(self.rows)
+
+    def find(self, name, files=None, layers=None):
+        '''
+        the index rows of a parameter
+
+        Parameters
+        ----------
+        name : str
+            the parameter name, e.g. CN2 or SOL_K (case insensitive).
+        files : list, optional
+            only these files. The default is None (all files).
+        layers : list, optional
+            only these soil layers. The default is None (all layers).
+
+        Returns
+        -------
+        DataFrame with the INDEX_COLUMNS.
+
+        '''
+        name = name.upper()
+        assert name in self.rows, 'Unknown parameter {} in {}'.format(name, self.TxtInOut)
+        rows = self.table.iloc[self.rows[name]]
+        if files is not None:
+            rows = rows[rows.file.isin(files)]
+        if layers is not None:
+            rows = rows[rows.layer.isin(layers)]
+        return rows
+
+    def get(self, name, files=None, layers=None):
+        '''
+        the values of a parameter, indexed by file (and layer for the soil layers), see find
+        '''
+        rows = self.find(name, files, layers)
+        index = ['file', 'layer'] if (rows.layer > 0).any() else 'file'
+        return rows.set_index(index).value.rename(name.upper())
+
+    def set(self, name, value, files=None, layers=None, method='v'):
+        '''
+        change a parameter like SWAT-CUP
+
+        Parameters
+        ----------
+        name, files, layers :
+            the values to change, see find.
+        value : float or Series
+            the change, or a Series of changes indexed by file.
+        method : str, optional
+            v replaces the values, r multiplies them by (1 + value) and a adds
+            value to them. The default is 'v'.
+
+        Returns
+        -------
+        list of the edited file names.
+
+        '''
+        assert method in ('v', 'r', 'a'), 'Unknown method {}, use v, r or a.'.format(method)
+        rows = self.find(name, files, layers)
+        change = rows.file.astype(str).map(value).astype(np.float64).values if isinstance(value, pd.Series) else value
+        old = rows.value.values
+        new = dict(v=lambda: np.broadcast_to(change, old.shape), r=lambda: old * (1. + change), a=lambda: old + change)[method]()
+        return self.write_rows(rows.index.values, new)
+
+    def update(self, edits):
+        '''
+        write many parameter values at once
+
+        Parameters
+        ----------
+        edits : DataFrame
+            file, name, value and optionally layer (default 0) of every new value.
+
+        Returns
+        -------
+        list of the edited file names.
+
+        '''
+        edits = edits.assign(name=edits.name.str.upper())
+        if 'layer' not in edits.columns:
+            edits = edits.assign(layer=0)
+        parts = []
+        for name, e in edits.groupby('name'):
+            rows = self.find(name)
+            m = e.merge(pd.DataFrame(dict(file=rows.file.astype(str).values, layer=rows.layer.values, row=rows.index.values)),
+                        on=['file', 'layer'], how='left')
+            missing = m[m.row.isna()]
+            assert len(missing) == 0, 'Parameter {} not indexed in {}'.format(name, list(zip(missing.file, missing.layer))[:5])
+            parts.append(m)
+        if len(parts) == 0:
+            return []
+        m = pd.concat(parts)
+        return self.write_rows(m.row.values.astype(np.int64), m.value.values.astype(np.float64))
+
+    def write_rows(self, rows, values):
+        '''
+        write new values of table rows, editing only the values that change
+        '''
+        rows, values = np.asarray(rows), np.asarray(values, np.float64)
+        table = self.table
+        changed = ~np.isnan(values) & (values != table.value.values[rows])
+        rows, values = rows[changed], values[changed]
+        if len(rows) == 0:
+            return []
+
+        # files changed since they were scanned are scanned again before their spans are used
+        fnames = table.file.values[rows].astype(str)
+        if len(self.refresh(sorted(set(fnames)))) > 0:
+            raise RuntimeError('Input files changed since they were indexed; the index was refreshed, repeat the edit.')
+
+        start, end, integer = table.start.values[rows], table.end.values[rows], table.integer.values[rows]
+        edits = dict()
+        texts = [fit_value(v, i, e - s) for s, e, i, v in zip(start, end, integer, values)]
+        for f, s, e, text in zip(fnames, start, end, texts):
+            edits.setdefault(f, []).append((s, e, text))
+        written = write_files(self.TxtInOut, edits, self.threads, stage=stage_spans)
+        # the values as written, which may be rounded to fit the fields
+        values = np.array([float(t) for t in texts])
+
+        col = table.columns.get_loc('value')
+        table.iloc[rows, col] = values
+        table.iloc[rows, table.columns.get_loc('integer')] = [is_integer(t.strip()) for t in texts]
+        for f in written:
+            st = os.stat(os.path.join(self.TxtInOut, f))
+            self.stats[f] = (st.st_size, st.st_mtime_ns)
+        return written
+
+
+#%%
+if __name__ == '__main__':
+    import time
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Index, print and edit the parameters of the SWAT input files')
+    parser.add_argument('TxtInOut', type=str, help='TxtInOut directory path')
+    parser.add_argument('names', type=str, nargs='*', help='the parameters to print, e.g. CN2 SOL_K; all names if none')
+    parser.add_argument('-s', '--set', type=str, nargs='+', default=[], help='NAME=value changes, e.g. CN2=-0.1')
+    parser.add_argument('-m', '--method', type=str, default='v', choices=['v', 'r', 'a'],
+                        help='replace (v), relative (r) or absolute (a) change, as in SWAT-CUP')
+    parser.add_argument('-f', '--files', type=str, nargs='+', help='only these files, e.g. 000010001.mgt')
+    parser.add_argument('-o', '--output', type=str, help='save the printed values to this CSV file')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    index = param_index(args.TxtInOut)
+    print('{} ({:.2f} s)'.format(index, time.perf_counter() - t0))
+
+    for s in args.set:
+        name, value = s.split('=')
+        t0 = time.perf_counter()
+        written = index.set(name, float(value), args.files, method=args.method)
+        print('{}: edited {} files ({:.2f} s)'.format(s, len(written), time.perf_counter() - t0))
+    if len(args.set) > 0:
+        index.save()
+
+    if len(args.names) == 0:
+        print(' '.join(index.names()))
+    else:
+        values = pd.concat([index.find(n, args.files) for n in args.names])[['file', 'name', 'layer', 'value']]
+        print(values.groupby('name', observed=True).value.describe())
+        if args.output is not None:
+            values.to_csv(args.output, index=False)
@@ -12,12 +12,42 @@ usage:
 
 
 import os
+import re
 import pandas as pd
 import numpy as np
-import datetime
+from swat_output_parser import fixed_width_output, calendar_dates
+from swat_cache import output_cache, fingerprint
+from swat_aggregate import STATS
+from swat_cube import SwatOutputCube, grid_layout, dense_grid
+from swat_tail import output_tail
+from swat_input import read_subhru, write_subhru, READ_THREADS
+from swat_params import param_index
+from swat_workspace import create_workspace
+from swat_config import read_config
 #%% SWAT_reader class
 class swat_reader():
     
+    # the variable columns of output.rch as in the SWAT2012 header
+    rch_variables = [c.strip() for c in ["  FLOW_INcms"," FLOW_OUTcms","     EVAPcms",            
+              "    TLOSScms","  SED_INtons"," SED_OUTtons",            
+              "SEDCONCmg/kg","   ORGN_INkg","  ORGN_OUTkg",            
+              "   ORGP_INkg","  ORGP_OUTkg","    NO3_INkg",            
+              "   NO3_OUTkg","    NH4_INkg","   NH4_OUTkg",            
+              "    NO2_INkg","   NO2_OUTkg","   MINP_INkg",            
+              "  MINP_OUTkg","   CHLA_INkg","  CHLA_OUTkg",            
+              "   CBOD_INkg","  CBOD_OUTkg","  DISOX_INkg",            
+              " DISOX_OUTkg"," SOLPST_INmg","SOLPST_OUTmg",            
+              " SORPST_INmg","SORPST_OUTmg","  REACTPSTmg",          
+              "    VOLPSTmg","  SETTLPSTmg","RESUSP_PSTmg",            
+              "DIFFUSEPSTmg","REACBEDPSTmg","   BURYPSTmg",            
+              "   BED_PSTmg"," BACTP_OUTct","BACTLP_OUTct",            
+              "  CMETAL#1kg","  CMETAL#2kg","  CMETAL#3kg",            
+              "     TOT Nkg","     TOT Pkg"," NO3ConcMg/l",            
+              "    WTMPdegc"]]
+    
+    # the variables SWAT2012 prints as 1x,e10.5, one character wider than their header names
+    wide_variables = {'output.sub': ('CHOLAmic/L',), 'output.hru': ('BACTPct', 'BACTLPct')}
+
     def __init__(self, TxtInOut):
         self.TxtInOut = TxtInOut
         self.read_cio()
@@ -27,139 +57,90 @@ class swat_reader():
         
     def read_cio(self,):
         '''
-        read SWAT file.cio
+        read SWAT file.cio into self.config (typed, see swat_config.ModelConfig)
+        and self.cio (the value texts by key)
 
         Returns
         -------
         None.
 
         '''
-        self.cio = dict()
-        lines_to_skip = tuple(range(7)) + (11, 33) + tuple(range(33, 41)) + (45, 47, 53, 57) + tuple(range(62, 73)) + (77, )
-        with open(os.path.join(self.TxtInOut, 'file.cio')) as f:
-            for i, l in enumerate(f):
-                if i in lines_to_skip:
-                    continue
-                else:
-                    val, key = l.split('|')
-                    key = key[:key.index(':')].strip()
-                    self.cio[key] = val.strip()
-        
-        
-        # self.output_start_date = pd.DateOffset(pd.Timestamp('{}-01-01'.format(int(self.cio["IYR"])+int(self.cio["NYSKIP"]))), day=int(self.cio["IDAF"])-1)
-        # self.output_end_date   = pd.DateOffset(pd.Timestamp('{}-01-01'.format(int(self.cio["IYR"])+int(self.cio["NBYR"])-1)), day=int(self.cio["IDAL"])-1)       
+        self.config = read_config(self.TxtInOut)
+        self.cio = dict(self.config.raw)
+        self.output_start_date = self.config.output_start_date
+        self.output_end_date   = self.config.output_end_date
     
-        self.output_start_date = pd.Timestamp('{}-01-01'.format(int(self.cio["IYR"])+int(self.cio["NYSKIP"]))) + \
-                                 pd.Timedelta(0 if self.cio["NYSKIP"]>'0' else int(self.cio["IDAF"]) - 1, 'D')
-        self.output_end_date   = pd.Timestamp('{}-01-01'.format(int(self.cio["IYR"])+int(self.cio["NBYR"])-1)) + \
-                                 pd.Timedelta(int(self.cio["IDAL"]) -1, 'D')
+    def read_input_sub(self, threads=READ_THREADS):
+        '''
+        read the land use, soil, slope, frac, ov_n, canmx, cn2 and usle_p of every HRU
+        into self.subhru, see swat_input.read_subhru
+
+        Parameters
+        ----------
+        threads : int, optional
+            the number of threads reading the input files. The default is READ_THREADS.
+
+        '''
+        self.subhru = read_subhru(self.TxtInOut, threads)
     
-    def read_input_sub(self):
-        TxtInOut = self.TxtInOut
-        
-        with open(os.path.join(TxtInOut, 'fig.fig')) as fig:
-            figlines = fig.readlines()
-            
-        isub = 0
-        subhru = []
-        for i in np.nonzero(map(lambda x: 'subbasin' in x, figlines))[0] + 1:
-            isub += 1
-            with open(os.path.join(TxtInOut, figlines[i].strip())) as fsub:
-                sublines = fsub.readlines()
-                
-            
-            sub_area = float(sublines[1][:20])
-            ih = np.nonzero(map(lambda x: x.startswith('HRU: General'), sublines))[0][0]
-            
-            for ihru, l in enumerate(sublines[ih+1:]):
-                hru_val = [isub, ihru+1, sub_area]
-                
-                with open(os.path.join(TxtInOut, l[:13])) as fhru:
-                    hrulines = fhru.readlines()
-                    l0 = hrulines[0]
-                    hru_val.append(l0[l0.index('Luse:')+5:l0.index('Luse:')+10].strip())
-                    hru_val.append(l0[l0.index('Soil:')+5:l0.index('Soil:')+12].strip())
-                    hru_val.append(l0[l0.index('Slope:')+6:l0.index('/')-2].strip())
-                    hru_val.append(float(hrulines[1][:20])) # frac
-                    hru_val.append(float(hrulines[4][:20])) # ov_n
-                    hru_val.append(float(hrulines[8][:20])) # canmx
-            
-                with open(os.path.join(TxtInOut, l[13:26])) as fhru:
-                    hrulines = fhru.readlines()
-                    hru_val.append(float(hrulines[10][:20])) # cn2
-                    hru_val.append(float(hrulines[11][:20])) # usle_p
-                    
-                    
-                subhru.append(hru_val)
-                    
-        self.subhru = pd.DataFrame(subhru, columns=['subbasin', 'hru', 'subarea', 'landuse', 'soil', 'slope', 'frac', 'ov_n', 'canmx', 'cn2', 'usle_p'])
-    
-    
-    def write_input_sub(self, subhru):
-        TxtInOut = self.TxtInOut
-        
-        with open(os.path.join(TxtInOut, 'fig.fig')) as fig:
-            figlines = fig.readlines()
-            
-        isub = 0
-        subfiles = np.array(figlines)[np.nonzero(map(lambda x: 'subbasin' in x, figlines))[0] + 1]
-        subfiles = np.char.strip(subfiles)
-        
-            
-            
-        for isub, df_hru in subhru.groupby('subbasin'):
-#            print(isub)
-            with open(os.path.join(TxtInOut, subfiles[isub - 1])) as fsub:
-                sublines = fsub.readlines()
-                ih = np.nonzero(map(lambda x: x.startswith('HRU: General'), sublines))[0][0]
-            
-            for ihru, r in df_hru.reset_index().iterrows():
-                l = sublines[ih +ihru + 1]
-                                
-                with open(os.path.join(TxtInOut, l[:13])) as fhru:
-                    hrulines = fhru.readlines()
-                
-                hrulines[1] = '{:<20}'.format(r.frac) + '| frac\n'
-                hrulines[4] = '{:<20}'.format(r.ov_n) + '| ov_n\n'
-                hrulines[8] = '{:<20}'.format(r.canmx) + '| canmx\n'
-                
-                with open(os.path.join(TxtInOut, l[:13]), 'w') as fhru:
-                    fhru.writelines(hrulines)
-            
-                with open(os.path.join(TxtInOut, l[13:26])) as fhru:
-                    hrulines = fhru.readlines()
-                
-                hrulines[10] = '{:<20}'.format(r.cn2) + '| cn2\n'
-                hrulines[11] = '{:<20}'.format(r.usle_p) + '| usle_p\n'                
-                
-                with open(os.path.join(TxtInOut, l[13:26]), 'w') as fhru:
-                    fhru.writelines(hrulines)
-                    
-        
-    def read_sub(self):
+    
+    def write_input_sub(self, subhru, threads=READ_THREADS):
         '''
-        read SWAT output sub
+        write frac, ov_n, canmx, cn2 and usle_p of a subhru table to the .hru and
+        .mgt files, see swat_input.write_subhru
+
+        Parameters
+        ----------
+        subhru : DataFrame
+            the table of read_input_sub with edited values.
+        threads : int, optional
+            the number of threads reading and writing the input files. The default is READ_THREADS.
 
         Returns
         -------
-        None.
+        list of the edited file names; files without a changed value are not rewritten.
 
         '''
-        
+        return write_subhru(self.TxtInOut, subhru, threads)
     
-        self.sub = dict()
-        
-        with open(os.path.join(self.TxtInOut, 'output.sub')) as f:
-            for l in f:
-                if l.startswith('HRU: General'):
-                    break
-                
-            for l in f:
-                self.sub
-            
-        return lines
-            
     
+    def index_params(self, threads=READ_THREADS):
+        '''
+        the file, line, byte span and value of every named parameter of the
+        input files (.hru, .mgt, .sol, .gw, .rte, ...) to read and edit any of
+        them, see swat_params.param_index
+
+        Parameters
+        ----------
+        threads : int, optional
+            the number of threads scanning and writing the input files. The default is READ_THREADS.
+
+        Returns
+        -------
+        param_index, loaded from the TxtInOut cache folder and updated for the changed files.
+
+        '''
+        return param_index(self.TxtInOut, threads=threads)
+    
+    
+    def create_workspace(self, path, mode='auto'):
+        '''
+        create a scenario workspace of this TxtInOut, linking the files instead
+        of copying them, see swat_workspace.create_workspace
+
+        Parameters
+        ----------
+        path : str
+            the new workspace directory.
+        mode : str, optional
+            reflink, hardlink, copy or auto (the first that works). The default is 'auto'.
+
+        Returns
+        -------
+        workspace, whose reader() is the swat_reader of the scenario.
+
+        '''
+        return create_workspace(self.TxtInOut, path, mode)
     
     def get_rch_header_width(self):
         """
@@ -170,58 +151,389 @@ class swat_reader():
         column names for output.sub
 
         """
-        columns= ["  FLOW_INcms"," FLOW_OUTcms","     EVAPcms",            
-                  "    TLOSScms","  SED_INtons"," SED_OUTtons",            
-                  "SEDCONCmg/kg","   ORGN_INkg","  ORGN_OUTkg",            
-                  "   ORGP_INkg","  ORGP_OUTkg","    NO3_INkg",            
-                  "   NO3_OUTkg","    NH4_INkg","   NH4_OUTkg",            
-                  "    NO2_INkg","   NO2_OUTkg","   MINP_INkg",            
-                  "  MINP_OUTkg","   CHLA_INkg","  CHLA_OUTkg",            
-                  "   CBOD_INkg","  CBOD_OUTkg","  DISOX_INkg",            
-                  " DISOX_OUTkg"," SOLPST_INmg","SOLPST_OUTmg",            
-                  " SORPST_INmg","SORPST_OUTmg","  REACTPSTmg",          
-                  "    VOLPSTmg","  SETTLPSTmg","RESUSP_PSTmg",            
-                  "DIFFUSEPSTmg","REACBEDPSTmg","   BURYPSTmg",            
-                  "   BED_PSTmg"," BACTP_OUTct","BACTLP_OUTct",            
-                  "  CMETAL#1kg","  CMETAL#2kg","  CMETAL#3kg",            
-                  "     TOT Nkg","     TOT Pkg"," NO3ConcMg/l",            
-                  "    WTMPdegc"]
-        cols_first = 'TYPE RCH GIS MO DA YR AREAkm2'.split() if self.cio['ICALEN'] == '1' else 'TYPE RCH GIS MON AREAkm2'.split()
+        columns = self.rch_variables
+        cols_first = 'TYPE RCH GIS MO DA YR AREAkm2'.split() if self.config.calendar else 'TYPE RCH GIS MON AREAkm2'.split()
                                                                           
-        widths = [6, 5, 10, 3, 3, 5, 13] if self.cio['ICALEN'] == '1' else [6, 5, 9, 6, 12]
-        return cols_first + [c.strip() for c in columns], widths + [12] * len(columns)
+        widths = [6, 5, 10, 3, 3, 5, 13] if self.config.calendar else [6, 5, 9, 6, 12]
+        return cols_first + columns, widths + [12] * len(columns)
+        
+    def get_output_header_width(self, fname, cols_first, widths, width=10, nlines=100):
+        """
+        Column names and widths of output.sub or output.hru. 
+
+        The variables printed to these files depend on the SWAT version and on the
+        output variables selected in file.cio, so their names are read from the
+        header line of the file: one name per `width` characters after AREAkm2.
+        The value widths are taken from the first `nlines` records, or from the
+        SWAT2012 formats (see wide_variables) if the values of these records
+        run together; an AssertionError is raised if neither fits the records.
+
+        Returns
+        -------
+        column names and widths
+
+        """
+        with open(os.path.join(self.TxtInOut, fname)) as f:
+            for i in range(9):
+                header = f.readline()
+            lines = [f.readline().rstrip('\r\n') for i in range(nlines)]
+        header = header.rstrip('\r\n')
+        start = header.index('AREAkm2') + len('AREAkm2')
+        columns = [header[i:i+width].strip() for i in range(start, len(header), width)]
+        
+        # most values are `width` characters, but SWAT2012 prints some with a
+        # leading blank (1x,e10.5), so a field ends where a value ends in any
+        # of the first records; the header names stay `width` apart
+        first = sum(widths)
+        ends = sorted(set(m.end() for l in lines for m in re.finditer(r'\S+', l[first:])))
+        if len(ends) == len(columns):
+            return cols_first + columns, widths + np.diff([0] + ends).tolist()
         
-    def read_rch(self):
+        values = [width + (c in self.wide_variables.get(fname, ())) for c in columns]
+        length = max([len(l) for l in lines if len(l) > 0], default=first + sum(values))
+        assert first + sum(values) == length, \
+            'The {} values of {} cannot be told apart: the records are {} characters, not the {} of the SWAT2012 formats.'.format(
+                len(columns), fname, length, first + sum(values))
+        return cols_first + columns, widths + values
+    
+    def get_sub_header_width(self):
+        """
+        Check ICALEN: Code for printing out calendar or julian dates to .rch, .sub and .hru files
+
+        Returns
+        -------
+        column names and widths for output.sub
+
+        """
+        cols_first = 'TYPE SUB GIS MO DA YR AREAkm2'.split() if self.config.calendar else 'TYPE SUB GIS MON AREAkm2'.split()
+        widths = [6, 4, 9, 3, 3, 5, 10] if self.config.calendar else [6, 4, 9, 5, 10]
+        return self.get_output_header_width('output.sub', cols_first, widths)
+    
+    def get_hru_header_width(self):
+        """
+        Check ICALEN: Code for printing out calendar or julian dates to .rch, .sub and .hru files
+
+        Returns
+        -------
+        column names and widths for output.hru
+
+        """
+        cols_first = 'LULC HRU GIS SUB MGT MO DA YR AREAkm2'.split() if self.config.calendar else 'LULC HRU GIS SUB MGT MON AREAkm2'.split()
+        widths = [4, 5, 10, 5, 5, 3, 3, 5, 10] if self.config.calendar else [4, 5, 10, 5, 5, 5, 10]
+        return self.get_output_header_width('output.hru', cols_first, widths)
+    
+    def output_date_index(self):
         '''
-        read SWAT output reach
+        the time steps printed to the output files with julian dates (ICALEN=0)
+        '''
+        # TODO: may need to change if the starting date is not Januray 1
+        date_index = pd.date_range(self.output_start_date, self.output_end_date, freq=self.config.freq)
+        date_index.name = 'time'
+        return date_index
+    
+    def read_output(self, fname, header_width, unit, columns=None, units=None, cache=False):
+        '''
+        read a SWAT output file (output.rch, output.sub or output.hru)
+
+        The file is memory-mapped and only the requested columns of the records
+        of the requested units are decoded. With cache=True, the whole file is
+        parsed once and kept in the "<TxtInOut>.cache" folder; later calls load
+        from there until SWAT rewrites the file.
+
+        Parameters
+        ----------
+        fname : str
+            the output file name.
+        header_width : tuple
+            the column names and widths of the file, e.g. self.get_rch_header_width().
+        unit : str
+            the column of the unit numbers, e.g. RCH.
+        columns : list, optional
+            the variables to read. The default is all variables.
+        units : list, optional
+            the units to read. The default is all units.
+        cache : bool, optional
+            use and update the parsed output cache. The default is False.
 
         Returns
         -------
-        dat : TYPE
-            DESCRIPTION.
+        dat : DataFrame
+            the unit and the variable columns indexed by time.
+
+        '''
+        if cache:
+            fpath = os.path.join(self.TxtInOut, fname)
+            assert os.path.exists(fpath), '{} does not exist. Make sure the model run has completed.'.format(fpath)
+            store = output_cache(self.TxtInOut, fname, self.cio)
+            if not store.valid():
+                key = fingerprint(fpath, self.cio)
+                store.save(self.read_output(fname, header_width, unit), key)
+            try:
+                return store.load(columns, units)
+            except OSError:
+                # the version was replaced and deleted by another process while loading
+                pass
+        
+        blocks = list(self.iter_output(fname, header_width, unit, None, columns, units))
+        return blocks[0] if len(blocks) == 1 else pd.concat(blocks)
+    
+    def output_columns(self, fname, header_width, columns=None):
+        '''
+        the requested variables of an output file, checked against its header
+        '''
+        names = header_width[0]
+        variables = names[names.index('AREAkm2')+1:]
+        if columns is None:
+            return variables
+        columns = list(columns)
+        unknown = [c for c in columns if c not in variables]
+        assert len(unknown) == 0, 'Unknown {} variables: {}'.format(fname, unknown)
+        return columns
+    
+    def iter_records(self, fname, header_width, unit, chunk_timesteps=365, units=None):
+        '''
+        locate the records of a SWAT output file in blocks of whole time steps
+
+        Parameters
+        ----------
+        see iter_output
+
+        Yields
+        ------
+        out : fixed_width_output
+            the parsed file.
+        rows : ndarray
+            positions of the records of the block.
+        ids : ndarray
+            the unit numbers of the records.
+        index : DatetimeIndex
+            the time of the records.
 
         '''
-        fpath = os.path.join(self.TxtInOut, 'output.rch')
+        fpath = os.path.join(self.TxtInOut, fname)
         
         assert os.path.exists(fpath), '{} does not exist. Make sure the model run has completed.'.format(fpath)
         
-        with open(fpath) as f:
-            columns, widths = self.get_rch_header_width()
-            dat = pd.read_fwf(f, skiprows=9, header=None, widths=widths)
-            dat.columns = columns
-            if self.cio['ICALEN'] == '1': 
-                dat.index = dat.apply(lambda x: datetime.datetime(x.YR, x.MO, x.DA), axis=1)
+        names, widths = header_width
+        out = fixed_width_output(fpath, names, widths, skiprows=9)
+        nrec = len(out)
+        if nrec == 0:
+            return
+        
+        # the number of units printed at every time step: the records before
+        # the first change of the time stamp, searched in growing windows
+        stamp_col = 'DA' if self.config.calendar else 'MON'
+        n = 4096
+        while True:
+            stamp = out.read(stamp_col, rows=slice(0, n))
+            nsub = np.flatnonzero(stamp != stamp[0])
+            if len(nsub) > 0 or n >= nrec:
+                break
+            n *= 4
+        nsub = nsub[0] if len(nsub) > 0 else nrec
+        if not self.config.calendar:
+            date_index = self.output_date_index()
+            ntime = 0
+            if self.config.iprint == 0: # remove the ending statistics for monthly output
+                nrec -= nsub
+        
+        # blocks of whole time steps: every time step or summary has nsub records
+        blocksize = nrec if chunk_timesteps is None else chunk_timesteps * nsub
+        for r0 in range(0, nrec, blocksize):
+            rows = np.arange(r0, min(r0 + blocksize, nrec))
+            ids = out.read(unit, np.int64, rows)
+            if self.config.calendar:
+                index = pd.DatetimeIndex(calendar_dates(out.read('YR', np.int64, rows), out.read('MO', np.int64, rows), out.read('DA', np.int64, rows)))
             else:
-                # TODO: may need to change if the starting date is not Januray 1
-                step = {'0':'M', '1':'D', '2':'A'}
-                nsub = dat.RCH.max()
-                dat = dat[dat.MON <= 366] # remove the annual output
-                if self.cio['IPRINT'] == '0': # remove the ending statistics for monthly output
-                    dat = dat.iloc[:-nsub]                    
-                date_index = pd.date_range(self.output_start_date, self.output_end_date, freq=step[self.cio['IPRINT']])
-                dat.index = np.repeat(date_index, nsub)
-                dat.index.name = 'time'
-        return dat.iloc[:, [1] + list(range(columns.index('AREAkm2')+1, len(columns)))]
+                keep = out.read('MON', rows=rows) <= 366 # remove the annual output
+                rows, ids = rows[keep], ids[keep]
+                nt = len(rows) // nsub
+                index = np.repeat(date_index[ntime:ntime + nt], nsub)
+                ntime += nt
+                assert len(index) == len(rows), 'The {} records in {} do not match the {} output dates from {} to {} for {} units.'.format(
+                    ntime * nsub, fpath, len(date_index), self.output_start_date, self.output_end_date, nsub)
+            
+            if units is not None:
+                keep = np.isin(ids, units)
+                rows, ids, index = rows[keep], ids[keep], index[keep]
+            
+            yield out, rows, ids, index
+        
+        if not self.config.calendar:
+            assert ntime == len(date_index), 'The {} records in {} do not match the {} output dates from {} to {} for {} units.'.format(
+                ntime * nsub, fpath, len(date_index), self.output_start_date, self.output_end_date, nsub)
+    
+    def iter_output(self, fname, header_width, unit, chunk_timesteps=365, columns=None, units=None):
+        '''
+        read a SWAT output file in blocks of whole time steps
+
+        Only one block is decoded at a time, so the memory use does not grow
+        with the length of the simulation.
+
+        Parameters
+        ----------
+        fname : str
+            the output file name.
+        header_width : tuple
+            the column names and widths of the file, e.g. self.get_rch_header_width().
+        unit : str
+            the column of the unit numbers, e.g. RCH.
+        chunk_timesteps : int, optional
+            the number of output records per unit in a block; a block may hold
+            fewer time steps when it contains annual summary records. None reads
+            the whole file as one block. The default is 365.
+        columns : list, optional
+            the variables to read. The default is all variables.
+        units : list, optional
+            the units to read. The default is all units.
+
+        Yields
+        ------
+        dat : DataFrame
+            the unit and the variable columns indexed by time.
+
+        '''
+        columns = self.output_columns(fname, header_width, columns)
+        for out, rows, ids, index in self.iter_records(fname, header_width, unit, chunk_timesteps, units):
+            dat = out.to_frame(columns, rows, index)
+            dat.insert(0, unit, ids)
+            yield dat
+    
+    def read_output_cube(self, fname, header_width, unit, columns=None, units=None, dtype=np.float64):
+        '''
+        read a SWAT output file into a (time, unit, variable) SwatOutputCube
+
+        The columns are decoded straight into the array, without building the
+        long DataFrame of read_output.
+
+        Parameters
+        ----------
+        see read_output
+        dtype : numpy dtype, optional
+            the data type of the array, e.g. np.float32. The default is np.float64.
+
+        Returns
+        -------
+        SwatOutputCube
+
+        '''
+        columns = self.output_columns(fname, header_width, columns)
+        blocks = list(self.iter_records(fname, header_width, unit, None, units))
+        assert len(blocks) == 1 and len(blocks[0][1]) > 0, 'No {} records found in {} for the {}s {}.'.format(fname, self.TxtInOut, unit, units)
+        out, rows, ids, index = blocks[0]
+        
+        layout = grid_layout(ids, index.values)
+        assert layout is not None, '{} is not a dense grid of time steps and {}s.'.format(fname, unit)
+        nt, nu, order, ids, times = layout
+        values = np.empty((nt, nu, len(columns)), dtype=dtype)
+        for i, c in enumerate(columns):
+            values[:, :, i] = out.read(c, rows=rows).reshape(nt, nu)[:, order]
+        return SwatOutputCube(values, times, ids, columns, unit)
+    
+    def read_rch(self, columns=None, reaches=None, cache=False):
+        '''
+        read SWAT output reach
+
+        Parameters
+        ----------
+        columns : list, optional
+            the variables to read, e.g. ['FLOW_OUTcms']. The default is all variables.
+        reaches : list, optional
+            the reaches to read. The default is all reaches.
+        cache : bool, optional
+            use and update the parsed output cache. The default is False.
+
+        Returns
+        -------
+        dat : DataFrame
+            RCH and the variable columns indexed by time.
+
+        '''
+        return self.read_output('output.rch', self.get_rch_header_width(), 'RCH', columns, reaches, cache)
+    
+    def iter_rch(self, chunk_timesteps=365, columns=None, reaches=None):
+        '''
+        read SWAT output reach in blocks of whole time steps, see iter_output
+
+        Yields
+        ------
+        dat : DataFrame
+            RCH and the variable columns indexed by time, as returned by read_rch.
+
+        '''
+        return self.iter_output('output.rch', self.get_rch_header_width(), 'RCH', chunk_timesteps, columns, reaches)
+    
+    def read_rch_cube(self, columns=None, reaches=None, dtype=np.float64):
+        '''
+        read SWAT output reach into a (time, reach, variable) SwatOutputCube, see read_output_cube
+        '''
+        return self.read_output_cube('output.rch', self.get_rch_header_width(), 'RCH', columns, reaches, dtype)
+    
+    def follow_rch(self, columns=None, reaches=None):
+        '''
+        follow output.rch while SWAT is still writing it, see swat_tail.output_tail
+
+        Returns
+        -------
+        output_tail
+            call poll() to parse the time steps appended since the last call.
+
+        '''
+        return output_tail(self, 'output.rch', self.get_rch_header_width, 'RCH', columns, reaches)
+    
+    def read_sub(self, columns=None, subbasins=None, cache=False):
+        '''
+        read SWAT output sub
+
+        Parameters
+        ----------
+        columns : list, optional
+            the variables to read, e.g. ['PRECIPmm', 'WYLDmm']. The default is all variables.
+        subbasins : list, optional
+            the subbasins to read. The default is all subbasins.
+        cache : bool, optional
+            use and update the parsed output cache. The default is False.
+
+        Returns
+        -------
+        dat : DataFrame
+            SUB and the variable columns indexed by time.
+
+        '''
+        return self.read_output('output.sub', self.get_sub_header_width(), 'SUB', columns, subbasins, cache)
+    
+    def iter_sub(self, chunk_timesteps=365, columns=None, subbasins=None):
+        '''
+        read SWAT output sub in blocks of whole time steps, see iter_output
+        '''
+        return self.iter_output('output.sub', self.get_sub_header_width(), 'SUB', chunk_timesteps, columns, subbasins)
+    
+    def read_hru(self, columns=None, hrus=None, cache=False):
+        '''
+        read SWAT output hru
+
+        Parameters
+        ----------
+        columns : list, optional
+            the variables to read, e.g. ['ETmm', 'SURQ_GENmm']. The default is all variables.
+        hrus : list, optional
+            the HRUs (the sequential HRU numbers of the HRU column) to read. The default is all HRUs.
+        cache : bool, optional
+            use and update the parsed output cache. The default is False.
+
+        Returns
+        -------
+        dat : DataFrame
+            HRU and the variable columns indexed by time.
+
+        '''
+        return self.read_output('output.hru', self.get_hru_header_width(), 'HRU', columns, hrus, cache)
+    
+    def iter_hru(self, chunk_timesteps=365, columns=None, hrus=None):
+        '''
+        read SWAT output hru in blocks of whole time steps, see iter_output
+        '''
+        return self.iter_output('output.hru', self.get_hru_header_width(), 'HRU', chunk_timesteps, columns, hrus)
     
     
     @staticmethod
@@ -237,6 +549,10 @@ class swat_reader():
             the unit (hru, sub or rch) to be keep.
         vars : TYPE
             the variables to be keep.
+        freq : str, optional
+            the resampling frequency, e.g. M for monthly.
+        stat : list, optional
+            the aggregation method of each variable: sum, mean, std, sem, max, min, median, first or last.
 
         Returns
         -------
@@ -245,6 +561,16 @@ class swat_reader():
         '''
         unit = df_out.columns[0]
         df_filter = df_out.loc[df_out[unit].isin(units), [unit] + vars]
+        
+        # dense outputs are reshaped to a (time, unit, variable) array and aggregated
+        # with bins computed once; other outputs fall back to pandas
+        dense = dense_grid(df_filter, unit, vars)
+        if dense is not None and (freq is None or set(stat[:len(vars)]) <= set(STATS)):
+            grid, ids, times = dense
+            cube = SwatOutputCube(grid, times, ids, vars, unit)
+            if freq is not None:
+                cube = cube.resample(freq, stat)
+            return cube.to_frame()
     
         if freq is not None:
             # do aggregation
@@ -256,6 +582,59 @@ class swat_reader():
             df_filter = df_filter.reset_index().set_index([unit, 'time']).sort_index()
             
         return df_filter
+    
+    @staticmethod
+    def filter_blocks(blocks, units, vars, freq=None, stat=None):
+        '''
+        filter and aggregate the blocks of iter_output as they are read; only
+        the complete bins of a block are aggregated and the rows of the bin at
+        the end of a block are carried to the next block, so one block and
+        one bin are held instead of the whole filtered series
+
+        Parameters
+        ----------
+        blocks : iterable
+            DataFrames of whole time steps in time order, e.g. iter_rch.
+        units, vars, freq, stat :
+            see filter.
+
+        Yields
+        ------
+        the filtered DataFrame of the complete bins of each block, with the
+        empty bins since the previous block as NaN; their sorted
+        concatenation equals filter of the whole output.
+
+        '''
+        carry, last = None, None
+        def aggregate(df_keep):
+            df_filter = swat_reader.filter(df_keep, units, vars, freq, stat)
+            if freq is None:
+                return df_filter
+            # the bins from the one after the last time step of the previous
+            # block on, so the empty bins between two blocks are kept as NaN
+            times = df_keep.index.unique()
+            if last is not None:
+                times = times.insert(0, last)
+            bins = pd.Series(0, index=times).resample(freq).first().index[int(last is not None):]
+            index = pd.MultiIndex.from_product([df_filter.index.get_level_values(0).unique(), bins],
+                                               names=df_filter.index.names)
+            return df_filter.reindex(index)
+        for df_out in blocks:
+            unit = df_out.columns[0]
+            df_keep = df_out.loc[df_out[unit].isin(units), [unit] + vars]
+            if carry is not None:
+                df_keep = pd.concat([carry, df_keep])
+            if freq is not None and len(df_keep) > 0:
+                # the first time step of the last bin, which may go on in the next block
+                times = pd.Series(df_keep.index, index=df_keep.index)
+                start = times.resample(freq).first().dropna().iloc[-1]
+                carry = df_keep[df_keep.index >= start]
+                df_keep = df_keep[df_keep.index < start]
+            if len(df_keep) > 0:
+                yield aggregate(df_keep)
+                last = df_keep.index[-1]
+        if carry is not None and len(carry) > 0:
+            yield aggregate(carry)
 #%%    
 if __name__ == '__main__':
     TxtInOut = r"D:\WorkSync\hydrology_swat_lab\LittleCreek1\Scenarios\Default\TxtInOut"   
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+This script render many PNG figures in parallel.
+
+A figure job is (draw, fpath, kwargs): draw is a module-level function
+drawing on an Axes, called as draw(ax, **kwargs), and kwargs hold only the
+arrays of that figure (e.g. one reach or one parameter), so a worker never
+receives a whole DataFrame. The jobs are spread over a process pool whose
+workers draw with the Agg canvas directly (no pyplot, no GUI backend), and
+every worker keeps one figure and axes that are cleared and reused for all
+its jobs instead of creating a figure per plot.
+
+usage:
+    jobs = [(draw_lines, 'flow-3.png', dict(lines=[dict(x=t, y=q3)], title='Subbasin 3')),
+            (draw_lines, 'flow-12.png', dict(lines=[dict(x=t, y=q12)], title='Subbasin 12'))]
+    render(jobs, figsize=(8, 5), dpi=300, style='ggplot')
+"""
+
+
+import os
+import numpy as np
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+
+# the figure and axes reused by the jobs of this process, keyed by figure size
+_axes = dict()
+
+
+def init_worker(style=None):
+    '''
+    apply the matplotlib style of the plots in a worker process
+    '''
+    if style is not None:
+        import matplotlib.style
+        matplotlib.style.use(style)
+
+
+def get_axes(figsize):
+    '''
+    the reusable Agg figure and axes of this process, cleared for a new plot
+    '''
+    if figsize not in _axes:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure(figsize=figsize)
+        FigureCanvasAgg(fig)
+        _axes[figsize] = (fig, fig.add_subplot())
+    fig, ax = _axes[figsize]
+    ax.clear()
+    return fig, ax
+
+
+def render_job(job, figsize, dpi, tight):
+    '''
+    draw and save one figure job; returns the file path
+    '''
+    draw, fpath, kwargs = job
+    fig, ax = get_axes(tuple(figsize))
+    draw(ax, **kwargs)
+    fig.savefig(fpath, dpi=dpi, bbox_inches='tight' if tight else None)
+    return fpath
+
+
+def render_chunk(jobs, figsize, dpi, tight):
+    return [render_job(job, figsize, dpi, tight) for job in jobs]
+
+
+def render(jobs, figsize=(8, 5), dpi=300, tight=True, style=None, processes=None):
+    '''
+    render figure jobs in a process pool
+
+    Parameters
+    ----------
+    jobs : list
+        (draw, fpath, kwargs) of every figure, see the module docstring.
+    figsize : tuple, optional
+        the figure size in inches. The default is (8, 5).
+    dpi : int, optional
+        the resolution of the PNG files. The default is 300.
+    tight : bool, optional
+        whether to save with bbox_inches='tight'. The default is True.
+    style : str or list, optional
+        the matplotlib style of the plots, e.g. 'ggplot'. The default is None (the current rcParams).
+    processes : int, optional
+        the number of worker processes. The default is None (the number of CPUs).
+        With 1 process or a single job the figures are drawn in this process.
+
+    Returns
+    -------
+    list of the saved file paths.
+
+    '''
+    jobs = list(jobs)
+    processes = (os.cpu_count() or 1) if processes is None else processes
+    processes = min(processes, len(jobs))
+    if processes <= 1:
+        if style is not None:
+            import matplotlib.style
+            with matplotlib.style.context(style):
+                return render_chunk(jobs, figsize, dpi, tight)
+        return render_chunk(jobs, figsize, dpi, tight)
+
+    # a few chunks per worker keep the pool busy while every chunk reuses the worker's figure
+    nchunk = min(len(jobs), processes * 4)
+    chunks = [jobs[i::nchunk] for i in range(nchunk)]
+    with ProcessPoolExecutor(processes, initializer=init_worker, initargs=(style,)) as ex:
+        done = list(ex.map(partial(render_chunk, figsize=figsize, dpi=dpi, tight=tight), chunks))
+    return [f for chunk in done for f in chunk]
+
+
+def downsample(x, y, buckets):
+    '''
+    reduce a line to the first, minimum, maximum and last points of each bucket
+
+    The points are split into equal buckets, e.g. one per pixel column of
+    the figure, so the drawn line keeps every peak and trough of the full
+    series with at most 4 points per bucket.
+
+    Parameters
+    ----------
+    x, y : ndarray
+        the points of the line, sorted by x.
+    buckets : int
+        the number of buckets, e.g. the figure width in pixels.
+
+    Returns
+    -------
+    x, y : ndarray
+        the kept points; the line itself if it has no more than 4 points per bucket.
+
+    '''
+    x, y = np.asarray(x), np.asarray(y)
+    n = len(y)
+    if buckets < 1 or n <= 4 * buckets:
+        return x, y
+    size = -(-n // buckets)
+    nb = -(-n // size)
+    pad = nb * size - n
+    # NaN never wins the min or max, so a gap is kept only when a whole bucket is NaN
+    v = y.astype(np.float64)
+    lo = np.concatenate([np.where(np.isnan(v), np.inf, v), np.full(pad, np.inf)]).reshape(nb, size)
+    hi = np.concatenate([np.where(np.isnan(v), -np.inf, v), np.full(pad, -np.inf)]).reshape(nb, size)
+    start = np.arange(nb) * size
+    keep = np.concatenate([start, start + lo.argmin(axis=1), start + hi.argmax(axis=1), np.minimum(start + size, n) - 1])
+    keep = np.unique(np.minimum(keep, n - 1))
+    return x[keep], y[keep]
+
+
+def downsample_lines(lines, buckets):
+    '''
+    downsample the x and y arrays of draw_lines lines, see downsample
+    '''
+    out = []
+    for line in lines:
+        line = dict(line)
+        line['x'], line['y'] = downsample(line['x'], line['y'], buckets)
+        out.append(line)
+    return out
+
+
+def draw_lines(ax, lines, title=None, xlabel=None, ylabel=None, log=False, legend=False):
+    '''
+    draw time series, e.g. simulated and observed flow
+
+    Parameters
+    ----------
+    ax : Axes
+        the axes to draw on.
+    lines : list
+        dicts with x and y arrays and the optional plot keywords (label, linewidth, linestyle, ...).
+    title, xlabel, ylabel : str, optional
+        the labels of the plot.
+    log : bool, optional
+        whether to use a log scale for y. The default is False.
+    legend : bool, optional
+        whether to draw a legend of the line labels. The default is False.
+
+    '''
+    for line in lines:
+        line = dict(line)
+        ax.plot(line.pop('x'), line.pop('y'), **line)
+    if log:
+        ax.set_yscale('log')
+    if title is not None:
+        ax.set_title(title)
+    if xlabel is not None:
+        ax.set_xlabel(xlabel)
+    if ylabel is not None:
+        ax.set_ylabel(ylabel)
+    if legend:
+        ax.legend()
+
+
+def draw_points(ax, x, y, xlabel=None, ylabel=None):
+    '''
+    draw a scatter of the objective function against a parameter
+    '''
+    ax.scatter(x, y, s=10)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+
+
+def draw_envelope(ax, parname, edges, envelope, behavioral, best, spearman, maximize=True):
+    '''
+    draw the dot plot of one parameter from the binned summaries of goal.txt
+
+    Parameters
+    ----------
+    ax : Axes
+        the axes to draw on.
+    parname : str
+        the parameter name.
+    edges : ndarray
+        the bin edges of the parameter.
+    envelope : dict
+        the min, max and mean objective of each bin, see sufi2_goal.envelopes.
+    behavioral : tuple
+        (min, max) of the parameter over the behavioral simulations.
+    best : float
+        the parameter value of the best simulation.
+    spearman : float
+        the rank correlation of the parameter with the objective.
+    maximize : bool, optional
+        larger objective values are better; otherwise the minimum of each bin
+        is its best. The default is True.
+
+    '''
+    centers = (edges[:-1] + edges[1:]) / 2
+    ax.fill_between(centers, envelope['min'], envelope['max'], step='mid', alpha=0.3, linewidth=0)
+    ax.plot(centers, envelope['max' if maximize else 'min'], 'o', markersize=4, label='best in bin')
+    ax.plot(centers, envelope['mean'], '-', linewidth=1, label='mean in bin')
+    if not np.isnan(behavioral[0]):
+        ax.axvspan(behavioral[0], behavioral[1], color='gray', alpha=0.15, label='behavioral range')
+    ax.axvline(best, color='k', linewidth=1, linestyle='--', label='best simulation')
+    ax.set_xlabel(parname)
+    ax.set_ylabel('Objective function')
+    ax.set_title('Spearman rank correlation: {:.2f}'.format(spearman), fontsize=10)
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+This script run SWAT for many scenario folders in a process pool and read
+the outputs of each run as soon as it finishes.
+
+The .bat chain (00000-run-swat.bat, then save_rch.py, then plot_flow.py)
+handles one TxtInOut at a time. Here each worker process runs the SWAT
+executable in a TxtInOut folder and then reads and filters its output (see
+swat_reader.read_rch and swat_reader.filter) while the other runs go on.
+Every result comes with the wall time and the peak memory of the run, and
+the results are yielded in the order the runs finish.
+
+The executable is a command, so any program that reads file.cio in its
+working folder can stand in for SWAT. DUMMY_EXE writes a synthetic
+output.rch (see swat_synthetic.dummy_run), so the scheduler can be used
+without SWAT, e.g. on Linux.
+
+usage:
+    python swat_run.py Scenarios/s001 Scenarios/s002 --exe C:\\SWAT\\ArcSWAT\\swat_64rel.exe -n 4 --units 3 12 --vars FLOW_OUTcms -o runs
+    python swat_run.py Scenarios/s001 Scenarios/s002 --dummy --units 3 12 --freq M --stat mean
+
+    runner = swat_runner(SWAT_EXE, processes=4)
+    for stats, flow in runner.iter_runs(TxtInOuts, [3, 12], ['FLOW_OUTcms']):
+        print(stats['scenario'], stats['wall_run'], stats['peak_mb'])
+"""
+
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from swat_scenarios import scenario_name, read_scenario
+
+
+# the SWAT2012 executable of ArcSWAT, found on the PATH or in the TxtInOut folder
+SWAT_EXE = 'swat_64rel.exe'
+
+# a fake SWAT run writing output.rch, see swat_synthetic.dummy_run
+DUMMY_EXE = (sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'swat_synthetic.py'), '.', '--dummy')
+
+# the file in the TxtInOut folder receiving the screen output of a run
+LOG_FILE = 'swat_run.log'
+
+# the columns of the run statistics
+RUN_COLUMNS = ['scenario', 'TxtInOut', 'returncode', 'wall_run', 'peak_mb', 'wall_read', 'nrows', 'error']
+
+
+def peak_memory_windows(handle):
+    '''
+    the peak working set (MB) of a finished process from its Windows handle
+    '''
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + \
+                   [(name, ctypes.c_size_t) for name in ('PeakWorkingSetSize', 'WorkingSetSize',
+                    'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage',
+                    'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(int(handle), ctypes.byref(counters), counters.cb):
+        return float('nan')
+    return counters.PeakWorkingSetSize / 2**20
+
+
+def read_hwm(status_file):
+    '''
+    the VmHWM (peak resident memory, KB) of a Linux /proc/<pid>/status file; 0 once the process exited
+    '''
+    try:
+        with open(status_file) as f:
+            for l in f:
+                if l.startswith('VmHWM:'):
+                    return int(l.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def wait_process(proc, timeout=None):
+    '''
+    wait for a process and measure its peak memory; the process is killed
+    after timeout seconds
+
+    Returns
+    -------
+    returncode : int
+        the exit code, None if the process was killed at the timeout.
+    peak_mb : float
+        the peak resident memory in MB, NaN where it cannot be measured.
+
+    '''
+    if not hasattr(os, 'wait4'):
+        # Windows: the handle stays valid after the exit until Popen closes it
+        try:
+            returncode = proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            returncode = None
+        return returncode, peak_memory_windows(proc._handle)
+
+    # on Linux, ru_maxrss of wait4 also counts the memory of this process
+    # copied at the fork, so the high-water mark of the new program is sampled
+    # from /proc while it runs (growth in the last interval may be missed)
+    status_file = '/proc/{}/status'.format(proc.pid)
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    killed, hwm, interval = False, 0, 0.01
+    while True:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if pid != 0:
+            break
+        hwm = max(hwm, read_hwm(status_file))
+        if deadline is not None and not killed and time.perf_counter() > deadline:
+            proc.kill()
+            killed = True
+        time.sleep(interval)
+        interval = min(0.1, interval * 2)
+    # tell Popen the process is reaped
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if sys.platform.startswith('linux'):
+        peak_mb = hwm / 2**10 if hwm > 0 else float('nan')
+    else:
+        # ru_maxrss is in bytes on macOS
+        peak_mb = usage.ru_maxrss / 2**20
+    return (None if killed else proc.returncode), peak_mb
+
+
+def run_swat(TxtInOut, exe=SWAT_EXE, timeout=None):
+    '''
+    run the SWAT executable in a TxtInOut folder, writing its screen output to LOG_FILE
+
+    Parameters
+    ----------
+    TxtInOut : str
+        the TxtInOut directory, the working folder of the run.
+    exe : str or sequence, optional
+        the executable or a command list, e.g. DUMMY_EXE. The default is SWAT_EXE.
+    timeout : float, optional
+        the seconds after which the run is killed. The default is None (no limit).
+
+    Returns
+    -------
+    dict of returncode (None if killed), wall_run (s), peak_mb and error (the
+    last line of the log if the run failed).
+
+    '''
+    command = [exe] if isinstance(exe, str) else list(exe)
+    # a copy of the executable in the TxtInOut folder is found on every platform
+    if os.path.exists(os.path.join(TxtInOut, command[0])):
+        command[0] = os.path.abspath(os.path.join(TxtInOut, command[0]))
+    log = os.path.join(TxtInOut, LOG_FILE)
+    t0 = time.perf_counter()
+    with open(log, 'wb') as f:
+        proc = subprocess.Popen(command, cwd=TxtInOut, stdout=f, stderr=subprocess.STDOUT)
+        returncode, peak_mb = wait_process(proc, timeout)
+    stats = dict(returncode=returncode, wall_run=time.perf_counter() - t0, peak_mb=peak_mb, error='')
+    if returncode != 0:
+        with open(log, 'rb') as f:
+            lines = f.read().decode('latin-1').strip().splitlines()
+        stats['error'] = 'killed after {} s'.format(timeout) if returncode is None else (lines[-1].strip() if len(lines) > 0 else 'exit code {}'.format(returncode))
+    return stats
+
+
+def run_scenario(TxtInOut, name, exe, timeout, output, units, vars, freq, stat):
+    '''
+    run one scenario and read its filtered output; runs in the worker processes
+
+    Returns
+    -------
+    stats : dict
+        the RUN_COLUMNS of the run.
+    df : DataFrame
+        the filtered output, see swat_reader.filter; None if the run failed
+        or its output could not be read (the error is in stats).
+
+    '''
+    stats = dict(scenario=name, TxtInOut=TxtInOut)
+    stats.update(run_swat(TxtInOut, exe, timeout))
+    df = None
+    if stats['returncode'] == 0:
+        t0 = time.perf_counter()
+        try:
+            # a fresh output has nothing to gain from the parse cache
+            df = read_scenario(TxtInOut, output, units, vars, freq, stat, False)
+        except Exception as e:
+            # a broken output fails this run only, not the runs of the others
+            stats['error'] = 'reading the output failed: {}: {}'.format(type(e).__name__, e)
+            return stats, None
+        stats['wall_read'] = time.perf_counter() - t0
+        stats['nrows'] = len(df)
+    return stats, df
+
+
+class swat_runner():
+    '''
+    a bounded pool of SWAT runs, each read and filtered as soon as it finishes
+    '''
+
+    def __init__(self, exe=SWAT_EXE, processes=None, timeout=None, output='rch'):
+        '''
+        Parameters
+        ----------
+        exe : str or sequence, optional
+            the executable or a command list run in each TxtInOut folder. The default is SWAT_EXE.
+        processes : int, optional
+            the number of runs at a time; 1 runs in this process. The default is the number of CPUs.
+        timeout : float, optional
+            the seconds after which a run is killed. The default is None (no limit).
+        output : str, optional
+            the output file to read: rch, sub or hru. The default is rch.
+
+        '''
+        assert output in ('rch', 'sub', 'hru'), 'Unknown SWAT output {}'.format(output)
+        self.exe = exe
+        self.processes = processes
+        self.timeout = timeout
+        self.output = output
+
+    def __repr__(self):
+        return 'SWAT runner of {} ({} processes)'.format(self.exe, self.processes or os.cpu_count())
+
+    def iter_runs(self, TxtInOuts, units, vars, freq=None, stat=None, names=None):
+        '''
+        run the scenarios and yield each result as its run finishes
+
+        Parameters
+        ----------
+        TxtInOuts : list
+            the TxtInOut directory paths, e.g. the paths of swat_workspace.workspace_set.
+        units, vars, freq, stat :
+            the output filter, see swat_reader.filter.
+        names : list, optional
+            the scenario names. The default is the folder names, see swat_scenarios.scenario_name.
+
+        Yields
+        ------
+        stats : dict
+            scenario, TxtInOut, returncode, wall_run, peak_mb, wall_read, nrows and error.
+        df : DataFrame
+            the filtered output; None if the run or the reading failed.
+
+        '''
+        TxtInOuts = list(TxtInOuts)
+        names = [scenario_name(t) for t in TxtInOuts] if names is None else list(names)
+        assert len(names) == len(TxtInOuts), 'The scenario names need to match the TxtInOut folders.'
+        tasks = [(t, n, self.exe, self.timeout, self.output, units, vars, freq, stat) for t, n in zip(TxtInOuts, names)]
+
+        if self.processes == 1:
+            for task in tasks:
+                yield run_scenario(*task)
+        else:
+            with ProcessPoolExecutor(self.processes) as pool:
+                futures = [pool.submit(run_scenario, *task) for task in tasks]
+                for fu in as_completed(futures):
+                    yield fu.result()
+
+    def run(self, TxtInOuts, units, vars, freq=None, stat=None, names=None):
+        '''
+        run the scenarios and collect the results, see iter_runs
+
+        Returns
+        -------
+        stats : DataFrame
+            the RUN_COLUMNS of every run, in the order of TxtInOuts.
+        df : DataFrame
+            the filtered outputs of the successful runs indexed by scenario, unit and time.
+
+        '''
+        TxtInOuts = list(TxtInOuts)
+        results = list(self.iter_runs(TxtInOuts, units, vars, freq, stat, names))
+        order = {t: i for i, t in enumerate(TxtInOuts)}
+        results.sort(key=lambda r: order[r[0]['TxtInOut']])
+        stats = pd.DataFrame([r[0] for r in results], columns=RUN_COLUMNS)
+        frames = [(s['scenario'], df) for s, df in results if df is not None]
+        df = pd.concat([f for _, f in frames], keys=[n for n, _ in frames], names=['scenario']) if len(frames) > 0 else None
+        return stats, df
+
+
+#%% set up the command
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run SWAT for many TxtInOut folders and read the outputs as the runs finish')
+    parser.add_argument('TxtInOut', nargs='+', help='TxtInOut directory paths, required.')
+    parser.add_argument('--exe', default=SWAT_EXE, type=str, help='the SWAT executable (default: %(default)s).')
+    parser.add_argument('--dummy', action='store_true', help='run the dummy SWAT of swat_synthetic instead of --exe.')
+    parser.add_argument('-n', '--processes', type=int, help='number of runs at a time (default: the number of CPUs).')
+    parser.add_argument('--timeout', type=float, help='seconds after which a run is killed.')
+    parser.add_argument('--units', type=int, nargs='+', required=True, help='reach numbers to read.')
+    parser.add_argument('--vars', type=str, nargs='+', default=['FLOW_OUTcms'], help='variables to read (default: %(default)s).')
+    parser.add_argument('--freq', type=str, help='aggregation frequency, e.g. M.')
+    parser.add_argument('--stat', type=str, nargs='+', help='aggregation method of each variable, e.g. mean.')
+    parser.add_argument('-o', '--output', default='swat_run', type=str, help='prefix of the csv files of the run statistics and outputs (default: %(default)s).')
+
+    args = parser.parse_args()
+
+    for t in args.TxtInOut:
+        if not os.path.exists(t):
+            raise OSError(t + ' not found')
+    stat = args.stat if args.stat is None or len(args.stat) == len(args.vars) else args.stat * len(args.vars)
+
+    runner = swat_runner(DUMMY_EXE if args.dummy else args.exe, args.processes, args.timeout)
+    print(runner)
+    t0 = time.perf_counter()
+    rows, frames = [], []
+    for stats, df in runner.iter_runs(args.TxtInOut, args.units, args.vars, args.freq, stat):
+        if df is None:
+            print('{}: failed ({}), {:.2f} s'.format(stats['scenario'], stats['error'], stats['wall_run']))
+        else:
+            print('{}: {:.2f} s, {:.1f} MB peak, {} rows read in {:.2f} s'.format(
+                stats['scenario'], stats['wall_run'], stats['peak_mb'], stats['nrows'], stats['wall_read']))
+            frames.append((stats['scenario'], df))
+        rows.append(stats)
+
+    pd.DataFrame(rows, columns=RUN_COLUMNS).to_csv(args.output + '_runs.csv', index=False)
+    if len(frames) > 0:
+        pd.concat([f for _, f in frames], keys=[n for n, _ in frames], names=['scenario']).to_csv(args.output + '_' + runner.output + '.csv')
+    print('{} of {} runs finished in {:.2f} s, saved to {}_*.csv'.format(len(frames), len(rows), time.perf_counter() - t0, args.output))
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+This script read and compare the outputs of many SWAT scenarios.
+
+The TxtInOut folders are parsed in a process pool, one scenario per task,
+and the filtered outputs are returned as one long-format DataFrame indexed
+by scenario, unit and time.
+
+usage:
+    scenarios = ScenarioSet([r'Scenarios\\Default\\TxtInOut', r'Scenarios\\Warm\\TxtInOut'])
+    flow = scenarios.filter([3, 12], ['FLOW_OUTcms'], 'M', ['mean'])
+"""
+
+
+import os
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from swat_reader import swat_reader
+
+
+def scenario_name(TxtInOut):
+    '''
+    name a scenario after its folder, e.g. Scenarios/Default/TxtInOut -> Default
+    '''
+    path = os.path.normpath(os.path.abspath(TxtInOut))
+    if os.path.basename(path).lower() == 'txtinout':
+        path = os.path.dirname(path)
+    return os.path.basename(path)
+
+
+def read_scenario(TxtInOut, output, units, vars, freq, stat, cache):
+    '''
+    read and filter the output of one scenario; runs in the worker processes
+    '''
+    swatreader = swat_reader(TxtInOut)
+    df_out = getattr(swatreader, 'read_' + output)(vars, units, cache=cache)
+    return swat_reader.filter(df_out, units, vars, freq, stat)
+
+
+class ScenarioSet():
+    '''
+    a set of SWAT TxtInOut folders read in parallel
+    '''
+
+    def __init__(self, TxtInOuts, names=None, processes=None):
+        '''
+        Parameters
+        ----------
+        TxtInOuts : list
+            the TxtInOut directory paths.
+        names : list, optional
+            the scenario names. The default is the folder names, see scenario_name.
+        processes : int, optional
+            the number of worker processes; 1 reads the scenarios in this process.
+            The default is the number of CPUs.
+
+        '''
+        self.TxtInOuts = list(TxtInOuts)
+        self.names = [scenario_name(t) for t in self.TxtInOuts] if names is None else list(names)
+        assert len(self.names) == len(self.TxtInOuts), 'The scenario names need to match the TxtInOut folders.'
+        assert len(set(self.names)) == len(self.names), 'The scenario names need to be unique: {}'.format(self.names)
+        self.processes = processes
+
+    def __repr__(self):
+        return '{} SWAT scenarios: {}'.format(len(self.names), ', '.join(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def filter(self, units, vars, freq=None, stat=None, output='rch', cache=False):
+        '''
+        read and filter the same units and variables of every scenario
+
+        Parameters
+        ----------
+        units : list
+            the units (reaches, subbasins or HRUs) to keep.
+        vars : list
+            the variables to keep.
+        freq : str, optional
+            the aggregation frequency, see swat_reader.filter.
+        stat : list, optional
+            the aggregation method of each variable, see swat_reader.filter.
+        output : str, optional
+            the output file to read: rch, sub or hru. The default is rch.
+        cache : bool, optional
+            use and update the parsed output cache of each scenario. The default is False.
+
+        Returns
+        -------
+        DataFrame indexed by scenario, unit and time.
+
+        '''
+        assert output in ('rch', 'sub', 'hru'), 'Unknown SWAT output {}'.format(output)
+        tasks = [(t, output, units, vars, freq, stat, cache) for t in self.TxtInOuts]
+
+        if self.processes == 1 or len(tasks) == 1:
+            frames = [read_scenario(*t) for t in tasks]
+        else:
+            with ProcessPoolExecutor(self.processes) as pool:
+                frames = list(pool.map(read_scenario, *zip(*tasks)))
+
+        return pd.concat(frames, keys=self.names, names=['scenario'])
+
+    def read_rch(self, reaches, vars, freq=None, stat=None, cache=False):
+        '''
+        read output.rch of every scenario, see filter
+        '''
+        return self.filter(reaches, vars, freq, stat, 'rch', cache)
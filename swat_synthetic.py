@@ -0,0 +1,563 @@
+# -*- coding: utf-8 -*-
+"""
+This script write a small synthetic SWAT TxtInOut (file.cio, output.rch and
+optionally output.sub, output.hru, fig.fig with the subbasin and HRU input
+files and the weather files) so that the readers can be benchmarked or exercised without a model
+run.
+
+usage:
+    python swat_synthetic.py TxtInOut --nrch 150 --nbyr 30 --iprint 1
+    python swat_synthetic.py TxtInOut --nrch 100 --nbyr 2 --nhru 50
+    python swat_synthetic.py TxtInOut --nbyr 30 --nstation 20
+    python swat_synthetic.py TxtInOut --nrch 20 --nhru 10 --sub --hru --icalen 1
+    python swat_synthetic.py TxtInOut --dummy  # a fake SWAT run writing output.rch
+"""
+
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+
+#%% file.cio
+# (line number, key, default value) of the entries written to file.cio; the
+# remaining lines are the section titles of a SWAT2012 file.cio
+CIO_LINES = {
+    7:  ('NBYR', 10),   8: ('IYR', 2000),    9: ('IDAF', 1),     10: ('IDAL', 366),
+    12: ('IGEN', 0),   13: ('PCPSIM', 1),   14: ('IDT', 0),     15: ('IDIST', 0),
+    16: ('REXP', 1.3), 17: ('NRGAGE', 1),   18: ('NRTOT', 1),   19: ('NRGFIL', 1),
+    20: ('TMPSIM', 1), 21: ('NTGAGE', 1),   22: ('NTTOT', 1),   23: ('NTGFIL', 1),
+    24: ('SLRSIM', 2), 25: ('NSTOT', 0),    26: ('RHSIM', 2),   27: ('NHTOT', 0),
+    28: ('WNDSIM', 2), 29: ('NWTOT', 0),    30: ('FCSTYEAR', 0), 31: ('FCSTDAY', 0),
+    32: ('FCSTCYCLES', 0),
+    41: ('SLRFILE', ''), 42: ('RHFILE', ''), 43: ('WNDFILE', ''), 44: ('FCSTFILE', ''),
+    46: ('BSNFILE', 'basins.bsn'),
+    48: ('PLANTDB', 'plant.dat'), 49: ('TILLDB', 'till.dat'), 50: ('PESTDB', 'pest.dat'),
+    51: ('FERTDB', 'fert.dat'),   52: ('URBANDB', 'urban.dat'),
+    54: ('ISPROJ', 0), 55: ('ICLB', 0), 56: ('CALFILE', ''),
+    58: ('IPRINT', 1), 59: ('NYSKIP', 0), 60: ('ILOG', 0), 61: ('IPRP', 0),
+    73: ('ATMOFILE', ''), 74: ('IPHR', 0), 75: ('ISTO', 0), 76: ('ISOL', 0),
+    78: ('I_SUBHR', 0), 79: ('SEPTDB', 'septwq.dat'), 80: ('ISUBWQ', 0),
+    81: ('ISED_DET', 0), 82: ('IHUMUS', 0), 83: ('ITEMP', 0), 84: ('ISNOW', 0),
+    85: ('IMGT', 0), 86: ('IWTR', 0), 87: ('ICALEN', 0),
+}
+
+CIO_TITLES = {
+    0: 'Master Watershed File: file.cio', 1: 'Project Description:',
+    2: 'General Input/Output section (file.cio):', 3: 'synthetic TxtInOut', 4: '',
+    5: 'General Information/Watershed Configuration:', 6: 'fig.fig',
+    11: 'Climate:', 33: 'Precipitation Files:', 34: 'pcp1.pcp', 35: '', 36: '',
+    37: 'Temperature Files:', 38: 'Tmp1.Tmp', 39: '', 40: '',
+    45: 'Watershed Modeling Options:', 47: 'Database Files:', 53: 'Special Projects:',
+    57: 'Output Information:', 62: 'Reach output variables:', 63: '   0' * 20,
+    64: 'Subbasin output variables:', 65: '   0' * 15,
+    66: 'HRU output variables:', 67: '   0' * 20, 68: '   0' * 20,
+    69: 'HRU data to be printed:', 70: '   0' * 20, 71: '   0' * 20,
+    72: 'ATMOSPHERIC DEPOSITION:', 77: '',
+}
+
+
+def write_file_cio(TxtInOut, **cio):
+    '''
+    write a SWAT2012 style file.cio
+
+    Parameters
+    ----------
+    TxtInOut : str
+        the directory to write file.cio to.
+    **cio :
+        values overriding the defaults in CIO_LINES, e.g. NBYR=30, ICALEN=1.
+
+    Returns
+    -------
+    None.
+
+    '''
+    lines = dict(CIO_TITLES)
+    for i, (key, val) in CIO_LINES.items():
+        lines[i] = '{:>16}    | {}: {}'.format(str(cio.get(key, val)), key, key.lower())
+
+    with open(os.path.join(TxtInOut, 'file.cio'), 'w') as f:
+        for i in range(max(lines) + 1):
+            f.write(lines[i] + '\n')
+
+
+#%% output.rch
+def output_dates(nbyr, iyr, nyskip, iprint):
+    '''
+    the printed time steps of a simulation starting on Jan 1 and ending on Dec 31
+
+    Returns
+    -------
+    list of (year, DatetimeIndex) for each printed year
+
+    '''
+    years = range(iyr + nyskip, iyr + nbyr)
+    freq = 'D' if iprint == 1 else 'MS'
+    return [(y, pd.date_range('{}-01-01'.format(y), '{}-12-31'.format(y), freq=freq)) for y in years]
+
+
+def write_records(f, nunit, line, stamps, nbyr, iyr, nyskip, iprint, icalen):
+    '''
+    write the records of an output file, nunit per time step, with the annual
+    summary lines of julian outputs and the average annual summary of monthly
+    ones, as written by SWAT
+
+    Parameters
+    ----------
+    f : file
+        the open output file, after its header.
+    nunit : int
+        number of units (reaches, subbasins or HRUs) printed per time step.
+    line : function
+        line(i, stamp, k) formats the record of unit i (from 0) with the time
+        stamp string; k counts the records written.
+    stamps : tuple
+        the formats of the julian stamp, of the average annual stamp and of the
+        calendar (month, day, year) stamp.
+
+    '''
+    julian, average, calendar = stamps
+    k = 0
+    dates = output_dates(nbyr, iyr, nyskip, iprint)
+    for y, steps in dates:
+        for d in steps:
+            stamp = calendar.format(d.month, d.day, d.year) if icalen == 1 else \
+                    julian.format(d.dayofyear if iprint == 1 else d.month)
+            for i in range(nunit):
+                f.write(line(i, stamp, k))
+                k += 1
+        if icalen == 0:
+            for i in range(nunit):
+                f.write(line(i, julian.format(y), k))
+                k += 1
+    if icalen == 0 and iprint == 0:
+        for i in range(nunit):
+            f.write(line(i, average.format(len(dates)), k))
+            k += 1
+
+
+def write_output_rch(TxtInOut, nrch=10, nbyr=10, iyr=2000, nyskip=0, iprint=1, icalen=0, seed=0):
+    '''
+    write a synthetic output.rch using the fixed-width formats of SWAT2012.
+
+    Daily and monthly outputs include the annual summary lines; monthly outputs
+    also end with the average annual summary, as written by SWAT.
+
+    Parameters
+    ----------
+    TxtInOut : str
+        the directory to write output.rch to.
+    nrch : int, optional
+        number of reaches. The default is 10.
+    nbyr, iyr, nyskip, iprint, icalen : int, optional
+        the file.cio settings that shape the file.
+
+    Returns
+    -------
+    None.
+
+    '''
+    from swat_reader import swat_reader
+    rng = np.random.default_rng(seed)
+    nvar = len(swat_reader.rch_variables)
+
+    # a pool of formatted variable blocks that rows are drawn from
+    pool = [''.join(' {:11.4E}'.format(v) for v in rng.gamma(0.5, 20., nvar)) for i in range(997)]
+    areas = [' {:11.4E}'.format(a) for a in rng.uniform(1., 5e3, nrch)]
+
+    def line(i, stamp, k):
+        if icalen == 1:
+            return 'REACH {:5d} {:8d} {} {}{}\n'.format(i + 1, 0, stamp, areas[i], pool[k % len(pool)])
+        return 'REACH {:5d} {:8d}{}{}{}\n'.format(i + 1, 0, stamp, areas[i], pool[k % len(pool)])
+
+    header = ('       RCH      GIS   MO DA   YR     AREAkm2' if icalen == 1 else '       RCH      GIS   MON     AREAkm2') + \
+             ''.join('{:>12}'.format(c) for c in swat_reader.rch_variables)
+
+    with open(os.path.join(TxtInOut, 'output.rch'), 'w') as f:
+        f.write('\n SWAT synthetic output\n\n\n\n\n\n\n')
+        f.write(header + '\n')
+        write_records(f, nrch, line, ('{:6d}', '{:6.1f}', '{:3d}{:3d}{:5d}'), nbyr, iyr, nyskip, iprint, icalen)
+
+
+#%% output.sub and output.hru
+# the variables of output.sub and output.hru in SWAT2012 and their Fortran
+# formats (repeat, leading blanks, E or F, width, decimals); a 1x,e10.5 value
+# is 11 characters wide while its header name is 10
+SUB_VARIABLES = ['PRECIPmm', 'SNOMELTmm', 'PETmm', 'ETmm', 'SWmm', 'PERCmm', 'SURQmm', 'GW_Qmm', 'WYLDmm',
+                 'SYLDt/ha', 'ORGNkg/ha', 'ORGPkg/ha', 'NSURQkg/ha', 'SOLPkg/ha', 'SEDPkg/ha', 'LAT Q(mm)',
+                 'LATNO3kg/h', 'GWNO3kg/ha', 'CHOLAmic/L', 'CBODU mg/L', 'DOXQ mg/L', 'TNO3kg/ha', 'QTILEmm', 'TVAPkg/ha']
+SUB_FORMATS = [(18, 0, 'F', 10, 3), (1, 1, 'E', 10, 5), (5, 0, 'E', 10, 3)]
+
+HRU_VARIABLES = ['PRECIPmm', 'SNOFALLmm', 'SNOMELTmm', 'IRRmm', 'PETmm', 'ETmm', 'SW_INITmm', 'SW_ENDmm',
+                 'PERCmm', 'GW_RCHGmm', 'DA_RCHGmm', 'REVAPmm', 'SA_IRRmm', 'DA_IRRmm', 'SA_STmm', 'DA_STmm',
+                 'SURQ_GENmm', 'SURQ_CNTmm', 'TLOSSmm', 'LATQGENmm', 'GW_Qmm', 'WYLDmm', 'DAILYCN', 'TMP_AVdgC',
+                 'TMP_MXdgC', 'TMP_MNdgC', 'SOL_TMPdgC', 'SOLARMJ/m2', 'SYLDt/ha', 'USLEt/ha', 'N_APPkg/ha',
+                 'P_APPkg/ha', 'NAUTOkg/ha', 'PAUTOkg/ha', 'NGRZkg/ha', 'PGRZkg/ha', 'NCFRTkg/ha', 'PCFRTkg/ha',
+                 'NRAINkg/ha', 'NFIXkg/ha', 'F-MNkg/ha', 'A-MNkg/ha', 'A-SNkg/ha', 'F-MPkg/ha', 'AO-LPkg/ha',
+                 'L-APkg/ha', 'A-SPkg/ha', 'DNITkg/ha', 'NUPkg/ha', 'PUPkg/ha', 'ORGNkg/ha', 'ORGPkg/ha',
+                 'SEDPkg/ha', 'NSURQkg/ha', 'NLATQkg/ha', 'NO3Lkg/ha', 'NO3GWkg/ha', 'SOLPkg/ha', 'P_GWkg/ha',
+                 'W_STRS', 'TMP_STRS', 'N_STRS', 'P_STRS', 'BIOMt/ha', 'LAI', 'YLDt/ha', 'BACTPct', 'BACTLPct',
+                 'WTAB CLIm', 'WTAB SOLm', 'SNOmm', 'CMUPkg/ha', 'CMTOTkg/ha', 'QTILEmm', 'TNO3kg/ha',
+                 'LNO3kg/ha', 'GW_Q_Dmm', 'LATQCNTmm', 'TVAPkg/ha']
+HRU_FORMATS = [(66, 0, 'F', 10, 3), (2, 1, 'E', 10, 5), (8, 0, 'E', 10, 3), (3, 0, 'F', 10, 3)]
+
+
+def fortran_e(v, width, digits):
+    '''
+    format v like the Fortran edit descriptor E<width>.<digits>, e.g. 0.12345E+03;
+    the leading zero is dropped if the value does not fit otherwise
+    '''
+    if v == 0:
+        s = '0.' + '0' * digits + 'E+00'
+    else:
+        m, e = '{:.{}E}'.format(abs(v), digits - 1).split('E')
+        s = '0.' + m.replace('.', '') + 'E{:+03d}'.format(int(e) + 1)
+    s = ('-' if v < 0 else '') + s
+    if len(s) > width:
+        s = s.replace('0.', '.', 1)
+    return s.rjust(width)
+
+
+def format_values(values, formats):
+    '''
+    format the values of a record with the (repeat, blanks, E or F, width, decimals) formats
+    '''
+    out, i = [], 0
+    for repeat, blanks, kind, width, digits in formats:
+        for v in values[i:i + repeat]:
+            out.append(' ' * blanks + (fortran_e(v, width, digits) if kind == 'E' else '{:{}.{}f}'.format(v, width, digits)))
+        i += repeat
+    return ''.join(out)
+
+
+def write_output_sub(TxtInOut, nsub=10, nbyr=10, iyr=2000, nyskip=0, iprint=1, icalen=0, seed=0):
+    '''
+    write a synthetic output.sub using the formats of SWAT2012, e.g. for
+    ICALEN=0 'BIGSUB',i4,1x,i8,1x,i4,e10.5,18f10.3,1x,e10.5,5e10.3
+
+    Parameters
+    ----------
+    TxtInOut : str
+        the directory to write output.sub to.
+    nsub : int, optional
+        number of subbasins. The default is 10.
+    nbyr, iyr, nyskip, iprint, icalen : int, optional
+        the file.cio settings that shape the file.
+
+    Returns
+    -------
+    None.
+
+    '''
+    rng = np.random.default_rng(seed)
+    pool = [format_values(rng.gamma(0.5, 20., len(SUB_VARIABLES)), SUB_FORMATS) for i in range(997)]
+    areas = [fortran_e(a, 10, 5) for a in rng.uniform(1., 5e3, nsub)]
+
+    def line(i, stamp, k):
+        return 'BIGSUB{:4d} {:8d}{}{}{}\n'.format(i + 1, 0, stamp, areas[i], pool[k % len(pool)])
+
+    header = '{:>10}{:>9}'.format('SUB', 'GIS') + \
+             ('{:>3}{:>3}{:>5}'.format('MO', 'DA', 'YR') if icalen == 1 else '{:>5}'.format('MON')) + \
+             '{:>10}'.format('AREAkm2') + ''.join('{:>10}'.format(c) for c in SUB_VARIABLES)
+
+    with open(os.path.join(TxtInOut, 'output.sub'), 'w') as f:
+        f.write('\n SWAT synthetic output\n\n\n\n\n\n\n')
+        f.write(header + '\n')
+        write_records(f, nsub, line, (' {:4d}', ' {:4.1f}', ' {:2d} {:2d} {:4d}'), nbyr, iyr, nyskip, iprint, icalen)
+
+
+def write_output_hru(TxtInOut, nsub=10, nhru=5, nbyr=10, iyr=2000, nyskip=0, iprint=1, icalen=0, seed=0):
+    '''
+    write a synthetic output.hru using the formats of SWAT2012, e.g. for
+    ICALEN=0 a4,i5,1x,a9,1x,i4,1x,i4,1x,i4,e10.5,66f10.3,1x,e10.5,1x,e10.5,8e10.3,3f10.3
+
+    Parameters
+    ----------
+    TxtInOut : str
+        the directory to write output.hru to.
+    nsub : int, optional
+        number of subbasins. The default is 10.
+    nhru : int, optional
+        number of HRUs per subbasin. The default is 5.
+    nbyr, iyr, nyskip, iprint, icalen : int, optional
+        the file.cio settings that shape the file.
+
+    Returns
+    -------
+    None.
+
+    '''
+    rng = np.random.default_rng(seed)
+    luse = ['AGRL', 'FRSD', 'PAST', 'RNGE', 'URMD', 'WATR']
+    pool = [format_values(rng.gamma(0.5, 20., len(HRU_VARIABLES)), HRU_FORMATS) for i in range(997)]
+    hrus = ['{:4s}{:5d} {:05d}{:04d} {:4d} {:4d}'.format(luse[rng.integers(len(luse))], i + 1, i // nhru + 1, i % nhru + 1, i // nhru + 1, 0)
+            for i in range(nsub * nhru)]
+    areas = [fortran_e(a, 10, 5) for a in rng.uniform(0.01, 50., nsub * nhru)]
+
+    def line(i, stamp, k):
+        return '{}{}{}{}\n'.format(hrus[i], stamp, areas[i], pool[k % len(pool)])
+
+    header = '{:>4}{:>5}{:>10}{:>5}{:>5}'.format('LULC', 'HRU', 'GIS', 'SUB', 'MGT') + \
+             ('{:>3}{:>3}{:>5}'.format('MO', 'DA', 'YR') if icalen == 1 else '{:>5}'.format('MON')) + \
+             '{:>10}'.format('AREAkm2') + ''.join('{:>10}'.format(c) for c in HRU_VARIABLES)
+
+    with open(os.path.join(TxtInOut, 'output.hru'), 'w') as f:
+        f.write('\n SWAT synthetic output\n\n\n\n\n\n\n')
+        f.write(header + '\n')
+        write_records(f, nsub * nhru, line, (' {:4d}', ' {:4.1f}', ' {:2d} {:2d} {:4d}'), nbyr, iyr, nyskip, iprint, icalen)
+
+
+#%% input files
+# the parameter lines of the synthetic .hru, .mgt, .gw and .rte files: (name, format, low, high, description)
+HRU_LINES = [('HRU_FR', '{:16.7f}', 0., 1., 'Fraction of subbasin area contained in HRU'),
+             ('SLSUBBSN', '{:16.3f}', 10., 120., 'Average slope length [m]'),
+             ('HRU_SLP', '{:16.3f}', 0.001, 0.3, 'Average slope stepness [m/m]'),
+             ('OV_N', '{:16.3f}', 0.01, 0.5, "Manning's \"n\" value for overland flow"),
+             ('LAT_TTIME', '{:16.3f}', 0., 0., 'Lateral flow travel time [days]'),
+             ('LAT_SED', '{:16.3f}', 0., 0., 'Sediment concentration in lateral and groundwater flow [mg/l]'),
+             ('SLSOIL', '{:16.3f}', 0., 0., 'Slope length for lateral subsurface flow [m]'),
+             ('CANMX', '{:16.3f}', 0., 10., 'Maximum canopy storage [mm]'),
+             ('ESCO', '{:16.3f}', 0.5, 1., 'Soil evaporation compensation factor'),
+             ('EPCO', '{:16.3f}', 0.5, 1., 'Plant uptake compensation factor')]
+MGT_LINES = [(None, 'Initial Plant Growth Parameters'),
+             ('NMGT', '{:16d}', 0, 0, 'Management code'),
+             ('IGRO', '{:16d}', 0, 1, 'Land cover status: 0-none growing; 1-growing'),
+             ('PLANT_ID', '{:16d}', 1, 100, 'Land cover ID number (IGRO = 1)'),
+             ('LAI_INIT', '{:16.2f}', 0., 0., 'Initial leaf are index (IGRO = 1)'),
+             ('BIO_INIT', '{:16.2f}', 0., 0., 'Initial biomass (kg/ha) (IGRO = 1)'),
+             ('PHU_PLT', '{:16.2f}', 0., 0., 'Number of heat units to bring plant to maturity (IGRO = 1)'),
+             (None, 'General Management Parameters'),
+             ('BIOMIX', '{:16.2f}', 0.2, 0.2, 'Biological mixing efficiency'),
+             ('CN2', '{:16.2f}', 35., 98., 'Initial SCS CN II value'),
+             ('USLE_P', '{:16.2f}', 0.1, 1., 'USLE support practice factor'),
+             ('BIO_MIN', '{:16.2f}', 0., 0., 'Minimum biomass for grazing (kg/ha)'),
+             ('FILTERW', '{:16.3f}', 0., 0., 'Width of edge of field filter strip (m)')]
+GW_LINES = [('SHALLST', '{:16.4f}', 0., 5000., 'Initial depth of water in the shallow aquifer [mm]'),
+            ('DEEPST', '{:16.4f}', 0., 5000., 'Initial depth of water in the deep aquifer [mm]'),
+            ('GW_DELAY', '{:16.4f}', 0., 500., 'Groundwater delay [days]'),
+            ('ALPHA_BF', '{:16.4f}', 0., 1., 'BFLOW alpha factor [days]'),
+            ('GWQMN', '{:16.4f}', 0., 5000., 'Threshold depth of water in the shallow aquifer required for return flow to occur [mm]'),
+            ('GW_REVAP', '{:16.4f}', 0.02, 0.2, 'Groundwater "revap" coefficient'),
+            ('REVAPMN', '{:16.4f}', 0., 500., 'Threshold depth of water in the shallow aquifer for "revap" to occur [mm]'),
+            ('RCHRG_DP', '{:16.4f}', 0., 1., 'Deep aquifer percolation fraction')]
+RTE_LINES = [('CH_W2', '{:14.3f}', 1., 100., 'Main channel width [m]'),
+             ('CH_D', '{:14.3f}', 0.1, 5., 'Main channel depth [m]'),
+             ('CH_S2', '{:14.3f}', 0.0001, 0.05, 'Main channel slope [m/m]'),
+             ('CH_L2', '{:14.3f}', 0.5, 50., 'Main channel length [km]'),
+             ('CH_N2', '{:14.3f}', 0.01, 0.3, "Manning's nvalue for main channel"),
+             ('CH_K2', '{:14.3f}', 0., 150., 'Effective hydraulic conductivity [mm/hr]')]
+
+
+# the layer lines of the synthetic .sol files: (label, low, high)
+SOL_LINES = [(' Depth                [mm]:', 100., 2000.),
+             (' Bulk Density Moist [g/cc]:', 1.1, 1.9),
+             (' Ave. AW Incl. Rock Frag  :', 0.01, 0.4),
+             (' Ksat. (est.)      [mm/hr]:', 0.1, 100.),
+             (' Organic Carbon [weight %]:', 0.1, 3.),
+             (' Clay           [weight %]:', 5., 50.),
+             (' Silt           [weight %]:', 5., 50.),
+             (' Sand           [weight %]:', 5., 50.),
+             (' Rock Fragments   [vol. %]:', 0., 0.),
+             (' Soil Albedo (Moist)      :', 0.01, 0.25),
+             (' Erosion K                :', 0.05, 0.5),
+             (' Salinity (EC, Form 5)    :', 0., 0.)]
+
+
+def sol_lines(soil, nlayer, rng):
+    '''
+    the text of a .sol file body with random values, one 12 characters column per layer
+    '''
+    lines = [' Soil Name: {}'.format(soil),
+             ' Soil Hydrologic Group: {}'.format('ABCD'[rng.integers(4)]),
+             ' Maximum rooting depth(m) :{:12.2f}'.format(rng.uniform(500., 2000.)),
+             ' Porosity fraction from which anions are excluded: 0.500',
+             ' Crack volume potential of soil: 0.500',
+             ' Texture 1       : ']
+    for label, low, high in SOL_LINES:
+        values = np.sort(rng.uniform(low, high, nlayer)) if label.startswith(' Depth') else rng.uniform(low, high, nlayer)
+        lines.append(label + ''.join('{:12.2f}'.format(v) for v in values))
+    return lines
+
+
+def parameter_lines(lines, rng):
+    '''
+    the text of parameter lines with random values: value | NAME : description
+    '''
+    text = []
+    for entry in lines:
+        if entry[0] is None:
+            text.append(entry[1])
+            continue
+        name, fmt, lo, hi, desc = entry
+        v = rng.integers(lo, hi + 1) if 'd' in fmt else rng.uniform(lo, hi)
+        text.append('{}    | {} : {}'.format(fmt.format(v), name, desc))
+    return text
+
+
+def write_input_files(TxtInOut, nsub=10, nhru=5, seed=0):
+    '''
+    write fig.fig and the .sub, .rte, .hru, .mgt, .sol and .gw files in the SWAT2012 formats
+
+    Parameters
+    ----------
+    TxtInOut : str
+        the directory to write the files to.
+    nsub : int, optional
+        number of subbasins. The default is 10.
+    nhru : int, optional
+        number of HRUs in every subbasin. The default is 5.
+
+    Returns
+    -------
+    None.
+
+    '''
+    rng = np.random.default_rng(seed)
+    # the soils draw from their own stream so the other files do not depend on them
+    srng = np.random.default_rng([seed, 1])
+    stamp = '7/20/2020 12:00:00 AM ArcSWAT 2012.10_4.21'
+    luse = ['AGRL', 'RNGE', 'FRSD', 'PAST', 'URML', 'WATR']
+
+    fig = []
+    for isub in range(1, nsub + 1):
+        fig += ['subbasin       1{:6d}{:6d}     0'.format(isub, isub), '          {:05d}0000.sub'.format(isub)]
+    for isub in range(1, nsub + 1):
+        fig += ['route          2{:6d}{:6d}{:6d}'.format(nsub + isub, isub, isub), '          {:05d}0000.rte{:05d}0000.swq'.format(isub, isub)]
+    fig.append('finish         0')
+    with open(os.path.join(TxtInOut, 'fig.fig'), 'w') as f:
+        f.write('\n'.join(fig) + '\n')
+
+    def write(fname, lines):
+        with open(os.path.join(TxtInOut, fname), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    for isub in range(1, nsub + 1):
+        name = '{:05d}0000'.format(isub)
+        fracs = rng.dirichlet(np.ones(nhru))
+        hrus = ['{:05d}{:04d}'.format(isub, i) for i in range(1, nhru + 1)]
+        write(name + '.sub', [' .sub file Subbasin: {} {}'.format(isub, stamp),
+                              '{:16.4f}    | SUB_KM : Subbasin area [km2]'.format(rng.uniform(1., 100.)),
+                              '',
+                              'Climate in subbasin',
+                              '{:16.3f}    | SUB_LAT : Latitude of subbasin [degrees]'.format(rng.uniform(30., 40.)),
+                              '{:16.3f}    | SUB_ELEV : Elevation of subbasin [m]'.format(rng.uniform(200., 600.)),
+                              '{:16d}    | HRUTOT : Total number of HRUs modeled in subbasin'.format(nhru),
+                              'HRU: General'] +
+                             ['{0}.hru{0}.mgt{0}.sol{0}.chm {0}.gw             {0}.sep'.format(h) for h in hrus])
+        write(name + '.rte', [' .rte file Subbasin: {} {}'.format(isub, stamp)] + parameter_lines(RTE_LINES, rng))
+        for i, h in enumerate(hrus):
+            title = ' .{{}} file Watershed HRU:{} Subbasin:{} HRU:{} Luse:{} Soil: S{:04d} Slope: 0-9999 {}'.format(
+                (isub - 1) * nhru + i + 1, isub, i + 1, luse[rng.integers(len(luse))], rng.integers(10000), stamp)
+            hru = parameter_lines(HRU_LINES, rng)
+            hru[0] = '{:16.7f}    | HRU_FR : Fraction of subbasin area contained in HRU'.format(fracs[i])
+            write(h + '.hru', [title.format('hru')] + hru)
+            write(h + '.mgt', [title.format('mgt')] + parameter_lines(MGT_LINES, rng))
+            write(h + '.gw', [title.format('gw')] + parameter_lines(GW_LINES, rng))
+            write(h + '.sol', [title.format('Sol')] + sol_lines(title.split('Soil: ')[1].split()[0], srng.integers(1, 5), srng))
+
+
+#%% weather files
+def write_weather_files(TxtInOut, nstation=1, nbyr=10, iyr=2000, seed=0):
+    '''
+    write pcp1.pcp and Tmp1.Tmp (the files of the synthetic file.cio) with
+    nstation stations of daily values and about 1% missing (-99) days
+    '''
+    rng = np.random.default_rng([seed, 2])
+    dates = pd.date_range('{}-01-01'.format(iyr), '{}-12-31'.format(iyr + nbyr - 1))
+    stamps = ['{:4d}{:03d}'.format(d.year, d.dayofyear) for d in dates]
+    doy = dates.dayofyear.values[:, None]
+
+    pcp = np.where(rng.random((len(dates), nstation)) < 0.3, rng.gamma(0.8, 8., (len(dates), nstation)), 0.)
+    tmax = 20. - 12. * np.cos(2 * np.pi * (doy - 15) / 365.) + rng.normal(0., 3., (len(dates), nstation))
+    tmin = tmax - rng.uniform(5., 15., (len(dates), nstation))
+    tmp = np.stack([tmax, tmin], axis=2).reshape(len(dates), -1)
+    for values in (pcp, tmp):
+        values[rng.random(values.shape) < 0.01] = -99.
+
+    lat, lon, elev = rng.uniform(30., 40., nstation), rng.uniform(-100., -90., nstation), rng.uniform(200., 600., nstation)
+    for fname, prefix, values, width in (('pcp1.pcp', 'pcp', pcp, 5), ('Tmp1.Tmp', 'tmp', tmp, 10)):
+        header = ['Station  ' + ''.join('{}{},'.format(prefix, i + 1) for i in range(nstation)),
+                  'Lati   ' + ''.join('{:{}.1f}'.format(v, width) for v in lat),
+                  'Long   ' + ''.join('{:{}.1f}'.format(v, width) for v in lon),
+                  'Elev   ' + ''.join('{:{}.0f}'.format(v, width) for v in elev)]
+        fmt = '{}' + '{:5.1f}' * values.shape[1]
+        with open(os.path.join(TxtInOut, fname), 'w') as f:
+            f.write('\n'.join(header) + '\n')
+            f.write('\n'.join(fmt.format(s, *v) for s, v in zip(stamps, values.tolist())) + '\n')
+
+
+def make_txtinout(TxtInOut, nrch=10, nbyr=10, iyr=2000, nyskip=0, iprint=1, icalen=0, seed=0, nhru=0, nstation=0, sub=False, hru=False):
+    '''
+    create a TxtInOut directory with file.cio and output.rch, the input
+    files of nrch subbasins with nhru HRUs each if nhru > 0, the weather
+    files of nstation stations if nstation > 0, and output.sub and
+    output.hru (nhru or one HRU per subbasin) if sub and hru
+    '''
+    if not os.path.exists(TxtInOut):
+        os.makedirs(TxtInOut)
+    idal = pd.Timestamp('{}-12-31'.format(iyr + nbyr - 1)).dayofyear
+    write_file_cio(TxtInOut, NBYR=nbyr, IYR=iyr, IDAL=idal, NYSKIP=nyskip, IPRINT=iprint, ICALEN=icalen)
+    write_output_rch(TxtInOut, nrch, nbyr, iyr, nyskip, iprint, icalen, seed)
+    if sub:
+        write_output_sub(TxtInOut, nrch, nbyr, iyr, nyskip, iprint, icalen, seed)
+    if hru:
+        write_output_hru(TxtInOut, nrch, max(nhru, 1), nbyr, iyr, nyskip, iprint, icalen, seed)
+    if nhru > 0:
+        write_input_files(TxtInOut, nrch, nhru, seed)
+    if nstation > 0:
+        write_weather_files(TxtInOut, nstation, nbyr, iyr, seed)
+    return TxtInOut
+
+
+#%% dummy model run
+def dummy_run(TxtInOut, nrch=None):
+    '''
+    stand in for the SWAT executable, e.g. to test swat_run without SWAT:
+    write output.rch for the file.cio settings in TxtInOut. The reaches are
+    the subbasins of fig.fig (nrch or 10 without it) and the random seed is
+    the checksum of file.cio and the weather files, so changed scenarios
+    give changed outputs.
+    '''
+    from zlib import crc32
+    from swat_config import read_config
+    from swat_weather import cio_weather_files
+    config = read_config(TxtInOut)
+    if nrch is None:
+        fig = os.path.join(TxtInOut, 'fig.fig')
+        nrch = 10
+        if os.path.exists(fig):
+            with open(fig) as f:
+                nrch = sum(l.startswith('subbasin') for l in f)
+    names = ['file.cio'] + [f for files in cio_weather_files(TxtInOut).values() for f in files]
+    seed = 0
+    for name in names:
+        if os.path.exists(os.path.join(TxtInOut, name)):
+            with open(os.path.join(TxtInOut, name), 'rb') as f:
+                seed = crc32(f.read(), seed)
+    write_output_rch(TxtInOut, nrch, config.nbyr, config.iyr, config.nyskip, config.iprint, config.icalen, seed)
+
+#%%
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic SWAT TxtInOut with file.cio and output.rch')
+    parser.add_argument('TxtInOut', help='TxtInOut directory path, required.')
+    parser.add_argument('--nrch',   default=10,   type=int, help='number of reaches (default: %(default)s).')
+    parser.add_argument('--nbyr',   default=10,   type=int, help='number of years simulated (default: %(default)s).')
+    parser.add_argument('--iyr',    default=2000, type=int, help='beginning year of simulation (default: %(default)s).')
+    parser.add_argument('--nyskip', default=0,    type=int, help='number of years to skip output printing (default: %(default)s).')
+    parser.add_argument('--iprint', default=1,    type=int, choices=[0, 1], help='print code 0: monthly; 1: daily (default: %(default)s).')
+    parser.add_argument('--icalen', default=0,    type=int, choices=[0, 1], help='print julian (0) or calendar (1) dates (default: %(default)s).')
+    parser.add_argument('--nhru',   default=0,    type=int, help='number of HRUs per subbasin; input files are written if > 0 (default: %(default)s).')
+    parser.add_argument('--nstation', default=0,  type=int, help='number of weather stations; pcp1.pcp and Tmp1.Tmp are written if > 0 (default: %(default)s).')
+    parser.add_argument('--sub', action='store_true', help='also write output.sub.')
+    parser.add_argument('--hru', action='store_true', help='also write output.hru with nhru (at least one) HRUs per subbasin.')
+    parser.add_argument('--dummy', action='store_true', help='act as a dummy SWAT run: write only output.rch for the file.cio in TxtInOut.')
+
+    args = parser.parse_args()
+    if args.dummy:
+        dummy_run(args.TxtInOut)
+        print('SWAT dummy run finished at {}'.format(os.path.abspath(args.TxtInOut)))
+    else:
+        make_txtinout(args.TxtInOut, args.nrch, args.nbyr, args.iyr, args.nyskip, args.iprint, args.icalen, nhru=args.nhru, nstation=args.nstation, sub=args.sub, hru=args.hru)
+        print('Synthetic SWAT files are saved at {}'.format(os.path.abspath(args.TxtInOut)))
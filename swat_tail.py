@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+This script follow a SWAT output file (e.g. output.rch) while the model is
+still running.
+
+SWAT appends the records of every time step to the output files, so the
+byte offset after the last complete time step is remembered and each poll
+reads and parses only the bytes appended since then. A partly written line
+or time step is left for the next poll. The parsed time steps are kept as a
+DataFrame that grows as the run proceeds.
+
+usage:
+    python swat_tail.py TxtInOut -b 3 12 -v FLOW_OUTcms -i 10
+
+    tail = swatreader.follow_rch(['FLOW_OUTcms'], [3, 12])
+    for new in tail.follow(interval=10):
+        print(new.tail())
+"""
+
+
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from swat_output_parser import fixed_width_output, skip_lines, calendar_dates
+
+
+class output_tail():
+    '''
+    incremental reader of a SWAT output file that is being written
+    '''
+
+    def __init__(self, swatreader, fname, header_width, unit, columns=None, units=None):
+        '''
+        Parameters
+        ----------
+        swatreader : swat_reader
+            the model whose output is followed.
+        fname : str
+            the output file name, e.g. output.rch.
+        header_width : callable
+            returns the column names and widths of the file, e.g.
+            swatreader.get_rch_header_width; called once the header is written.
+        unit : str
+            the column of the unit numbers, e.g. RCH.
+        columns : list, optional
+            the variables to read. The default is all variables.
+        units : list, optional
+            the units to read. The default is all units.
+
+        '''
+        self.swatreader = swatreader
+        self.fname = fname
+        self.fpath = os.path.join(swatreader.TxtInOut, fname)
+        self.header_width = header_width
+        self.unit = unit
+        self.requested = columns
+        self.units = units
+        self.calendar = swatreader.config.calendar
+        self.reset()
+
+    def __repr__(self):
+        return 'Following {}: {} time steps parsed up to byte {}'.format(self.fpath, self.ntime, self.offset)
+
+    def reset(self):
+        '''
+        forget the parsed records, e.g. when SWAT starts writing the file again
+        '''
+        self.offset = 0
+        self.names, self.widths, self.columns = None, None, None
+        self.nsub = None
+        self.ntime = 0
+        self.last_time = None
+        self.date_index = None if self.calendar else self.swatreader.output_date_index()
+        self._data = None
+        self._pending = []
+
+    def read_header(self, f, size):
+        '''
+        skip the 9 header lines once they are written; returns False until then
+        '''
+        head = np.frombuffer(f.read(min(size, 1 << 16)), np.uint8)
+        if np.count_nonzero(head == ord('\n')) < 9:
+            return False
+        self.offset = skip_lines(head, 9)
+        self.names, self.widths = self.header_width()
+        self.columns = self.swatreader.output_columns(self.fname, (self.names, self.widths), self.requested)
+        return True
+
+    @property
+    def finished(self):
+        '''
+        whether the last time step of the simulation has been parsed
+        '''
+        if self.calendar:
+            return self.last_time is not None and self.last_time >= self.swatreader.output_end_date
+        return self.ntime == len(self.date_index)
+
+    @property
+    def data(self):
+        '''
+        all the parsed time steps: the unit and the variable columns indexed by time
+        '''
+        if len(self._pending) > 0:
+            self._data = pd.concat(([] if self._data is None else [self._data]) + self._pending)
+            self._pending = []
+        return self._data
+
+    def poll(self):
+        '''
+        parse the time steps appended to the file since the last poll
+
+        Returns
+        -------
+        dat : DataFrame
+            the new records as returned by swat_reader.read_rch, or None if no
+            complete time step was appended.
+
+        '''
+        if not os.path.exists(self.fpath):
+            return None
+        size = os.path.getsize(self.fpath)
+        if size < self.offset: # the file was rewritten by a new run
+            self.reset()
+
+        with open(self.fpath, 'rb') as f:
+            if self.names is None and not self.read_header(f, size):
+                return None
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+
+        # only complete lines
+        chunk = chunk[:chunk.rfind(b'\n') + 1]
+        if len(chunk) == 0:
+            return None
+        out = fixed_width_output(self.fpath, self.names, self.widths, skiprows=0, buf=np.frombuffer(chunk, np.uint8))
+        if len(out) == 0:
+            return None
+
+        # the number of units printed at every time step; known once a second time step starts
+        stamp = out.read('DA' if self.calendar else 'MON')
+        if self.nsub is None:
+            change = np.flatnonzero(stamp != stamp[0])
+            if len(change) == 0:
+                return None
+            self.nsub = change[0]
+
+        # whole time steps only: every time step or summary has nsub records
+        nrec = len(out) // self.nsub * self.nsub
+        if nrec == 0:
+            return None
+        rows = np.arange(nrec)
+        ids = out.read(self.unit, np.int64, rows)
+        if self.calendar:
+            index = pd.DatetimeIndex(calendar_dates(out.read('YR', np.int64, rows), out.read('MO', np.int64, rows), out.read('DA', np.int64, rows)), name='time')
+            self.ntime += nrec // self.nsub
+            self.last_time = index[-1]
+        else:
+            keep = stamp[:nrec] <= 366 # remove the annual output
+            rows, ids = rows[keep], ids[keep]
+            # the average annual summary of monthly outputs is past the last date
+            nt = min(len(rows) // self.nsub, len(self.date_index) - self.ntime)
+            rows, ids = rows[:nt * self.nsub], ids[:nt * self.nsub]
+            index = pd.DatetimeIndex(np.repeat(self.date_index[self.ntime:self.ntime + nt], self.nsub), name='time')
+            self.ntime += nt
+            self.last_time = self.date_index[self.ntime - 1] if self.ntime > 0 else None
+        self.offset += out.record_end(nrec - 1)
+
+        if self.units is not None:
+            keep = np.isin(ids, self.units)
+            rows, ids, index = rows[keep], ids[keep], index[keep]
+        if len(rows) == 0:
+            return None
+
+        dat = out.to_frame(self.columns, rows, index)
+        dat.insert(0, self.unit, ids)
+        self._pending.append(dat)
+        return dat
+
+    def follow(self, interval=5., idle=None):
+        '''
+        poll the file until the simulation is finished
+
+        Parameters
+        ----------
+        interval : float, optional
+            seconds between polls. The default is 5.
+        idle : float, optional
+            stop after this many seconds without new time steps, e.g. when the
+            run failed. The default is None (wait until finished).
+
+        Yields
+        ------
+        dat : DataFrame
+            the new records of each poll, see poll.
+
+        '''
+        last = time.monotonic()
+        while not self.finished:
+            dat = self.poll()
+            if dat is not None:
+                last = time.monotonic()
+                yield dat
+            elif idle is not None and time.monotonic() - last > idle:
+                return
+            else:
+                time.sleep(interval)
+
+#%%
+if __name__ == '__main__':
+    from swat_reader import swat_reader
+
+    parser = argparse.ArgumentParser(description='Print the newest SWAT output.rch records while the model is running')
+    parser.add_argument('TxtInOut', help='TxtInOut directory path, required.')
+    parser.add_argument('-b', '--subbasin', default=[1], type=int, nargs='*', help='Desired subbasin index/indices to follow (default: %(default)s).')
+    parser.add_argument('-v', '--variable', default=["FLOW_OUTcms"], nargs='*', help='Desired variable to follow (default: %(default)s).')
+    parser.add_argument('-i', '--interval', default=5., type=float, help='Seconds between polls (default: %(default)s).')
+    parser.add_argument('--idle', default=None, type=float, help='Stop after this many seconds without new output (default: wait until the run finishes).')
+
+    args = parser.parse_args()
+
+    tail = swat_reader(args.TxtInOut).follow_rch(args.variable, args.subbasin)
+    for new in tail.follow(args.interval, args.idle):
+        print(new.loc[new.index == new.index[-1]].to_string(), flush=True)
+    print('{} time steps of output.rch were read.'.format(tail.ntime))
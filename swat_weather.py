@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+"""
+This script perturb the SWAT precipitation and temperature files for climate
+change scenarios.
+
+Every pcpN.pcp and tmpN.tmp listed in file.cio is parsed once into NumPy
+arrays: the 4 header lines are kept as bytes, and the data lines (YYYYDDD
+followed by one f5.1 field per station, or two for the maximum and minimum
+temperature) are cut into a (day, station, variable) array with vectorized
+digit arithmetic. A scenario is then broadcast over the arrays:
+
+    precipitation  = pcp * monthly factor * station factor
+    temperature    = tmp + monthly delta  + station delta
+
+where the monthly tables hold 12 months or 4 seasons (DJF, MAM, JJA, SON),
+optionally per station. The -99 missing values are kept. The results are
+rounded like Fortran and formatted back by gathering the fields from a table
+of all 5-character fields, so a scenario is written without a Python loop
+over the values.
+
+usage:
+    w = weather(TxtInOut)
+    w.write(pcp=1.1, tmp=1.5)  # in TxtInOut, keeping the originals as .bak
+    w.write('scenario1', pcp=[0.9, 1.0, 1.1, 1.0], tmp=monthly_deltas, tmp_station={'tmp12': 0.5})
+"""
+
+
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+
+from swat_config import read_config
+
+
+# the widths of the date (year and day of year) and the values of a data line
+DATE_WIDTH = 7
+VALUE_WIDTH = 5
+VALUE_DECIMALS = 1
+
+# the missing value flag of the weather files
+MISSING = -99.
+
+# the values of every station: precipitation, or the maximum and minimum temperature
+NVAR = dict(pcp=1, tmp=2)
+
+# the months of the seasons, in the order of a table of 4 seasons
+SEASONS = dict(DJF=(12, 1, 2), MAM=(3, 4, 5), JJA=(6, 7, 8), SON=(9, 10, 11))
+
+# the month of every day of the year (1 to 366), in common and leap years
+MONTH_OF_DAY = np.array([np.repeat(np.arange(13), [1, 31, 28 + leap, 31, 30, 31, 30, 31, 31, 30, 31, 30, 32 - leap])
+                         for leap in (0, 1)])
+
+
+def cio_weather_files(TxtInOut):
+    '''
+    the precipitation and temperature files listed in file.cio
+
+    Returns
+    -------
+    dict of {'pcp': [file names], 'tmp': [file names]}
+
+    '''
+    config = read_config(TxtInOut)
+    files = dict(pcp=config.pcp_files, tmp=config.tmp_files)
+    for kind, names in files.items():
+        assert names is not None, 'No {} files section in {}'.format(kind, os.path.join(TxtInOut, 'file.cio'))
+    return {kind: list(names) for kind, names in files.items()}
+
+
+def parse_fixed(chars):
+    '''
+    the numbers of fixed-width text fields, e.g. ' 12.3' or '-99.0'
+
+    Parameters
+    ----------
+    chars : ndarray
+        uint8 array of shape (..., width) holding the characters of the fields.
+
+    Returns
+    -------
+    float64 ndarray of shape (...); blank fields are 0.
+
+    '''
+    width = chars.shape[-1]
+    digit = (chars >= 48) & (chars <= 57)
+    point = chars == 46
+    minus = chars == 45
+    if not (digit | point | minus | (chars == 32) | (chars == 43)).all():
+        # e.g. exponents: parse field by field
+        text = np.ascontiguousarray(chars).view('S{}'.format(width))[..., 0]
+        return np.array([float(t) if t.strip() else 0. for t in text.ravel()]).reshape(text.shape)
+    # the integer of all digits over 10 ** the number of digits after the point, as float() rounds it
+    rank = np.cumsum(digit[..., ::-1], axis=-1)[..., ::-1] - 1
+    mantissa = (np.where(digit, chars.astype(np.int64) - 48, 0) * np.where(digit, 10 ** np.maximum(rank, 0), 0)).sum(axis=-1)
+    ipoint = np.where(point.any(axis=-1), point.argmax(axis=-1), width)
+    decimals = (digit & (np.arange(width) > ipoint[..., None])).sum(axis=-1)
+    value = mantissa / 10. ** decimals
+    return np.where(minus.any(axis=-1), -value, value)
+
+
+def two_product(a, b):
+    '''
+    the product of two arrays and its rounding error, a * b = p + e exactly (Dekker)
+    '''
+    def split(x):
+        c = 134217729. * x
+        hi = c - (c - x)
+        return hi, x - hi
+    p = a * b
+    ah, al = split(a)
+    bh, bl = split(b)
+    return p, ((ah * bh - p) + ah * bl + al * bh) + al * bl
+
+
+def digit_chars(a, neg, width, decimals):
+    '''
+    the characters of fixed-width fields from the absolute values scaled to
+    integers and the signs, see format_fixed
+    '''
+    # the digits shown: all decimals and the units, and the higher ones up to the leading digit
+    ndigit = decimals + 1 + sum((a >= 10 ** k).astype(np.int8) for k in range(decimals + 1, width))
+    assert (ndigit + neg + (decimals > 0) <= width).all(), 'Negative values out of the range of {}.{} fields'.format(width, decimals)
+    chars = np.empty(a.shape + (width,), np.uint8)
+    k = 0  # the digit position, from the last
+    for j in range(width - 1, -1, -1):
+        if decimals > 0 and j == width - 1 - decimals:
+            chars[..., j] = 46
+            continue
+        a, d = np.divmod(a, 10)
+        chars[..., j] = np.where(k < ndigit, d + 48, np.where(neg & (k == ndigit), 45, 32))
+        k += 1
+    return chars
+
+
+@lru_cache()
+def field_table(width, decimals):
+    '''
+    the bytes of every field of up to 6 digits, indexed by the scaled absolute
+    value, followed by the negative fields
+    '''
+    a = np.arange(10 ** (width - (decimals > 0)), dtype=np.int32)
+    # the negative fields that do not fit are blank, they are rejected before the lookup
+    fits = decimals + 1 + sum((a >= 10 ** k) for k in range(decimals + 1, width)) + (decimals > 0) < width
+    neg = digit_chars(np.where(fits, a, 0), np.ones(len(a), bool), width, decimals)
+    neg[~fits] = 32
+    # one bytes string per field, which is gathered faster than rows of characters
+    return np.concatenate([digit_chars(a, np.zeros(len(a), bool), width, decimals), neg]).view('S{}'.format(width))[:, 0]
+
+
+def format_fixed(values, width=VALUE_WIDTH, decimals=VALUE_DECIMALS):
+    '''
+    the characters of numbers written in fixed-width fields, as Fortran fw.d
+
+    Parameters
+    ----------
+    values : ndarray
+        the numbers.
+    width, decimals : int, optional
+        the field width and the digits after the point. The defaults are VALUE_WIDTH and VALUE_DECIMALS.
+
+    Returns
+    -------
+    uint8 ndarray of shape values.shape + (width,)
+
+    '''
+    values = np.asarray(values, np.float64)
+    scaled = values * 10 ** decimals
+    rounded = np.rint(scaled)
+    # a product exactly halfway is rounded by the sign of its rounding error, as
+    # Fortran and Python round the exact binary value; exact ties go to even like rint
+    half = np.flatnonzero(scaled - np.floor(scaled) == 0.5)
+    if len(half) > 0:
+        s, error = two_product(values.ravel()[half], np.float64(10 ** decimals))
+        rounded.ravel()[half] = np.where(error > 0, np.ceil(s), np.where(error < 0, np.floor(s), rounded.ravel()[half]))
+    # small negative values are written as -0.0, like Fortran and Python do
+    neg = np.signbit(values)
+    a = np.abs(rounded)
+    assert (a < 10. ** (width - (decimals > 0))).all() and not np.isnan(a).any(), \
+        'Values out of the range of {}.{} fields: {} to {}'.format(width, decimals, values.min(), values.max())
+    a = a.astype(np.int64)
+    if width - (decimals > 0) > 6:
+        return digit_chars(a, neg, width, decimals)
+    assert not neg.any() or (a[neg] < 10 ** (width - (decimals > 0) - 1)).all(), \
+        'Negative values out of the range of {}.{} fields: {}'.format(width, decimals, values.min())
+    table = field_table(width, decimals)
+    return table[a + neg * (len(table) // 2)].view(np.uint8).reshape(values.shape + (width,))
+
+
+def monthly_table(change, identity, nstation):
+    '''
+    a change as a (12, station) table
+
+    Parameters
+    ----------
+    change : float, list or ndarray
+        one change, 4 seasons (DJF, MAM, JJA, SON) or 12 months; or a table of
+        4 or 12 rows with one column per station.
+    identity : float
+        the change that keeps the values (1 for factors, 0 for deltas).
+    nstation : int
+        the number of stations.
+
+    '''
+    change = np.asarray(identity if change is None else change, np.float64)
+    if change.ndim == 0:
+        change = np.full(12, float(change))
+    if len(change) == 4:
+        season = np.zeros(12, np.int64)
+        for i, months in enumerate(SEASONS.values()):
+            season[np.array(months) - 1] = i
+        change = change[season]
+    assert len(change) == 12, 'A change needs 1, 4 (seasons) or 12 (months) values, not {}.'.format(len(change))
+    return np.broadcast_to(change.reshape(12, -1), (12, nstation))
+
+
+def station_table(change, stations, identity):
+    '''
+    a change per station from {station name: change} (missing stations are not changed)
+    '''
+    if change is None:
+        return np.full(len(stations), identity)
+    change = pd.Series(change, dtype=np.float64)
+    return change.reindex(stations).fillna(identity).values
+
+
+class weather_file():
+    '''
+    the header, dates and values of a SWAT precipitation or temperature file
+    '''
+
+    def __init__(self, fpath, kind):
+        '''
+        Parameters
+        ----------
+        fpath : str
+            the file path.
+        kind : str
+            pcp or tmp.
+
+        '''
+        self.fpath = fpath
+        self.kind = kind
+        with open(fpath, 'rb') as f:
+            content = f.read()
+
+        # 4 header lines: station names, latitudes, longitudes and elevations
+        pos = 0
+        for i in range(4):
+            pos = content.index(b'\n', pos) + 1
+        self.header = content[:pos]
+        self.eol = b'\r\n' if content[pos - 2:pos] == b'\r\n' else b'\n'
+        names = content[:content.index(b'\n')].decode('latin-1').rstrip()
+        names = names[names.index(' '):] if names.lower().startswith('station') else ''
+        self.stations = [s.strip() for s in names.split(',') if len(s.strip()) > 0]
+
+        lines = [l.rstrip(b'\r') for l in content[pos:].split(b'\n')]
+        while len(lines) > 0 and len(lines[-1].strip()) == 0:
+            lines.pop()
+        width = max(len(l) for l in lines)
+        body = b''.join(l if len(l) == width else l.ljust(width) for l in lines)
+        rows = np.frombuffer(body, np.uint8).reshape(len(lines), width)
+
+        nvar = NVAR[kind]
+        nstation = (width - DATE_WIDTH) // (VALUE_WIDTH * nvar)
+        if 0 < len(self.stations) <= nstation:
+            nstation = len(self.stations)
+        else:
+            self.stations = ['{}{}'.format(os.path.basename(fpath), i + 1) for i in range(nstation)]
+        self.date = rows[:, :DATE_WIDTH].copy()
+        fields = rows[:, DATE_WIDTH:DATE_WIDTH + nstation * nvar * VALUE_WIDTH].reshape(len(lines), nstation, nvar, VALUE_WIDTH)
+        # the original text of the fields, written again for the unchanged values
+        self.fields = fields.copy()
+        self.values = parse_fixed(fields)
+        self.missing = self.values == MISSING
+
+        year = parse_fixed(self.date[:, :4]).astype(np.int64)
+        day = parse_fixed(self.date[:, 4:]).astype(np.int64)
+        leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+        self.month = MONTH_OF_DAY[leap.astype(np.int64), day]
+
+    def __repr__(self):
+        return '{} of {} stations x {} days'.format(self.fpath, len(self.stations), len(self.values))
+
+    def perturbed(self, monthly=None, station=None):
+        '''
+        the values changed by the monthly and station tables
+
+        Parameters
+        ----------
+        monthly : ndarray, optional
+            (12, station) factors of precipitation or deltas of temperature, see monthly_table.
+        station : ndarray, optional
+            (station,) factors or deltas, see station_table.
+
+        Returns
+        -------
+        ndarray of the shape of values; missing values stay MISSING.
+
+        '''
+        identity = 1. if self.kind == 'pcp' else 0.
+        nstation = len(self.stations)
+        monthly = monthly_table(monthly, identity, nstation)
+        station = np.full(nstation, identity) if station is None else np.asarray(station, np.float64)
+        if self.kind == 'pcp':
+            assert (monthly >= 0).all() and (station >= 0).all(), 'Precipitation factors must not be negative.'
+            values = self.values * (monthly[self.month - 1] * station)[..., None]
+        else:
+            values = self.values + (monthly[self.month - 1] + station)[..., None]
+        values[self.missing] = MISSING
+        return values
+
+    def write(self, fpath, values=None):
+        '''
+        write the file with new values (the original ones if None); the
+        fields of unchanged values keep their original text, e.g. -0.0
+        '''
+        values = self.values if values is None else values
+        n = len(values)
+        chars = format_fixed(values)
+        unchanged = values == self.values
+        chars[unchanged] = self.fields[unchanged]
+        body = np.concatenate([self.date,
+                               chars.reshape(n, -1),
+                               np.broadcast_to(np.frombuffer(self.eol, np.uint8), (n, len(self.eol)))], axis=1)
+        tmp = fpath + '.tmp{}'.format(os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(self.header)
+            f.write(body.tobytes())
+        os.replace(tmp, fpath)
+
+
+class weather():
+    '''
+    the precipitation and temperature files of a TxtInOut, see the module docstring
+    '''
+
+    def __init__(self, TxtInOut):
+        '''
+        Parameters
+        ----------
+        TxtInOut : str
+            TxtInOut directory path. The files are read from their .bak copies
+            when these exist, i.e. the originals kept by a previous write.
+
+        '''
+        self.TxtInOut = TxtInOut
+        self.files = dict()
+        for kind, names in cio_weather_files(TxtInOut).items():
+            for name in names:
+                fpath = os.path.join(TxtInOut, name)
+                self.files[name] = weather_file(fpath + '.bak' if os.path.exists(fpath + '.bak') else fpath, kind)
+
+    def __repr__(self):
+        return 'Weather of {}: {}'.format(self.TxtInOut, ', '.join('{} ({} stations)'.format(n, len(w.stations)) for n, w in self.files.items()))
+
+    def stations(self, kind):
+        '''
+        the station names of all the pcp or tmp files
+        '''
+        return [s for w in self.files.values() if w.kind == kind for s in w.stations]
+
+    def write(self, outdir=None, pcp=None, tmp=None, pcp_station=None, tmp_station=None):
+        '''
+        write a climate scenario
+
+        Parameters
+        ----------
+        outdir : str, optional
+            the directory of the new files. The default is None (TxtInOut, where
+            the originals are first copied to .bak files).
+        pcp : float, list or ndarray, optional
+            the precipitation factors, see monthly_table. The default is None (unchanged).
+        tmp : float, list or ndarray, optional
+            the temperature deltas, see monthly_table. The default is None (unchanged).
+        pcp_station : dict or Series, optional
+            {station name: precipitation factor}. The default is None.
+        tmp_station : dict or Series, optional
+            {station name: temperature delta}. The default is None.
+
+        Returns
+        -------
+        list of the written file paths.
+
+        '''
+        outdir = self.TxtInOut if outdir is None else outdir
+        os.makedirs(outdir, exist_ok=True)
+        change = dict(pcp=(pcp, pcp_station, 1.), tmp=(tmp, tmp_station, 0.))
+        written = []
+        for name, w in self.files.items():
+            fpath = os.path.join(outdir, name)
+            if os.path.samefile(outdir, self.TxtInOut) and not os.path.exists(fpath + '.bak'):
+                shutil.copy2(fpath, fpath + '.bak')
+            monthly, station, identity = change[w.kind]
+            w.write(fpath, w.perturbed(monthly, station_table(station, w.stations, identity)))
+            written.append(fpath)
+        return written
+
+
+def scenario_changes(row, var):
+    '''
+    the monthly changes of a variable in a row of a scenario table
+
+    The columns var (one change), var_DJF ... var_SON (seasons) and var_1 ...
+    var_12 (months) are combined: factors are multiplied and deltas added.
+
+    Returns
+    -------
+    ndarray of 12 months, or None if the row has no column of var.
+
+    '''
+    tables = []
+    if var in row.index:
+        tables.append(monthly_table(row[var], 0., 1)[:, 0])
+    if all('{}_{}'.format(var, s) in row.index for s in SEASONS):
+        tables.append(monthly_table([row['{}_{}'.format(var, s)] for s in SEASONS], 0., 1)[:, 0])
+    if all('{}_{}'.format(var, m) in row.index for m in range(1, 13)):
+        tables.append(np.array([row['{}_{}'.format(var, m)] for m in range(1, 13)], np.float64))
+    if len(tables) == 0:
+        return None
+    return np.prod(tables, axis=0) if var == 'pcp' else np.sum(tables, axis=0)
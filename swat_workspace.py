@@ -0,0 +1,389 @@
+# -*- coding: utf-8 -*-
+"""
+This script create copy-on-write scenario workspaces of a baseline TxtInOut.
+
+A workspace is a folder holding every baseline file as a reflink (a clone
+sharing the data blocks on btrfs, xfs, APFS or ReFS) or, where the file
+system cannot clone, as a hard link; a real copy is made only if neither
+works. Preparing a scenario then costs one directory entry per file instead
+of copying the whole TxtInOut, and many scenarios can be run side by side.
+
+A hard link shares the file with the baseline, so a linked file must be
+replaced, not rewritten in place. The editors of this package (swat_input,
+swat_params, swat_weather) write a temporary file and rename it over the
+original, which replaces the link with the edited file and leaves the
+baseline untouched; materialize gives other tools a private copy first. The
+files that SWAT itself writes (SKIP_FILES, e.g. output.rch) are never
+linked.
+
+Every workspace keeps a manifest (workspace.json) of how each file was
+linked and its size, modification time and inode, so the files a scenario
+changed are found without reading them, and reset links them back to the
+baseline.
+
+usage:
+    ws = create_workspace(TxtInOut, r'Scenarios\\Warm\\TxtInOut')
+    weather(TxtInOut).write(ws.path, tmp=2.)
+    ws.changed()  # ['Tmp1.Tmp']
+
+    scenarios = workspace_set(TxtInOut, 'Scenarios')
+    scenarios.create(['s001', 's002'])
+    scenarios.changes()
+"""
+
+
+import os
+import re
+import json
+import shutil
+import fnmatch
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+from swat_cache import cache_dir, current_version
+from swat_input import READ_THREADS
+
+
+# the files written by a SWAT run and the leftovers of other tools, which are not linked
+SKIP_FILES = ('output*', '*.out', 'input.std', 'swat_run.log', 'fin.fin', 'chan.deg', 'watout.dat', '*.bak', '*.tmp[0-9]*', 'workspace.json')
+
+# the ways a file is linked, from the cheapest
+LINK_MODES = ('reflink', 'hardlink', 'copy')
+
+# the name of the manifest in a workspace
+MANIFEST = 'workspace.json'
+
+# the Linux ioctl cloning a file, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+
+def reflink(src, dst):
+    '''
+    clone a file sharing its data blocks until either copy is written; raises
+    OSError where the file system or platform cannot clone
+    '''
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError('Reflinks are not supported on this platform.')
+    with open(src, 'rb') as fs, open(dst, 'wb') as fd:
+        try:
+            fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+        except OSError:
+            fd.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def link_file(src, dst, modes=LINK_MODES):
+    '''
+    link dst to src with the first mode that works; returns the mode
+    '''
+    for i, mode in enumerate(modes):
+        try:
+            if mode == 'reflink':
+                reflink(src, dst)
+            elif mode == 'hardlink':
+                os.link(src, dst)
+            else:
+                shutil.copy2(src, dst)
+            return mode
+        except OSError:
+            if i == len(modes) - 1:
+                raise
+
+
+def file_stamp(fpath):
+    '''
+    (size, mtime_ns, inode) of a file
+    '''
+    st = os.stat(fpath)
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def baseline_files(baseline, skip=SKIP_FILES):
+    '''
+    the baseline files that are linked into a workspace
+
+    Returns
+    -------
+    dict of {file name: (size, mtime_ns, inode)}, sorted by name.
+
+    '''
+    # one regular expression instead of fnmatch per pattern and file; file names are case insensitive
+    skipped = re.compile('|'.join(fnmatch.translate(p) for p in skip), re.IGNORECASE)
+    with os.scandir(baseline) as it:
+        entries = [e for e in it if not skipped.match(e.name) and e.is_file()]
+    return {e.name: [e.stat().st_size, e.stat().st_mtime_ns, e.stat().st_ino] for e in sorted(entries, key=lambda e: e.name)}
+
+
+def create_workspace(baseline, path, mode='auto', skip=SKIP_FILES, threads=READ_THREADS, files=None):
+    '''
+    create a workspace of a baseline TxtInOut
+
+    Parameters
+    ----------
+    baseline : str
+        the baseline TxtInOut directory.
+    path : str
+        the new workspace directory; it may exist but must be empty.
+    mode : str, optional
+        reflink, hardlink or copy; auto tries them in this order once and
+        uses the first that works for all files. The default is 'auto'.
+    skip : tuple, optional
+        file name patterns that are not linked. The default is SKIP_FILES.
+    threads : int, optional
+        the number of threads linking the files. The default is READ_THREADS.
+    files : dict, optional
+        baseline_files(baseline, skip), listed once for many workspaces. The default is None.
+
+    Returns
+    -------
+    workspace
+
+    '''
+    assert mode in ('auto',) + LINK_MODES, 'Unknown link mode {}'.format(mode)
+    os.makedirs(path, exist_ok=True)
+    assert len(os.listdir(path)) == 0, 'The workspace folder {} is not empty.'.format(path)
+    stamps = baseline_files(baseline, skip) if files is None else files
+    names = list(stamps)
+    # plain concatenation, os.path.join costs as much as a link on thousands of files
+    src = [os.path.join(baseline, '') + f for f in names]
+    dst = [os.path.join(path, '') + f for f in names]
+
+    # the first file finds the mode that works on this file system
+    modes = LINK_MODES if mode == 'auto' else (mode,)
+    if len(names) > 0:
+        modes = LINK_MODES[LINK_MODES.index(link_file(src[0], dst[0], modes)):] if mode == 'auto' else modes
+    rest = list(range(1, len(names)))
+    nchunk = max(1, min(len(rest), threads * 4))
+    chunks = [rest[i::nchunk] for i in range(nchunk)]
+    with ThreadPoolExecutor(threads) as ex:
+        done = list(ex.map(lambda c: [(i, link_file(src[i], dst[i], modes)) for i in c], chunks))
+    used = dict([(0, modes[0])] + [d for chunk in done for d in chunk]) if len(names) > 0 else dict()
+
+    # a hard link is the baseline file, with its size, time and inode
+    files = {f: [used[i]] + (stamps[f] if used[i] == 'hardlink' else file_stamp(dst[i])) for i, f in enumerate(names)}
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        f.write(json.dumps(dict(baseline=os.path.abspath(baseline), files=files)))
+
+    # the parameter index of the baseline is valid for the linked files, which keep their size and time
+    params = os.path.join(cache_dir(baseline), 'params')
+    if current_version(params) is not None:
+        shutil.copytree(params, os.path.join(cache_dir(path), 'params'), copy_function=os.link if modes[0] == 'hardlink' else shutil.copy2)
+    return workspace(path)
+
+
+class workspace():
+    '''
+    a scenario folder linked to a baseline TxtInOut, see create_workspace
+    '''
+
+    def __init__(self, path):
+        '''
+        Parameters
+        ----------
+        path : str
+            the workspace directory.
+
+        '''
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+        self.baseline = manifest['baseline']
+        self.files = manifest['files']
+
+    def __repr__(self):
+        return 'Workspace {} of {} with {} files'.format(self.path, self.baseline, len(self.files))
+
+    def save(self):
+        with open(os.path.join(self.path, MANIFEST), 'w') as f:
+            f.write(json.dumps(dict(baseline=self.baseline, files=self.files)))
+
+    def reader(self):
+        '''
+        the swat_reader of the workspace
+        '''
+        # imported here as swat_reader imports this module
+        from swat_reader import swat_reader
+        return swat_reader(self.path)
+
+    def is_changed(self, name):
+        '''
+        whether a baseline file was replaced or edited in the workspace (True if removed)
+        '''
+        fpath = os.path.join(self.path, name)
+        if not os.path.exists(fpath):
+            return True
+        # a replaced file has a new inode, a file written in place a new size or time
+        return file_stamp(fpath) != self.files[name][1:]
+
+    def changed(self):
+        '''
+        the baseline files that were edited, replaced or removed in the workspace
+        '''
+        return [f for f in self.files if self.is_changed(f)]
+
+    def added(self):
+        '''
+        the files that are not in the baseline, e.g. the SWAT outputs
+        '''
+        return sorted(f for f in os.listdir(self.path) if f not in self.files and f != MANIFEST)
+
+    def linked(self, name):
+        '''
+        whether a file still shares its data with the baseline
+        '''
+        return self.files[name][0] in ('reflink', 'hardlink') and not self.is_changed(name)
+
+    def materialize(self, names):
+        '''
+        replace hard links by private copies before a tool rewrites the files in place
+
+        Returns
+        -------
+        list of the copied file names.
+
+        '''
+        copied = []
+        for name in names:
+            if self.files[name][0] == 'hardlink' and not self.is_changed(name):
+                fpath = os.path.join(self.path, name)
+                tmp = fpath + '.tmp{}'.format(os.getpid())
+                shutil.copy2(fpath, tmp)
+                os.replace(tmp, fpath)
+                self.files[name] = ['copy'] + file_stamp(fpath)
+                copied.append(name)
+        if len(copied) > 0:
+            self.save()
+        return copied
+
+    def reset(self, names=None):
+        '''
+        link changed files back to the baseline, e.g. to reuse the workspace for another scenario
+
+        Parameters
+        ----------
+        names : list, optional
+            the files to reset. The default is None (all changed files).
+
+        Returns
+        -------
+        list of the reset file names.
+
+        '''
+        names = self.changed() if names is None else names
+        for name in names:
+            fpath = os.path.join(self.path, name)
+            tmp = fpath + '.tmp{}'.format(os.getpid())
+            mode = link_file(os.path.join(self.baseline, name), tmp, LINK_MODES[LINK_MODES.index(self.files[name][0]):])
+            os.replace(tmp, fpath)
+            self.files[name] = [mode] + file_stamp(fpath)
+        if len(names) > 0:
+            self.save()
+        return list(names)
+
+    def baseline_changed(self):
+        '''
+        the baseline files that changed since the workspace was created, which
+        a hard-linked workspace shares
+        '''
+        changed = []
+        for name, (mode, size, mtime, ino) in self.files.items():
+            fpath = os.path.join(self.baseline, name)
+            if not os.path.exists(fpath) or (mode == 'hardlink' and file_stamp(fpath)[:2] != [size, mtime]):
+                changed.append(name)
+        return changed
+
+    def remove(self):
+        '''
+        delete the workspace folder and its cache
+        '''
+        shutil.rmtree(self.path)
+        if os.path.exists(cache_dir(self.path)):
+            shutil.rmtree(cache_dir(self.path))
+
+
+class workspace_set():
+    '''
+    the scenario workspaces of a baseline TxtInOut in one folder
+    '''
+
+    def __init__(self, baseline, root):
+        '''
+        Parameters
+        ----------
+        baseline : str
+            the baseline TxtInOut directory.
+        root : str
+            the folder of the workspaces, one subfolder per scenario.
+
+        '''
+        self.baseline = baseline
+        self.root = root
+
+    def __repr__(self):
+        return '{} workspaces of {} in {}'.format(len(self.names()), self.baseline, self.root)
+
+    def names(self):
+        '''
+        the scenario names of the existing workspaces
+        '''
+        if not os.path.exists(self.root):
+            return []
+        return sorted(f for f in os.listdir(self.root) if os.path.exists(os.path.join(self.root, f, MANIFEST)))
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def __getitem__(self, name):
+        return workspace(self.path(name))
+
+    def create(self, names, mode='auto', threads=READ_THREADS):
+        '''
+        create the workspaces of scenarios; existing ones are reset to the baseline
+
+        Returns
+        -------
+        list of workspace
+
+        '''
+        existing = set(self.names())
+        files = baseline_files(self.baseline)
+        spaces = []
+        for name in names:
+            if name in existing:
+                ws = self[name]
+                ws.reset()
+            else:
+                ws = create_workspace(self.baseline, self.path(name), mode, threads=threads, files=files)
+            spaces.append(ws)
+        return spaces
+
+    def remove(self, names=None):
+        '''
+        delete workspaces; all of them if names is None
+        '''
+        for name in self.names() if names is None else names:
+            self[name].remove()
+
+    def changes(self):
+        '''
+        the changed baseline files of every workspace
+
+        Returns
+        -------
+        DataFrame of scenario and file.
+
+        '''
+        rows = [(name, f) for name in self.names() for f in self[name].changed()]
+        return pd.DataFrame(rows, columns=['scenario', 'file'])
+
+    def scenarios(self, names=None, processes=None):
+        '''
+        the ScenarioSet reading the outputs of the workspaces side by side
+        '''
+        from swat_scenarios import ScenarioSet
+        names = self.names() if names is None else list(names)
+        return ScenarioSet([self.path(n) for n in names], names, processes)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+This script run the command line tools of this package as subcommands of
+one command.
+
+Only the standard library is imported here: a subcommand runs its script
+(e.g. save_rch.py) as __main__, so pandas, matplotlib and the SWAT readers
+are imported by the tools that need them and not for the help or for the
+other tools. The batch subcommand runs a list of subcommands in one process,
+so the interpreter starts and the heavy modules are imported once for the
+whole list instead of once per step as in the .bat chain.
+
+usage:
+    python swatreader.py save-rch TxtInOut -b 3 12 -v FLOW_OUTcms -f M -s mean
+    python swatreader.py batch steps.txt
+    type steps.txt | python swatreader.py batch -
+
+    steps.txt has one subcommand with its arguments per line, e.g.
+        run Scenarios/s001 Scenarios/s002 --units 3 12
+        save-rch Scenarios/s001 -b 3 12 -v FLOW_OUTcms
+        plot-flow Scenarios/s001 --subbasin 3 12 --usgs 07325840 07325850
+    Empty lines and lines starting with # are skipped.
+"""
+
+
+import os
+import sys
+import time
+import shlex
+import runpy
+import argparse
+import traceback
+
+
+# {subcommand: (module, description)}
+COMMANDS = {
+    'save-rch':    ('save_rch',          'save reach outputs of output.rch to a csv file'),
+    'save-flow':   ('save_flow',         'save simulated (and USGS) streamflow to csv files'),
+    'plot-rch':    ('plot_rch',          'plot reach outputs of output.rch'),
+    'plot-flow':   ('plot_flow',         'plot simulated streamflow against USGS measurements'),
+    'cup-flow':    ('swat_cup_flow',     'write the SWAT-CUP observation and extraction files'),
+    'cup-dotplot': ('swat_cup_dotplot',  'draw dot plots of a SWAT-CUP iteration'),
+    'climate':     ('climate_change',    'change the weather files for climate change scenarios'),
+    'land-use':    ('land_use_change',   'read or write the HRU fractions and parameters'),
+    'params':      ('swat_params',       'index, get or set named input file parameters'),
+    'run':         ('swat_run',          'run SWAT for many TxtInOut folders in a process pool'),
+    'tail':        ('swat_tail',         'follow the output of a running SWAT model'),
+    'synthetic':   ('swat_synthetic',    'write a synthetic TxtInOut or act as a dummy SWAT run'),
+}
+
+
+def run_command(command, args):
+    '''
+    run a subcommand in this process, as if its script were run with args
+
+    Returns
+    -------
+    int, the exit code: 0, or the code of SystemExit (e.g. 2 for wrong arguments).
+
+    '''
+    assert command in COMMANDS, 'Unknown command {}, choose from {}'.format(command, ', '.join(COMMANDS))
+    module = COMMANDS[command][0]
+    argv = sys.argv
+    sys.argv = [module] + list(args)
+    try:
+        # alter_sys makes the script __main__ while it runs, so the process
+        # pools of the tools can pickle its functions
+        runpy.run_module(module, run_name='__main__', alter_sys=True)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        sys.argv = argv
+    return 0
+
+
+def split_line(line):
+    '''
+    the subcommand and arguments of a batch line; backslashes of Windows paths are kept
+    '''
+    if os.name != 'nt':
+        return shlex.split(line, comments=True)
+    tokens = shlex.split(line, comments=True, posix=False)
+    return [t[1:-1] if len(t) > 1 and t[0] == t[-1] and t[0] in '"\'' else t for t in tokens]
+
+
+def run_batch(lines, keep_going=False):
+    '''
+    run subcommands one after another in this process
+
+    Parameters
+    ----------
+    lines : iterable
+        the subcommand lines, e.g. an open file or sys.stdin; each line is
+        run as soon as it is read.
+    keep_going : bool, optional
+        run the next lines after a failed one. The default is False.
+
+    Returns
+    -------
+    list of (line, exit code, seconds) of the lines run.
+
+    '''
+    done = []
+    for line in lines:
+        tokens = split_line(line)
+        if len(tokens) == 0:
+            continue
+        t0 = time.perf_counter()
+        try:
+            code = run_command(tokens[0], tokens[1:])
+        except Exception:
+            traceback.print_exc()
+            code = 1
+        done.append((line.strip(), code, time.perf_counter() - t0))
+        print('[batch] {} ({:.2f} s{})'.format(line.strip(), done[-1][2], '' if code == 0 else ', exit code {}'.format(code)), flush=True)
+        if code != 0 and not keep_going:
+            break
+    return done
+
+
+#%% set up the command
+if __name__ == '__main__':
+    epilog = 'commands:\n' + '\n'.join('  {:<12} {}'.format(k, v[1]) for k, v in COMMANDS.items()) + \
+             '\n  {:<12} {}'.format('batch', 'run the subcommands of a file (- for stdin) in one process') + \
+             '\n\nsee "swatreader.py <command> -h" for the arguments of a command.'
+    parser = argparse.ArgumentParser(description='SWAT reader tools', epilog=epilog, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=list(COMMANDS) + ['batch'], metavar='command', help='the tool to run, see below.')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='the arguments of the command.')
+
+    args = parser.parse_args()
+
+    if args.command != 'batch':
+        sys.exit(run_command(args.command, args.args))
+
+    batch = argparse.ArgumentParser(prog='swatreader.py batch', description='Run subcommands in one process')
+    batch.add_argument('file', help='file of subcommand lines, - for stdin.')
+    batch.add_argument('-k', '--keep-going', action='store_true', help='run the next lines after a failed one.')
+    bargs = batch.parse_args(args.args)
+
+    t0 = time.perf_counter()
+    if bargs.file == '-':
+        done = run_batch(sys.stdin, bargs.keep_going)
+    else:
+        with open(bargs.file) as f:
+            done = run_batch(f, bargs.keep_going)
+    failed = sum(code != 0 for _, code, _ in done)
+    print('[batch] {} commands, {} failed ({:.2f} s)'.format(len(done), failed, time.perf_counter() - t0))
+    sys.exit(1 if failed > 0 else 0)
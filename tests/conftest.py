@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+# the modules of this package are top-level scripts in the repository root
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
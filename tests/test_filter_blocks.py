@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+swat_reader.filter_blocks over the blocks of iter_rch against filter of the
+whole output
+"""
+
+
+import pandas as pd
+import pytest
+
+from swat_reader import swat_reader
+from swat_synthetic import make_txtinout
+
+
+@pytest.mark.parametrize('iprint, freq, chunk', [(0, 'W', 1), (0, 'W', 5), (0, 'W', 12),
+                                                 (0, 'D', 5), (1, 'W', 10), (1, 'M', 40)])
+def test_blocks_equal_filter(tmp_path, iprint, freq, chunk):
+    reader = swat_reader(make_txtinout(str(tmp_path / 'TxtInOut'), nrch=3, nbyr=2, iprint=iprint))
+    units, vars, stat = [1, 3], ['FLOW_OUTcms'], ['mean']
+
+    expected = swat_reader.filter(reader.read_rch(vars, units), units, vars, freq, stat)
+    blocks = swat_reader.filter_blocks(reader.iter_rch(chunk, vars, units), units, vars, freq, stat)
+    result = pd.concat(list(blocks)).sort_index()
+
+    # the weeks without a month end are empty bins in both
+    assert result['FLOW_OUTcms'].isna().any() == (iprint == 0)
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+read_sub and read_hru against pandas.read_fwf with the explicit SWAT2012
+widths, on synthetic files in the julian and calendar layouts
+"""
+
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+from swat_reader import swat_reader
+from swat_synthetic import make_txtinout, SUB_VARIABLES, HRU_VARIABLES
+
+
+# the field widths of the SWAT2012 formats, e.g. 'BIGSUB',i4,1x,i8,1x,i4,e10.5,18f10.3,1x,e10.5,5e10.3
+SUB_WIDTHS = [10] * 18 + [11] + [10] * 5
+HRU_WIDTHS = [10] * 66 + [11, 11] + [10] * 11
+PREFIX = {('output.sub', 0): ('TYPE SUB GIS MON AREAkm2', [6, 4, 9, 5, 10]),
+          ('output.sub', 1): ('TYPE SUB GIS MO DA YR AREAkm2', [6, 4, 9, 3, 3, 5, 10]),
+          ('output.hru', 0): ('LULC HRU GIS SUB MGT MON AREAkm2', [4, 5, 10, 5, 5, 5, 10]),
+          ('output.hru', 1): ('LULC HRU GIS SUB MGT MO DA YR AREAkm2', [4, 5, 10, 5, 5, 3, 3, 5, 10])}
+
+
+def read_fwf(TxtInOut, fname, icalen, iprint, nunit):
+    '''
+    the records of an output file without the summary lines, parsed by pandas
+    '''
+    names, widths = PREFIX[(fname, icalen)]
+    variables, values = (SUB_VARIABLES, SUB_WIDTHS) if fname == 'output.sub' else (HRU_VARIABLES, HRU_WIDTHS)
+    df = pd.read_fwf(os.path.join(TxtInOut, fname), widths=widths + values, names=names.split() + variables, skiprows=9, header=None)
+    if icalen == 0:
+        if iprint == 0:
+            df = df.iloc[:-nunit]
+        df = df[df['MON'] <= 366]
+    return df.reset_index(drop=True)
+
+
+@pytest.mark.parametrize('icalen', [0, 1])
+@pytest.mark.parametrize('iprint', [0, 1])
+def test_read_sub_hru(tmp_path, icalen, iprint):
+    TxtInOut = make_txtinout(str(tmp_path), nrch=4, nbyr=2, nyskip=0, iprint=iprint, icalen=icalen, nhru=3, sub=True, hru=True)
+    reader = swat_reader(TxtInOut)
+    # monthly julian outputs are indexed by the month ends, calendar ones by the printed dates
+    dates = pd.date_range('2000-01-01', '2001-12-31', freq='D' if iprint == 1 else ('MS' if icalen == 1 else 'M'))
+
+    for fname, unit, nunit, dat in (('output.sub', 'SUB', 4, reader.read_sub()), ('output.hru', 'HRU', 12, reader.read_hru())):
+        ref = read_fwf(TxtInOut, fname, icalen, iprint, nunit)
+        variables = SUB_VARIABLES if fname == 'output.sub' else HRU_VARIABLES
+        assert list(dat.columns) == [unit] + variables
+        assert len(dat) == len(dates) * nunit
+        np.testing.assert_array_equal(dat[unit].values, ref[unit].values)
+        np.testing.assert_allclose(dat[variables].values, ref[variables].values.astype(float))
+        np.testing.assert_array_equal(dat.index.values, np.repeat(dates.values, nunit))
+
+
+def test_many_units_per_time_step(tmp_path):
+    # more units than the first window searched for the change of the time stamp
+    TxtInOut = make_txtinout(str(tmp_path), nrch=5000, nbyr=1, iprint=0, icalen=1, sub=True)
+    dat = swat_reader(TxtInOut).read_sub(['WYLDmm'], [1, 5000])
+    assert len(dat) == 24
+    assert (dat.index[::2] == pd.date_range('2000-01-01', periods=12, freq='MS')).all()
+
+
+def rewrite_records(fpath, edit):
+    '''
+    apply edit(line) to the records of an output file
+    '''
+    with open(fpath) as f:
+        lines = f.readlines()
+    with open(fpath, 'w') as f:
+        f.writelines(lines[:9] + [edit(l) for l in lines[9:]])
+
+
+def test_values_running_together(tmp_path):
+    # SNOMELTmm fills its 10 characters in every record, so it runs into PRECIPmm
+    TxtInOut = make_txtinout(str(tmp_path), nrch=3, nbyr=1, iprint=0, sub=True)
+    rewrite_records(os.path.join(TxtInOut, 'output.sub'), lambda l: l[:44] + '999999.999' + l[54:])
+    dat = swat_reader(TxtInOut).read_sub()
+    ref = read_fwf(TxtInOut, 'output.sub', 0, 0, 3)
+    np.testing.assert_allclose(dat[SUB_VARIABLES].values, ref[SUB_VARIABLES].values.astype(float))
+    assert (dat['SNOMELTmm'] == 999999.999).all()
+
+
+def test_unknown_widths_raise(tmp_path):
+    # and PRECIPmm is one character wider than in SWAT2012
+    TxtInOut = make_txtinout(str(tmp_path), nrch=3, nbyr=1, iprint=0, sub=True)
+    rewrite_records(os.path.join(TxtInOut, 'output.sub'), lambda l: l[:34] + ' ' + l[34:44] + '999999.999' + l[54:])
+    with pytest.raises(AssertionError, match='cannot be told apart'):
+        swat_reader(TxtInOut).read_sub()
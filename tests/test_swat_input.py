@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+editing HRU parameters with swat_input.write_subhru and write_files
+"""
+
+
+import os
+
+import pytest
+
+import swat_input
+from swat_input import read_subhru, write_subhru, edit_lines
+from swat_synthetic import make_txtinout
+
+
+def test_edit_lines_keeps_integers_and_fractions():
+    lines = ['               0    | CANMX : Maximum canopy storage [mm]\n',
+             '               2    | IGRO : Land cover status\n']
+    lines = edit_lines(lines, {0: 0.35, 1: 1.0})
+    assert lines[0] == '            0.35    | CANMX : Maximum canopy storage [mm]\n'
+    assert lines[1] == '               1    | IGRO : Land cover status\n'
+
+
+def test_write_subhru_over_an_integer_value(tmp_path):
+    TxtInOut = make_txtinout(str(tmp_path), nrch=2, nbyr=1, nhru=2)
+    fpath = os.path.join(TxtInOut, '000010001.hru')
+    with open(fpath) as f:
+        lines = f.readlines()
+    lines[8] = '               0' + lines[8][16:]
+    with open(fpath, 'w') as f:
+        f.writelines(lines)
+
+    subhru = read_subhru(TxtInOut)
+    assert subhru.canmx[0] == 0
+    subhru.loc[0, 'canmx'] = 0.35
+    assert write_subhru(TxtInOut, subhru) == ['000010001.hru']
+    assert read_subhru(TxtInOut).canmx[0] == 0.35
+
+
+def test_write_files_rolls_back_an_interrupted_replace(tmp_path, monkeypatch):
+    TxtInOut = make_txtinout(str(tmp_path), nrch=2, nbyr=1, nhru=2)
+    names = ['000010001.hru', '000010002.hru', '000020001.hru']
+    before = {}
+    for n in names:
+        with open(os.path.join(TxtInOut, n), 'rb') as f:
+            before[n] = f.read()
+    listing = sorted(os.listdir(TxtInOut))
+
+    replace, calls = os.replace, []
+
+    def interrupted(src, dst):
+        calls.append(src)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        replace(src, dst)
+
+    monkeypatch.setattr(swat_input.os, 'replace', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        swat_input.write_files(TxtInOut, {n: {8: 1.5} for n in names}, threads=1)
+    monkeypatch.undo()
+
+    assert sorted(os.listdir(TxtInOut)) == listing
+    for n in names:
+        with open(os.path.join(TxtInOut, n), 'rb') as f:
+            assert f.read() == before[n]
+
+
+def test_write_files_edits_all(tmp_path):
+    TxtInOut = make_txtinout(str(tmp_path), nrch=2, nbyr=1, nhru=2)
+    listing = sorted(os.listdir(TxtInOut))
+    swat_input.write_files(TxtInOut, {'000010001.hru': {8: 1.5}, '000020002.hru': {8: 2.5}})
+    assert sorted(os.listdir(TxtInOut)) == listing
+    assert list(read_subhru(TxtInOut).canmx.iloc[[0, 3]]) == [1.5, 2.5]
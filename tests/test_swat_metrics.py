@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+gof of stacked scenarios against the metrics of each scenario alone
+"""
+
+
+import numpy as np
+import pytest
+
+from swat_metrics import gof, METRICS
+
+
+@pytest.mark.parametrize('nscen', [2, 3, 5])
+@pytest.mark.parametrize('sim_gaps', [False, True])
+def test_gof_of_scenarios(nscen, sim_gaps):
+    rng = np.random.default_rng(0)
+    obs = rng.gamma(2., 10., (120, 3))
+    obs[rng.random(obs.shape) < 0.2] = np.nan
+    obs[:115, 2] = np.nan  # a reach with too few observations
+    sim = obs * rng.uniform(0.5, 1.5, (nscen, 1, 3)) + rng.normal(0., 2., (nscen, 120, 3))
+    sim = np.where(np.isnan(sim), rng.gamma(2., 10., sim.shape), sim)
+    if sim_gaps:
+        sim[0, :10, 0] = np.nan
+
+    res = gof(sim, obs, min_count=10)
+    for k in METRICS:
+        assert res[k].shape == (nscen, 3)
+    for i in range(nscen):
+        one = gof(sim[i], obs, min_count=10)
+        for k in METRICS:
+            np.testing.assert_allclose(res[k][i], one[k])
+    assert np.isnan(res['NSE'][:, 2]).all() and not np.isnan(res['NSE'][:, :2]).any()
+
+
+def test_gof_of_scenarios_in_blocks():
+    rng = np.random.default_rng(1)
+    obs = rng.gamma(2., 10., (50, 4))
+    sim = obs * rng.uniform(0.5, 1.5, (7, 1, 4))
+    whole, blocks = gof(sim, obs), gof(sim, obs, block_size=2 * 50 * 4)
+    for k in METRICS:
+        np.testing.assert_allclose(whole[k], blocks[k])
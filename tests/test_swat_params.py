@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+editing indexed parameters with swat_params.param_index
+"""
+
+
+from swat_params import param_index
+from swat_synthetic import make_txtinout
+
+
+def test_set_fraction_over_an_integer_field(tmp_path):
+    TxtInOut = make_txtinout(str(tmp_path), nrch=1, nbyr=1, nhru=2)
+    index = param_index(TxtInOut, save=False)
+    files = ['000010001.mgt']
+    assert index.set('IGRO', 0.5, files=files) == files
+    assert index.get('IGRO', files).iloc[0] == 0.5
+    assert param_index(TxtInOut, save=False).get('IGRO', files).iloc[0] == 0.5
+
+    # whole numbers over integer fields stay integers
+    index.set('PLANT_ID', 7, files=files)
+    with open(tmp_path / files[0]) as f:
+        assert any(l.split('|')[0].strip() == '7' and 'PLANT_ID' in l for l in f)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+swat_runner over scenario workspaces with the dummy SWAT of swat_synthetic
+"""
+
+
+import os
+import sys
+
+import numpy as np
+
+from swat_run import swat_runner, run_swat, DUMMY_EXE, LOG_FILE
+from swat_synthetic import make_txtinout
+from swat_workspace import workspace_set
+
+
+def test_runs_with_a_failing_scenario(tmp_path):
+    baseline = make_txtinout(str(tmp_path / 'TxtInOut'), nrch=3, nbyr=1, nhru=2)
+    scenarios = workspace_set(baseline, str(tmp_path / 'Scenarios'))
+    paths = [ws.path for ws in scenarios.create(['s1', 's2', 'bad'])]
+    # the dummy run cannot read a broken file.cio
+    os.remove(os.path.join(paths[2], 'file.cio'))
+    with open(os.path.join(paths[2], 'file.cio'), 'w') as f:
+        f.write('not a file.cio\n')
+
+    stats, df = swat_runner(DUMMY_EXE, processes=2).run(paths, [1, 3], ['FLOW_OUTcms'], 'M', ['mean'])
+
+    assert list(stats['scenario']) == ['s1', 's2', 'bad']
+    assert list(stats['returncode']) == [0, 0, 1]
+    assert (stats['peak_mb'] > 0).all()
+    assert list(stats['nrows'].iloc[:2]) == [24, 24]
+    assert np.isnan(stats['nrows'].iloc[2])
+    assert stats['error'].iloc[2] != '' and (stats['error'].iloc[:2] == '').all()
+    assert os.path.exists(os.path.join(paths[2], LOG_FILE))
+
+    assert list(df.index.get_level_values('scenario').unique()) == ['s1', 's2']
+    assert list(df.index.get_level_values('RCH').unique()) == [1, 3]
+    # the baseline is untouched by the runs
+    assert not os.path.exists(os.path.join(baseline, LOG_FILE))
+
+
+def test_runs_with_an_unreadable_output(tmp_path):
+    baseline = make_txtinout(str(tmp_path / 'TxtInOut'), nrch=3, nbyr=1, nhru=2)
+    paths = [ws.path for ws in workspace_set(baseline, str(tmp_path / 'Scenarios')).create(['s1', 'garbage', 's2'])]
+    # the dummy SWAT, except in the garbage scenario where it writes a broken output.rch
+    code = '''import os, sys, runpy
+if os.path.basename(os.getcwd()) == 'garbage':
+    open('output.rch', 'w').write('garbage\\n' * 12)
+else:
+    sys.argv, sys.path[0] = [sys.argv[0], '.', '--dummy'], os.path.dirname({0!r})
+    runpy.run_path({0!r}, run_name='__main__')
+'''.format(DUMMY_EXE[1])
+
+    stats, df = swat_runner((sys.executable, '-c', code), processes=2).run(paths, [1, 3], ['FLOW_OUTcms'])
+
+    assert list(stats['returncode']) == [0, 0, 0]
+    assert stats['error'].iloc[1].startswith('reading the output failed')
+    assert (stats['error'].iloc[[0, 2]] == '').all()
+    assert np.isnan(stats['nrows'].iloc[1]) and (stats['nrows'].iloc[[0, 2]] > 0).all()
+    assert list(df.index.get_level_values('scenario').unique()) == ['s1', 's2']
+
+
+def test_run_takes_a_generator(tmp_path):
+    baseline = make_txtinout(str(tmp_path / 'TxtInOut'), nrch=2, nbyr=1, nhru=1)
+    paths = [ws.path for ws in workspace_set(baseline, str(tmp_path / 'Scenarios')).create(['b', 'a'])]
+    stats, df = swat_runner(DUMMY_EXE, processes=1).run((p for p in paths), [1], ['FLOW_OUTcms'])
+    assert list(stats['scenario']) == ['b', 'a']
+    assert list(stats['returncode']) == [0, 0]
+
+
+def test_timeout_kills_the_run(tmp_path):
+    stats = run_swat(str(tmp_path), (sys.executable, '-c', 'import time; time.sleep(30)'), timeout=0.5)
+    assert stats['returncode'] is None
+    assert stats['error'] == 'killed after 0.5 s'
+    assert stats['wall_run'] < 10
+
+
+def test_peak_memory_of_the_run(tmp_path):
+    # 200 MB written and held, so its pages are resident
+    stats = run_swat(str(tmp_path), (sys.executable, '-c', "b = b'x' * (200 * 2**20); import time; time.sleep(0.5)"))
+    assert stats['returncode'] == 0
+    # the high-water mark of the run only, not of the pytest process it was forked from
+    assert 200 <= stats['peak_mb'] < 300
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+writing the weather files of swat_weather back
+"""
+
+
+import os
+
+import numpy as np
+
+from swat_synthetic import make_txtinout
+from swat_weather import weather, weather_file
+
+
+def signed_zero_tmp(TxtInOut):
+    '''
+    put -0.0 in the first fields of some days of Tmp1.Tmp
+    '''
+    fpath = os.path.join(TxtInOut, 'Tmp1.Tmp')
+    with open(fpath) as f:
+        lines = f.readlines()
+    for i in (4, 10, 100):
+        lines[i] = lines[i][:7] + '-0.0'.rjust(5) + lines[i][12:17] + ' -0.0' + lines[i][22:]
+    with open(fpath, 'w') as f:
+        f.writelines(lines)
+    return fpath
+
+
+def test_unchanged_files_are_identical(tmp_path):
+    TxtInOut = make_txtinout(str(tmp_path / 'TxtInOut'), nrch=1, nbyr=2, nstation=3)
+    signed_zero_tmp(TxtInOut)
+    written = weather(TxtInOut).write(str(tmp_path / 'out'))
+    assert sorted(os.path.basename(f) for f in written) == ['Tmp1.Tmp', 'pcp1.pcp']
+    for f in written:
+        with open(f, 'rb') as new, open(os.path.join(TxtInOut, os.path.basename(f)), 'rb') as old:
+            assert new.read() == old.read()
+
+
+def test_changed_values_are_formatted(tmp_path):
+    TxtInOut = make_txtinout(str(tmp_path / 'TxtInOut'), nrch=1, nbyr=1, nstation=2)
+    signed_zero_tmp(TxtInOut)
+    weather(TxtInOut).write(str(tmp_path / 'out'), tmp=1.5)
+    old = weather_file(os.path.join(TxtInOut, 'Tmp1.Tmp'), 'tmp')
+    new = weather_file(str(tmp_path / 'out' / 'Tmp1.Tmp'), 'tmp')
+    np.testing.assert_allclose(new.values, np.where(old.missing, -99., old.values + 1.5))
+    assert new.fields[0, 0, 0].tobytes() == b'  1.5'
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+the spans indexed by usgs_cache.rdb_cache
+"""
+
+
+import datetime
+
+from usgs_cache import rdb_cache
+
+
+def test_put_stops_at_the_download_date(tmp_path):
+    cache = rdb_cache(str(tmp_path))
+    cache.put(['07325800'], '2020-01-01', '2030-12-31', 'D', b'daily', downloaded='2026-10-18')
+    assert cache.spans('07325800') == [(datetime.date(2020, 1, 1), datetime.date(2026, 10, 17))]
+
+    # the records published after the download are requested again
+    missing = rdb_cache(str(tmp_path)).missing(['07325800'], '2025-01-01', '2026-12-31')
+    assert missing == {(datetime.date(2026, 10, 18), datetime.date(2026, 12, 31)): ['07325800']}
+
+
+def test_put_monthly_stops_at_the_last_complete_month(tmp_path):
+    cache = rdb_cache(str(tmp_path))
+    cache.put(['07325800'], '2020-01-01', '2030-12-31', 'M', b'monthly', downloaded='2026-10-18')
+    assert cache.spans('07325800', 'M') == [(datetime.date(2020, 1, 1), datetime.date(2026, 9, 30))]
+
+
+def test_put_in_the_future_is_not_indexed(tmp_path):
+    cache = rdb_cache(str(tmp_path))
+    cache.put(['07325800'], '2027-01-01', '2027-12-31', 'D', b'nothing yet', downloaded='2026-10-18')
+    assert cache.spans('07325800') == []
+    assert cache.missing(['07325800'], '2027-01-01', '2027-12-31') == {(datetime.date(2027, 1, 1), datetime.date(2027, 12, 31)): ['07325800']}
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+usgs_fetch and read_usgs_flows against a local http.server that serves
+canned NWIS RDB responses, errors and slow responses
+"""
+
+
+import gzip
+import time
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+import pytest
+
+import usgs_water_data_reader
+from usgs_fetch import fetch_urls, http_transport
+
+
+def canned_rdb(sites, begin, end):
+    '''
+    a daily discharge RDB file of the sites in the NWIS layout
+    '''
+    lines = ['# ---------------------------------- WARNING ----------------------------------------', '#']
+    lines += ['#    USGS {} CANNED CREEK {}'.format(s, i) for i, s in enumerate(sites)]
+    for s in sites:
+        lines += ['#', '# Data provided for site {}'.format(s),
+                  '#            TS   parameter     statistic     Description',
+                  '#        123456       00060     00003     Discharge, cubic feet per second (Mean)', '#',
+                  'agency_cd\tsite_no\tdatetime\t123456_00060_00003\t123456_00060_00003_cd',
+                  '5s\t15s\t20d\t14n\t10s']
+        lines += ['USGS\t{}\t{}\t{}\tA'.format(s, d.date(), d.day + int(s[-2:])) for d in pd.date_range(begin, end)]
+    return ('\n'.join(lines) + '\n').encode()
+
+
+class canned_handler(BaseHTTPRequestHandler):
+    '''
+    /nwis/dv?site_no=..&begin_date=..&end_date=..  canned RDB, gzipped if accepted
+    /flaky/<n>/<name>                              503 for the first n requests, then RDB
+    /status/<code>/<name>                          always that status
+    /slow/<seconds>/<name>                         RDB after a delay
+    '''
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, content=b'', gzipped=False):
+        if gzipped:
+            content = gzip.compress(content)
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(content)))
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        with server.lock:
+            server.hits[parts.path] += 1
+            hits = server.hits[parts.path]
+            server.inflight += 1
+            server.peak = max(server.peak, server.inflight)
+            server.clients.add(self.client_address)
+        try:
+            kind, arg = (parts.path.strip('/').split('/') + ['', ''])[:2]
+            if kind == 'nwis':
+                query = parse_qs(parts.query)
+                self.reply(200, canned_rdb(query['site_no'], query['begin_date'][0], query['end_date'][0]),
+                           'gzip' in self.headers.get('Accept-Encoding', ''))
+            elif kind == 'flaky':
+                self.reply(503) if hits <= int(arg) else self.reply(200, canned_rdb(['07325800'], '2000-01-01', '2000-01-03'))
+            elif kind == 'status':
+                self.reply(int(arg))
+            elif kind == 'slow':
+                time.sleep(float(arg))
+                self.reply(200, canned_rdb(['07325800'], '2000-01-01', '2000-01-03'))
+            else:
+                self.reply(404)
+        finally:
+            with server.lock:
+                server.inflight -= 1
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), canned_handler)
+    httpd.daemon_threads = True
+    httpd.lock, httpd.hits, httpd.inflight, httpd.peak, httpd.clients = threading.Lock(), Counter(), 0, 0, set()
+    httpd.url = 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_retry_until_success(server):
+    content, = fetch_urls([server.url + '/flaky/2/a'], backoff=0.01)
+    assert content.startswith(b'# ---')
+    assert server.hits['/flaky/2/a'] == 3
+
+
+def test_retries_exhausted(server):
+    with pytest.raises(IOError, match='after 3 attempt'):
+        fetch_urls([server.url + '/status/503/a'], retries=2, backoff=0.01)
+    assert server.hits['/status/503/a'] == 3
+
+
+def test_client_error_is_not_retried(server):
+    with pytest.raises(IOError, match='after 1 attempt.*HTTP status 404'):
+        fetch_urls([server.url + '/status/404/a'], backoff=0.01)
+    assert server.hits['/status/404/a'] == 1
+
+
+def test_slow_response_times_out_and_is_retried(server):
+    transport = http_transport(timeout=0.1)
+    with pytest.raises(IOError, match='after 2 attempt.*timed out'):
+        fetch_urls([server.url + '/slow/0.5/a'], transport, retries=1, backoff=0.01)
+    assert server.hits['/slow/0.5/a'] == 2
+
+
+def test_concurrency_is_bounded(server):
+    urls = [server.url + '/slow/0.2/{}'.format(i) for i in range(8)]
+    t0 = time.perf_counter()
+    contents = fetch_urls(urls, concurrency=4)
+    elapsed = time.perf_counter() - t0
+    assert len(contents) == 8 and all(c.startswith(b'# ---') for c in contents)
+    assert server.peak == 4
+    # two rounds of four requests, not eight one after another
+    assert 0.4 <= elapsed < 1.2
+
+
+def test_connections_are_kept_alive(server):
+    transport = http_transport()
+    contents = fetch_urls([server.url + '/slow/0/{}'.format(i) for i in range(5)], transport, concurrency=1)
+    assert len(contents) == 5
+    assert len(server.clients) == 1
+    transport.close()
+
+
+def test_partial_failure(server):
+    urls = [server.url + '/slow/0.05/{}'.format(i) for i in range(3)] + [server.url + '/status/500/bad']
+    with pytest.raises(IOError, match='/status/500/bad'):
+        fetch_urls(urls, concurrency=2, retries=1, backoff=0.01)
+    assert server.hits['/status/500/bad'] == 2
+    assert all(server.hits['/slow/0.05/{}'.format(i)] == 1 for i in range(3))
+
+
+def test_read_usgs_flows_from_cache(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(usgs_water_data_reader, 'NWIS_URL', server.url + '/nwis')
+    sites = ['07325800', '07325840', '07325850']
+    flows, names = usgs_water_data_reader.read_usgs_flows(sites, '2000-01-01', '2000-03-31', cache=str(tmp_path), sites_per_request=2)
+    assert names['07325840'] == 'USGS 07325840 CANNED CREEK 1'
+    for s in sites:
+        assert len(flows[s]) == 91
+        assert flows[s].iloc[0, 1] == 1 + int(s[-2:])
+    # two requests: two sites and one site
+    assert server.hits['/nwis/dv'] == 2
+
+    # only the extension of the period is downloaded
+    flows, names = usgs_water_data_reader.read_usgs_flows(sites, '2000-02-01', '2000-04-30', cache=str(tmp_path), sites_per_request=None)
+    assert server.hits['/nwis/dv'] == 3
+    assert all(len(flows[s]) == 90 for s in sites)
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+This script keep a local cache of USGS NWIS RDB files.
+
+The raw RDB responses are stored content-addressed (named by the SHA-1 hash
+of their bytes) in a cache folder, and index.json records the date span each
+file covers for every step and site. A request is served from the cache and
+only the spans that are not cached yet have to be downloaded, with a single
+request for all the sites missing the same span. RDB files copied into the
+folder by hand are indexed from their content, so the cache also works
+offline against a directory of RDB files.
+
+usage:
+    cache = rdb_cache('usgs_cache')
+    for (begin, end), sites in cache.missing(['07325800', '07325840'], '2000-01-01', '2010-12-31').items():
+        cache.put(sites, begin, end, 'D', download(sites, begin, end))
+    files = cache.files(['07325800', '07325840'], '2000-01-01', '2010-12-31')
+"""
+
+
+import os
+import json
+import hashlib
+import datetime
+import pandas as pd
+
+from usgs_rdb import parse_rdb
+
+
+# the cache folder used when none is given
+DEFAULT_CACHE_DIR = os.environ.get('USGS_RDB_CACHE', os.path.join(os.path.expanduser('~'), '.usgs_rdb'))
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def to_date(d):
+    '''
+    a datetime.date from a date string, datetime or Timestamp
+    '''
+    return pd.Timestamp(d).date()
+
+
+def missing_spans(spans, begin, end):
+    '''
+    the parts of [begin, end] not covered by spans
+
+    Parameters
+    ----------
+    spans : list
+        (begin, end) dates, both included.
+    begin, end : datetime.date
+        the requested period, both included.
+
+    Returns
+    -------
+    list of (begin, end) dates.
+
+    '''
+    missing = []
+    cur = begin
+    for b, e in sorted(spans):
+        if e < cur:
+            continue
+        if b > end:
+            break
+        if b > cur:
+            missing.append((cur, min(b - ONE_DAY, end)))
+        cur = max(cur, e + ONE_DAY)
+        if cur > end:
+            break
+    if cur <= end:
+        missing.append((cur, end))
+    return missing
+
+
+def published_until(step, day):
+    '''
+    the last date whose records are published on day: the day before for
+    daily values and the end of the previous month for monthly ones
+    '''
+    day = to_date(day)
+    return day.replace(day=1) - ONE_DAY if step == 'M' else day - ONE_DAY
+
+
+def rdb_spans(content):
+    '''
+    the step and first and last dates of every site in an RDB file
+
+    Returns
+    -------
+    dict of {(step, site): (first date, last date)}
+
+    '''
+    spans = dict()
+    tables, sites = parse_rdb(content)
+    for site, df in tables.items():
+        if len(df) == 0:
+            continue
+        if 'datetime' in df:
+            spans[('D', site)] = (to_date(df.datetime.min()), to_date(df.datetime.max()))
+        else:
+            months = (df.year_nu.astype(float) * 12 + df.month_nu.astype(float) - 1).astype(int)
+            first, last = months.min(), months.max()
+            spans[('M', site)] = (datetime.date(first // 12, first % 12 + 1, 1),
+                                  (pd.Timestamp(datetime.date(last // 12, last % 12 + 1, 1)) + pd.offsets.MonthEnd(0)).date())
+    return spans
+
+
+class rdb_cache():
+    '''
+    content-addressed folder of USGS RDB files indexed by step, site and period
+    '''
+
+    def __init__(self, path=DEFAULT_CACHE_DIR):
+        '''
+        Parameters
+        ----------
+        path : str, optional
+            the cache folder; RDB files already in it are indexed. The default is
+            DEFAULT_CACHE_DIR (~/.usgs_rdb or the USGS_RDB_CACHE environment variable).
+
+        '''
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.index_path = os.path.join(path, 'index.json')
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        else:
+            self.index = dict()
+        self.scan()
+
+    def __repr__(self):
+        return 'USGS RDB cache at {}: {} files'.format(self.path, len(self.indexed_files()))
+
+    def indexed_files(self):
+        return {e['file'] for sites in self.index.values() for entries in sites.values() for e in entries}
+
+    def save_index(self):
+        tmp = self.index_path + '.tmp{}'.format(os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, self.index_path)
+
+    def add(self, step, site, begin, end, fname):
+        entries = self.index.setdefault(step, dict()).setdefault(site, [])
+        entry = dict(begin=str(begin), end=str(end), file=fname)
+        if entry not in entries:
+            entries.append(entry)
+
+    def scan(self):
+        '''
+        index the RDB files of the folder that are not indexed yet, by the dates
+        of their records
+        '''
+        known = self.indexed_files()
+        new = [f for f in sorted(os.listdir(self.path)) if f.lower().endswith('.rdb') and f not in known]
+        for fname in new:
+            with open(os.path.join(self.path, fname), 'rb') as f:
+                spans = rdb_spans(f.read())
+            for (step, site), (b, e) in spans.items():
+                self.add(step, site, b, e, fname)
+        if len(new) > 0:
+            self.save_index()
+
+    def spans(self, site, step='D'):
+        '''
+        the cached (begin, end) dates of a site
+        '''
+        return [(to_date(e['begin']), to_date(e['end'])) for e in self.index.get(step, dict()).get(site, [])]
+
+    def missing(self, sites, begin, end, step='D'):
+        '''
+        the periods to download, grouped so each can be fetched in one request
+
+        Returns
+        -------
+        dict of {(begin, end): [sites]}
+
+        '''
+        begin, end = to_date(begin), to_date(end)
+        groups = dict()
+        for site in sites:
+            for span in missing_spans(self.spans(site, step), begin, end):
+                groups.setdefault(span, []).append(site)
+        return groups
+
+    def put(self, sites, begin, end, step, content, downloaded=None):
+        '''
+        store a downloaded RDB file that covers [begin, end] for the sites.
+
+        The span is cut at the last date published when the file was
+        downloaded (see published_until), so a request reaching into the
+        future does not mark the later records as cached; they are
+        downloaded again once they are published.
+
+        Parameters
+        ----------
+        downloaded : date, optional
+            the download date. The default is None (today).
+
+        Returns
+        -------
+        the path of the stored file.
+
+        '''
+        fname = hashlib.sha1(content).hexdigest() + '.rdb'
+        fpath = os.path.join(self.path, fname)
+        if not os.path.exists(fpath):
+            tmp = fpath + '.tmp{}'.format(os.getpid())
+            with open(tmp, 'wb') as f:
+                f.write(content)
+            os.replace(tmp, fpath)
+        end = min(to_date(end), published_until(step, datetime.date.today() if downloaded is None else downloaded))
+        if to_date(begin) <= end:
+            for site in sites:
+                self.add(step, site, to_date(begin), end, fname)
+            self.save_index()
+        return fpath
+
+    def files(self, sites, begin, end, step='D'):
+        '''
+        the cached files with records of the sites between begin and end
+
+        Returns
+        -------
+        dict of {site: [paths]} in the order the files were cached.
+
+        '''
+        begin, end = to_date(begin), to_date(end)
+        files = dict()
+        for site in sites:
+            entries = self.index.get(step, dict()).get(site, [])
+            files[site] = [os.path.join(self.path, e['file']) for e in entries
+                           if to_date(e['begin']) <= end and to_date(e['end']) >= begin]
+        return files
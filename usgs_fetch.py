@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+This script download many URLs (e.g. USGS NWIS RDB requests) concurrently.
+
+The requests are scheduled with asyncio and bounded by a semaphore. The
+transport that performs a request is pluggable: any object with a get(url)
+method returning (status, headers, content), either blocking (run in worker
+threads) or a coroutine. The default http_transport keeps the HTTP/1.1
+connections alive and reuses them per host, asks for gzip responses and
+follows redirects. Failed requests and 429/5xx responses are retried with
+exponential backoff.
+
+usage:
+    contents = fetch_urls(urls, concurrency=4)
+    contents = fetch_urls(urls, transport=my_transport)
+"""
+
+
+import gzip
+import time
+import queue
+import asyncio
+import http.client
+from urllib.parse import urlsplit, urljoin
+from concurrent.futures import ThreadPoolExecutor
+
+
+# responses that are worth another attempt
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class http_transport():
+    '''
+    blocking HTTP/1.1 client with a pool of keep-alive connections per host
+    '''
+
+    def __init__(self, timeout=120., max_redirects=5):
+        '''
+        Parameters
+        ----------
+        timeout : float, optional
+            socket timeout in seconds. The default is 120.
+        max_redirects : int, optional
+            the number of redirects followed. The default is 5.
+
+        '''
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.pools = dict()
+
+    def __repr__(self):
+        return 'HTTP transport with {} idle connections'.format(sum(p.qsize() for p in self.pools.values()))
+
+    def connection(self, scheme, netloc, fresh=False):
+        '''
+        an idle pooled connection to the host, or a new one; returns (connection, reused)
+        '''
+        pool = self.pools.setdefault((scheme, netloc), queue.LifoQueue())
+        if not fresh:
+            try:
+                return pool.get_nowait(), True
+            except queue.Empty:
+                pass
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return cls(netloc, timeout=self.timeout), False
+
+    def release(self, scheme, netloc, conn):
+        self.pools[(scheme, netloc)].put(conn)
+
+    def request(self, url):
+        '''
+        one GET request on a pooled connection; returns (status, headers, content)
+        '''
+        parts = urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        conn, reused = self.connection(parts.scheme, parts.netloc)
+        while True:
+            try:
+                conn.request('GET', path, headers={'Accept-Encoding': 'gzip', 'Connection': 'keep-alive'})
+                resp = conn.getresponse()
+                content = resp.read()
+                break
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                if not reused:
+                    raise
+                # the server closed the idle connection; try once more on a new one
+                conn, reused = self.connection(parts.scheme, parts.netloc, fresh=True)
+        headers = {k.lower(): v for k, v in resp.getheaders()}
+        if resp.will_close:
+            conn.close()
+        else:
+            self.release(parts.scheme, parts.netloc, conn)
+        if headers.get('content-encoding') == 'gzip':
+            content = gzip.decompress(content)
+        return resp.status, headers, content
+
+    def get(self, url):
+        '''
+        GET a URL following redirects; returns (status, headers, content)
+        '''
+        for i in range(self.max_redirects + 1):
+            status, headers, content = self.request(url)
+            if status not in (301, 302, 303, 307, 308) or 'location' not in headers:
+                break
+            url = urljoin(url, headers['location'])
+        return status, headers, content
+
+    def close(self):
+        for pool in self.pools.values():
+            while not pool.empty():
+                pool.get_nowait().close()
+
+
+async def fetch_one(url, transport, semaphore, executor, retries, backoff):
+    '''
+    download one URL with retries
+    '''
+    for attempt in range(retries + 1):
+        async with semaphore:
+            try:
+                if asyncio.iscoroutinefunction(transport.get):
+                    status, headers, content = await transport.get(url)
+                else:
+                    status, headers, content = await asyncio.get_running_loop().run_in_executor(executor, transport.get, url)
+                error = None if status == 200 else 'HTTP status {}'.format(status)
+            except (OSError, http.client.HTTPException, asyncio.TimeoutError) as e:
+                status, error = None, '{}: {}'.format(type(e).__name__, e)
+        if error is None:
+            return content
+        if (status is not None and status not in RETRY_STATUS) or attempt == retries:
+            raise IOError('Downloading {} failed after {} attempt(s): {}'.format(url, attempt + 1, error))
+        await asyncio.sleep(backoff * 2 ** attempt)
+
+
+async def fetch_all(urls, transport=None, concurrency=4, retries=3, backoff=1.):
+    '''
+    download URLs concurrently, see fetch_urls
+    '''
+    own = transport is None
+    transport = http_transport() if own else transport
+    semaphore = asyncio.Semaphore(concurrency)
+    with ThreadPoolExecutor(concurrency) as executor:
+        try:
+            return await asyncio.gather(*[fetch_one(u, transport, semaphore, executor, retries, backoff) for u in urls])
+        finally:
+            if own:
+                transport.close()
+
+
+def fetch_urls(urls, transport=None, concurrency=4, retries=3, backoff=1.):
+    '''
+    download URLs concurrently
+
+    Parameters
+    ----------
+    urls : list
+        the URLs.
+    transport : object, optional
+        performs the requests: get(url) returns (status, headers, content) and
+        may be a coroutine. The default is a new http_transport.
+    concurrency : int, optional
+        the maximum number of requests in flight. The default is 4.
+    retries : int, optional
+        the number of further attempts after a failed request or a 429/5xx
+        response. The default is 3.
+    backoff : float, optional
+        seconds to wait before the first retry; doubled for every retry. The default is 1.
+
+    Returns
+    -------
+    list of the response contents (bytes) in the order of urls.
+
+    '''
+    t0 = time.perf_counter()
+    coro = fetch_all(list(urls), transport, concurrency, retries, backoff)
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        contents = asyncio.run(coro)
+    else:
+        # e.g. in Jupyter or Spyder, where an event loop is already running
+        with ThreadPoolExecutor(1) as ex:
+            contents = ex.submit(asyncio.run, coro).result()
+    print('Downloaded {} URL(s), {:.1f} MB in {:.1f} s'.format(len(contents), sum(len(c) for c in contents) / 2**20, time.perf_counter() - t0))
+    return contents
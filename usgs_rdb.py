@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+This script parse USGS NWIS RDB files.
+
+An RDB file is read in one pass over its bytes: the comment lines give the
+site metadata (station names, time series and data-value qualification
+codes), and the body of every tab-separated table is tokenized in one call
+and typed column by column following the field types of the table (n:
+numeric, d: date, s: string). NWIS writes one table per site, so the result is keyed by site.
+
+usage:
+    tables, sites = parse_rdb(content)
+    flow = tables['07325800']
+    sites['07325800']['station_nm']
+"""
+
+
+import io
+import re
+import csv
+import numpy as np
+import pandas as pd
+
+
+# comment lines with site metadata
+SITE_LINE = re.compile(rb'^#\s+([A-Z]+)\s+(\d{8,15})\s+(.*?)\s*$')
+TS_LINE = re.compile(rb'^#\s+(\d+)\s+(\d{5})\s+(\d{5})?\s+(.*?)\s*$')
+SITE_DATA_LINE = re.compile(rb'^#\s*Data provided for site (\d+)')
+QUALIFIER_LINE = re.compile(rb'^#\s+(\S{1,3})\s{2,}(.*?)\s*$')
+
+
+def to_float(values):
+    '''
+    numeric RDB fields as floats; blanks and codes such as Ice or Eqp are NaN
+    '''
+    try:
+        return values.astype(np.float64)
+    except ValueError:
+        return pd.to_numeric(values, errors='coerce').astype(np.float64)
+
+
+def to_datetime(values):
+    '''
+    ISO date RDB fields (e.g. 2000-01-31 or 2000-01-31 12:15) as datetime64
+    '''
+    try:
+        return values.astype('M8[ns]')
+    except ValueError:
+        return pd.to_datetime(values, errors='coerce').values
+
+
+def to_frame(columns, types, body):
+    '''
+    type the rows of one RDB table
+
+    Parameters
+    ----------
+    columns : list
+        the field names.
+    types : list
+        the RDB field types, e.g. 15s, 20d, 14n.
+    body : bytes
+        the tab-separated rows of the table.
+
+    '''
+    if body.strip() == b'':
+        return pd.DataFrame({c: pd.Series([], dtype=object) for c in columns}, columns=columns)
+    df = pd.read_csv(io.BytesIO(body), sep='\t', header=None, names=columns, dtype=str, na_filter=False, quoting=csv.QUOTE_NONE)
+    for c, t in zip(columns, types):
+        if t.endswith('n'):
+            df[c] = to_float(df[c].values)
+        elif t.endswith('d'):
+            df[c] = to_datetime(df[c].values)
+    return df
+
+
+def parse_rdb(content):
+    '''
+    parse an RDB file in one pass
+
+    Parameters
+    ----------
+    content : bytes
+        the RDB file.
+
+    Returns
+    -------
+    tables : dict
+        {site number: DataFrame} with numeric value columns (float, NaN for
+        codes such as Ice), qualification code columns (*_cd, str) and dates.
+    sites : dict
+        {site number: metadata}; the metadata dict has agency_cd, site_no,
+        station_nm, name (e.g. 'USGS 07325800 COBB CREEK NEAR EAKLY, OK'),
+        series ({ts_id: description}) and qualifiers ({code: description}).
+
+    '''
+    content = content.replace(b'\r', b'')
+    tables, sites = dict(), dict()
+
+    def site_meta(site_no):
+        return sites.setdefault(site_no, dict(agency_cd='USGS', site_no=site_no, station_nm='', name='USGS {}'.format(site_no),
+                                              series=dict(), qualifiers=dict()))
+
+    def line_end(pos):
+        end = content.find(b'\n', pos)
+        return len(content) if end < 0 else end
+
+    current, in_qualifiers = None, False
+    pos, n = 0, len(content)
+    while pos < n:
+        end = line_end(pos)
+        l = content[pos:end]
+        if l.startswith(b'#'):
+            if l.strip(b'# ') == b'':
+                in_qualifiers = False
+            elif SITE_DATA_LINE.match(l):
+                current = site_meta(SITE_DATA_LINE.match(l).group(1).decode())
+            elif b'qualification codes' in l:
+                in_qualifiers = True
+            elif in_qualifiers and current is not None and QUALIFIER_LINE.match(l):
+                code, desc = QUALIFIER_LINE.match(l).groups()
+                current['qualifiers'][code.decode()] = desc.decode('utf-8', 'replace')
+            elif current is None and SITE_LINE.match(l):
+                agency, site_no, station = (g.decode('utf-8', 'replace') for g in SITE_LINE.match(l).groups())
+                meta = site_meta(site_no)
+                meta.update(agency_cd=agency, station_nm=station, name='{} {} {}'.format(agency, site_no, station))
+            elif current is not None and TS_LINE.match(l):
+                ts, param, stat, desc = TS_LINE.match(l).groups()
+                current['series'][ts.decode()] = desc.decode('utf-8', 'replace')
+            pos = end + 1
+        elif l.startswith(b'agency_cd'):
+            # a table: header, field types and the rows up to the next comment or blank line
+            columns = l.decode().split('\t')
+            tend = line_end(end + 1)
+            types = content[end + 1:tend].decode().split('\t')
+            stops = [s for s in (content.find(b'\n#', tend), content.find(b'\n\n', tend)) if s >= 0]
+            stop = min(stops) + 1 if len(stops) > 0 else n
+            df = to_frame(columns, types, content[tend + 1:stop])
+            if 'site_no' in df:
+                for site_no, d in df.groupby('site_no', sort=False):
+                    site_meta(site_no)
+                    d = d.reset_index(drop=True)
+                    tables[site_no] = pd.concat([tables[site_no], d], ignore_index=True) if site_no in tables else d
+            current, in_qualifiers = None, False
+            pos = stop
+        else:
+            pos = end + 1
+
+    return tables, sites
@@ -11,17 +11,28 @@ usage:
 """
 
 
+import os
 import pandas as pd
 import datetime
-from sys import version
-if version > '3':
-    from urllib.request import urlopen
-else:
-    from urllib2 import urlopen
+from usgs_rdb import parse_rdb
+from usgs_cache import rdb_cache, DEFAULT_CACHE_DIR
+from usgs_fetch import fetch_urls
+
+# the NWIS web service; can point at a local stand-in server for tests
+NWIS_URL = os.environ.get('USGS_NWIS_URL', 'https://waterdata.usgs.gov/nwis')
 #%% read usgs gauge data
 
-def read_usgs_rdb(filepath_or_link):      
-    return pd.read_csv(filepath_or_link, comment='#', header=0, sep='\t')[1:].apply(lambda x: pd.to_numeric(x, errors='ignore') if x.name.endswith('_va') else x, axis=0)
+def read_usgs_rdb(filepath_or_link):
+    '''
+    read an RDB file or URL into one DataFrame, see usgs_rdb.parse_rdb
+    '''
+    if filepath_or_link.startswith(('http://', 'https://')):
+        content = fetch_url(filepath_or_link)
+    else:
+        with open(filepath_or_link, 'rb') as f:
+            content = f.read()
+    tables, sites = parse_rdb(content)
+    return pd.concat(tables.values(), ignore_index=True)
 
 def create_streamflow_url(gauge_list, begin_date='1900-01-01', end_date='2019-12-31', step='D'):
     
@@ -36,16 +47,69 @@ def create_streamflow_url(gauge_list, begin_date='1900-01-01', end_date='2019-12
     if step == 'D':
         gages = ('&site_no={}' * len(gauge_list)).format(*gauge_list)
         period = '&period=&begin_date={}&end_date={}'.format(begin_date, end_date)
-        url = 'https://waterdata.usgs.gov/nwis/dv?&cb_00060=on&format=rdb{}&referred_module=sw{}'.format(gages, period)
+        url = '{}/dv?&cb_00060=on&format=rdb{}&referred_module=sw{}'.format(NWIS_URL, gages, period)
     elif step == 'M':
         gages = ''.join(['&site_no={0}&por_{0}_93535=594467,00060,93535,{1:.7},{2:.7}'.format(g, begin_date, end_date)  for g in gauge_list])
-        url = 'https://waterdata.usgs.gov/nwis/monthly?referred_module=sw&format=rdb{}'.format(gages)
+        url = '{}/monthly?referred_module=sw&format=rdb{}'.format(NWIS_URL, gages)
         
     return url
 
 
-def read_usgs_flow(gauge_list, begin_date='1900-01-01', end_date='2019-12-31', step='D'):
-    
+def fetch_url(url, transport=None):
+    '''
+    download a URL and return its bytes, see usgs_fetch.fetch_urls
+    '''
+    return fetch_urls([url], transport)[0]
+
+
+def request_groups(groups, sites_per_request=None):
+    '''
+    split {(begin, end): [sites]} into requests of at most sites_per_request sites
+    '''
+    requests = []
+    for (b, e), sites in groups.items():
+        n = len(sites) if sites_per_request is None else sites_per_request
+        requests += [(sites[i:i + n], b, e) for i in range(0, len(sites), n)]
+    return requests
+
+
+def read_usgs_flows(gauge_list, begin_date='1900-01-01', end_date='2019-12-31', step='D', cache=DEFAULT_CACHE_DIR, offline=False,
+                    sites_per_request=10, concurrency=4, transport=None):
+    '''
+    read the streamflow of several USGS gauges, downloading the gauges in a few
+    concurrent requests
+
+    Parameters
+    ----------
+    gauge_list : list
+        the USGS site numbers.
+    begin_date, end_date : str
+        the period as YYYY-MM-DD.
+    step : str, optional
+        D for daily or M for monthly flow. The default is 'D'.
+    cache : str, optional
+        the RDB cache folder, see usgs_cache.rdb_cache; only the periods missing
+        from it are downloaded. None always downloads. The default is DEFAULT_CACHE_DIR.
+    offline : bool, optional
+        only use the RDB files of the cache folder. The default is False.
+    sites_per_request : int, optional
+        the maximum number of gauges in one request; None puts all the gauges
+        missing the same period in one request. The default is 10.
+    concurrency : int, optional
+        the maximum number of requests in flight. The default is 4.
+    transport : object, optional
+        performs the HTTP requests, see usgs_fetch.fetch_urls. The default is
+        a usgs_fetch.http_transport with keep-alive connections.
+
+    Returns
+    -------
+    flows : dict
+        {site number: DataFrame indexed by datetime}; the site metadata of
+        usgs_rdb.parse_rdb is in DataFrame.attrs['site'].
+    gauge_names : dict
+        {site number: gauge name}
+
+    '''
     print('Requested gauges: ', gauge_list)
     print('Requested period: ', begin_date, end_date)
     
@@ -54,34 +118,72 @@ def read_usgs_flow(gauge_list, begin_date='1900-01-01', end_date='2019-12-31', s
         edate = datetime.datetime.strptime(end_date,   '%Y-%m-%d')
     except:
         raise ValueError ("The input formats for the begin_date:{} and end_date:{} must be YYYY-MM-DD".format(begin_date, end_date))
-        
-    url = create_streamflow_url(gauge_list, begin_date, end_date, step)
-    
-    print('\nDownloading USGS observed streamflow data:')
-    print(url, '\n')
     
+    if cache is None:
+        assert not offline, 'A cache folder of RDB files is needed to work offline.'
+        groups = {(bdate.date(), edate.date()): list(gauge_list)}
+    else:
+        store = rdb_cache(cache)
+        groups = store.missing(gauge_list, bdate, edate, step)
+        if offline:
+            for (b, e), sites in groups.items():
+                print('Offline: {} to {} is not cached for gauges {}'.format(b, e, sites))
+            groups = dict()
     
-    df = read_usgs_rdb(url).drop('agency_cd', axis=1)
-    if step != 'D':
-        df['datetime'] = df.apply(lambda x: datetime.datetime(int(x.year_nu), int(x.month_nu), 1), axis=1)
-        df.drop(['year_nu', 'month_nu', 'parameter_cd', 'ts_id'], axis=1, inplace=True)
-    df.set_index('datetime', inplace=True)
+    requests = request_groups(groups, sites_per_request)
+    urls = [create_streamflow_url(sites, str(b), str(e), step) for sites, b, e in requests]
+    if len(urls) > 0:
+        print('\nDownloading USGS observed streamflow data:')
+        print('\n'.join(urls), '\n')
+    contents = fetch_urls(urls, transport, concurrency) if len(urls) > 0 else []
     
+    if cache is None:
+        parsed = {u: parse_rdb(c) for u, c in zip(urls, contents)}
+        files = {g: [u for u, (sites, b, e) in zip(urls, requests) if g in sites] for g in gauge_list}
+    else:
+        parsed = dict()
+        for (sites, b, e), c in zip(requests, contents):
+            store.put(sites, b, e, step, c)
+        files = store.files(gauge_list, bdate, edate, step)
     
-    f_url = urlopen(url)
-    lines = [f_url.readline() for i in range(1000 + len(gauge_list))]
-    f_url.close()
+    # parse every file once
+    for f in {f for fs in files.values() for f in fs} - set(parsed):
+        with open(f, 'rb') as fin:
+            parsed[f] = parse_rdb(fin.read())
     
-    gauge_names = dict()
-    
-    # read name of the gauge
-    def find_site_name(gauge_no):
-        for l in lines: 
-            if gauge_no.encode() in l: 
-                return l
-        
+    flows, gauge_names = dict(), dict()
     for g in gauge_list:
-        l = find_site_name(g)
-        gauge_names[g] = l.strip().lstrip(b'#').strip().decode()
+        tables, meta = [], None
+        for f in files[g]:
+            t, sites = parsed[f]
+            meta = sites.get(g, meta)
+            if g in t:
+                tables.append(t[g])
+        gauge_names[g] = 'USGS {}'.format(g) if meta is None else meta['name']
+        if len(tables) == 0:
+            print('No streamflow data of gauge {} from {} to {}'.format(g, begin_date, end_date))
+            flows[g] = pd.DataFrame(columns=['site_no', 'value_va', 'value_cd'], index=pd.Index([], name='datetime'))
+            continue
         
-    return df, gauge_names
\ No newline at end of file
+        df = pd.concat(tables).drop('agency_cd', axis=1)
+        if step != 'D':
+            df['datetime'] = pd.to_datetime(dict(year=df.year_nu.astype(float).astype(int), month=df.month_nu.astype(float).astype(int), day=1))
+            df.drop(['year_nu', 'month_nu', 'parameter_cd', 'ts_id'], axis=1, inplace=True)
+            bdate = bdate.replace(day=1)
+        df.set_index('datetime', inplace=True)
+        
+        # cached files may overlap or cover more than the period
+        df = df[~df.index.duplicated(keep='last')].sort_index()
+        dates = pd.DatetimeIndex(df.index)
+        flows[g] = df[(dates >= bdate) & (dates <= edate)]
+        flows[g].attrs['site'] = meta
+    
+    return flows, gauge_names
+
+
+def read_usgs_flow(gauge_list, begin_date='1900-01-01', end_date='2019-12-31', step='D', cache=DEFAULT_CACHE_DIR, offline=False, **kwargs):
+    '''
+    read the streamflow of USGS gauges as one DataFrame, see read_usgs_flows
+    '''
+    flows, gauge_names = read_usgs_flows(gauge_list, begin_date, end_date, step, cache, offline, **kwargs)
+    return pd.concat(flows.values()), gauge_names